@@ -3,62 +3,184 @@ Class holding the primary parsing logic of the OWASP Dependency Checker report
 """
 
 import json
-from typing import Any, List, Optional
+import os
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Sequence
 from pydantic import BaseModel, ValidationError
 import pprint
 
-from app.models.report_models import DCModel
+from app.advisories import AdvisoryResolver
+from app.cvss_stats import ScoreColumns, ScoreStats
+from app.memory import SpillBuffer, SpilledFindings
+from app.models.report_models import DCModel, Dependency
+from app.report_stream import ReportStream
+from app.versions import FixVersion
 from settings import Settings
 from utils.common import err
 
+SEVERITY_ORDER = {
+    "critical": 1,
+    "high": 2,
+    "moderate": 3,
+    "medium": 4,
+    "low": 5
+}
+# Sort order of severities the report uses but the notifier does not know
+UNRANKED = 999
+
+
+def severity_order(severity: str) -> int:
+    """
+    Sort order of a severity, most severe first
+    """
+    return SEVERITY_ORDER.get(severity, UNRANKED)
+
 
 class Vulnerability(BaseModel):
     dependency: str
     version: str
     ids: List[str]
     severity: str
-    scorev2: Any | str
-    scorev3: Any | str
+    scorev2: Optional[float] = None
+    scorev3: Optional[float] = None
+    scorev4: Optional[float] = None
     url: str
+    # Lowest version of the dependency fixing all of its findings
+    fixed_in: Optional[str] = None
+
+    @property
+    def score(self) -> Optional[float]:
+        """
+        Best available CVSS score (v3, then v4, then v2)
+
+        :param self: ref to class self
+        :return: score, None when the finding is unscored
+        :rtype: Optional[float]
+        """
+        for score in (self.scorev3, self.scorev4, self.scorev2):
+            if score is not None:
+                return score
+
+        return None
 
 
 class DataPack(BaseModel):
     vulnerabilities: List[Vulnerability]
     counts: dict[str, int]
+    report_name: str = ""
+    report_date: str = ""
+    engine_version: str = ""
+    # CVSS column (best, v2, v3, v4) to severity to score statistics
+    score_stats: dict[str, dict[str, ScoreStats]] = {}
+
+
+PACK_VERSION = 1
+
+
+class ParsedPack(BaseModel):
+    """
+    Serialised outcome of the parse stage
+    """
+    version: int = PACK_VERSION
+    report_present: bool = True
+    failed: bool = False
+    data: Optional[DataPack] = None
 
 
 class DCParser:
-    _data: Optional[DataPack] = None
-    _report: Optional[DCModel] = None
+    _data: Optional[DataPack]
+    _report: Optional[DCModel]
+    _stream: Optional[ReportStream]
+    _spilled: Optional[SpilledFindings[Vulnerability]]
+    _by_severity: dict[str, List[Vulnerability]]
     _settings: Settings
-    failed: bool = False
+    _index_terms: set[tuple[str, str]]
+    _advisories: AdvisoryResolver
+    failed: bool
+    report_present: bool
 
     def __init__(self, settings: Settings):
         """
         Initialises the parser with the source data.
         """
         self._settings = settings
-        self._load_data()
-        self._data = self._parse()
+        self._data = None
+        self._report = None
+        self._stream = None
+        self._spilled = None
+        self._by_severity = {}
+        self._index_terms = set()
+        self._advisories = AdvisoryResolver()
+        self.failed = False
+        self.report_present = True
+
+        try:
+            self._load_data()
+            self._data = self._parse()
+        except MemoryError:
+            # Degrade to a parser failure notification instead of crashing
+            err("Ran out of memory parsing the report, set "
+                "DC_MEMORY_BUDGET_MB to spill findings to disk.")
+            self.failed = True
+
+        # Only the parsed data is used from now on
+        self._report = None
+        self._stream = None
+        self._by_severity = self._index_by_severity()
 
     def _load_data(self):
         """
         Loads the source data. Override this method in subclasses.
         """
+        # Under a memory budget the report is streamed by _parse instead
+        if self._settings.memory_budget_mb > 0:
+            self._stream = ReportStream(self._settings.report_json)
+            return
+
         try:
             raw = json.loads(self._settings.report_json.read_text())
             self._report = DCModel.model_validate(raw)
         except ValidationError as e:
-            err(
-                "Could not correctly validate the report schema against the",
-                "known model."
-            )
+            self._schema_error(e)
+
+    def _schema_error(self, e: ValidationError) -> None:
+        """
+        Report a report not matching the known model
 
-            if self._settings.debugging:
-                print("Validation Errors:")
-                pprint.pprint(e.errors())
+        :param self: ref to class self
+        :param e: validation error
+        :type e: ValidationError
+        """
+        err(
+            "Could not correctly validate the report schema against the",
+            "known model."
+        )
 
-            self.failed = True
+        if self._settings.debugging:
+            print("Validation Errors:")
+            pprint.pprint(e.errors())
+
+        self.failed = True
+
+    def _dependencies(self) -> Iterator[Dependency]:
+        """
+        Dependencies of the loaded report, or validated one at a time from
+        the stream under a memory budget
+
+        :param self: ref to class self
+        :return: report dependencies
+        :rtype: Iterator[Dependency]
+        """
+        if self._report:
+            yield from self._report.dependencies
+            return
+
+        for raw in self._stream.dependencies():
+            yield Dependency.model_validate(raw)
+
+        # Everything but the dependencies, seen on the way
+        self._report = DCModel.model_validate(
+            {**self._stream.header, "dependencies": []})
 
     def _parse(self) -> Optional[DataPack]:
         """
@@ -68,32 +190,73 @@ class DCParser:
         :return: simplified info
         :rtype: Optional[Dict[str, Any]]
         """
-        if not self._report:
+        if not self._report and not self._stream:
             return None
 
-        severity_order = {
-            "critical": 1,
-            "high": 2,
-            "moderate": 3,
-            "medium": 4,
-            "low": 5
-        }
-        dependencies = self._report.dependencies
-        vulns: List[Vulnerability] = []
+        findings = SpillBuffer(self._settings, Vulnerability, severity_order)
+        counts = dict.fromkeys(self._settings.severity_order, 0)
+        scores = ScoreColumns()
+
+        try:
+            self._parse_dependencies(self._dependencies(), findings, counts,
+                                     scores)
+        except ValidationError as e:
+            self._schema_error(e)
+            return None
+        except (OSError, ValueError) as e:
+            err("Could not read the report: ", e)
+            self.failed = True
+            return None
+
+        vulns = findings.finish()
 
+        if isinstance(vulns, SpilledFindings):
+            self._spilled = vulns
+            vulns = []
+
+        return DataPack(
+            vulnerabilities=vulns,
+            counts=counts,
+            report_name=self._report.projectInfo.name,
+            report_date=self._report.projectInfo.reportDate,
+            engine_version=self._report.scanInfo.engineVersion,
+            score_stats=scores.compute(),
+        )
+
+    def _parse_dependencies(
+            self,
+            dependencies: Iterable[Dependency],
+            findings: SpillBuffer[Vulnerability],
+            counts: dict[str, int],
+            scores: ScoreColumns) -> None:
+        """
+        Turn the findings of every dependency into vulnerabilities
+
+        :param self: ref to class self
+        :param dependencies: report dependencies
+        :type dependencies: Iterable[Dependency]
+        :param findings: collects the vulnerabilities
+        :type findings: SpillBuffer[Vulnerability]
+        :param counts: severity to number of findings, updated
+        :type counts: dict[str, int]
+        :param scores: CVSS statistics, updated
+        :type scores: ScoreColumns
+        """
         for dep in dependencies:
+            self._index_dependency(dep)
             dep_name_parts = dep.fileName.split(":")
             dep_name: str = dep_name_parts[0]
             dep_version: str = (
                 dep_name_parts[1] if len(dep_name_parts) > 1 else "Unknown")
+            fix = FixVersion(dep_version)
+            vulns: List[Vulnerability] = []
 
             for d_vulns in dep.vulnerabilities or []:
                 severity = d_vulns.severity.lower()
-                scorev2 = getattr(d_vulns.cvssv2, 'score', 'Unknown')
-                scorev3 = getattr(d_vulns.cvssv3, 'baseScore', 'Unknown')
-                refs = d_vulns.references or []
+                scorev2 = getattr(d_vulns.cvssv2, 'score', None)
+                scorev3 = getattr(d_vulns.cvssv3, 'baseScore', None)
+                scorev4 = getattr(d_vulns.cvssv4, 'baseScore', None)
                 vuln_ids: List[str] = []
-                url = ""
 
                 # Get IDs
                 if d_vulns.name:
@@ -102,15 +265,9 @@ class DCParser:
                     for vuln_soft in d_vulns.vulnerableSoftware:
                         vuln_ids.append(vuln_soft.software.id)
 
-                # Get ref URLs
-                if len(refs) > 1:
-                    keywords = ["advisories", "vuln", "detail"]
-                    first_advisory_ref = next(
-                        (ref for ref in refs if any(
-                            keyword in (ref.url or "") for keyword in keywords)),
-                        None
-                    )
-                    url = getattr(first_advisory_ref, 'url', "")
+                # Get the advisory URL, once per vulnerability id
+                url = self._advisories.resolve(
+                    d_vulns.name or None, d_vulns.references or [])
 
                 vulns.append(Vulnerability(
                     dependency=dep_name,
@@ -119,22 +276,72 @@ class DCParser:
                     severity=severity,
                     scorev2=scorev2,
                     scorev3=scorev3,
+                    scorev4=scorev4,
                     url=url,
                 ))
+                scores.add(severity, scorev2, scorev3, scorev4)
+                counts[severity] = counts.get(severity, 0) + 1
+                self._index_terms.update(("cve", i) for i in vuln_ids)
+                fix.add(d_vulns.vulnerableSoftware)
 
-        counts = dict.fromkeys(self._settings.severity_order, 0)
+            # Known once every finding of the dependency has been seen
+            for vuln in vulns:
+                vuln.fixed_in = fix.value
+
+            # Sorted by severity (stable) once every dependency is parsed
+            findings.extend(vulns)
+
+    def _index_dependency(self, dep: Dependency) -> None:
+        """
+        Collect the package ids and file names a dependency ships, for the
+        inverted package index
+
+        :param self: ref to class self
+        :param dep: report dependency
+        :type dep: Dependency
+        """
+        terms = self._index_terms
+        terms.add(("file", dep.fileName))
+        terms.update(("package", package.id) for package in dep.packages or [])
+
+        for related in dep.relatedDependencies or []:
+            terms.add(("file", related.fileName))
+            terms.update(
+                ("package", package.id)
+                for package in related.packageIds or [])
+
+    def get_index_terms(self) -> set[tuple[str, str]]:
+        """
+        Returns the (kind, term) pairs of the report: ``package`` ids,
+        ``file`` names and ``cve`` ids.
+
+        :param self: ref to class self
+        :return: index terms, empty for restored packs
+        :rtype: set[tuple[str, str]]
+        """
+        return self._index_terms
 
-        for vuln in vulns:
-            counts[vuln.severity] = counts.get(vuln.severity, 0) + 1
+    def _index_by_severity(self) -> dict[str, List[Vulnerability]]:
+        """
+        Group the (already severity sorted) vulnerabilities by severity so
+        threshold queries only concatenate the buckets they need.
+
+        :param self: ref to class self
+        :return: severity name to vulnerabilities, most severe first
+        :rtype: dict[str, List[Vulnerability]]
+        """
+        index: dict[str, List[Vulnerability]] = {}
 
-        # Sort vulnerabilities by severity
-        vulns.sort(key=lambda v: severity_order.get(v.severity, float('inf')))
+        if self._data:
+            for vuln in self._data.vulnerabilities:
+                index.setdefault(vuln.severity, []).append(vuln)
 
-        return DataPack(vulnerabilities=vulns, counts=counts)
+        return index
 
     def get_data(self) -> Optional[DataPack]:
         """
-        Returns the parsed data.
+        Returns the parsed data. Spilled findings are not in its
+        vulnerabilities, use ``findings``.
 
         :param self: ref to class self
         :return: The parsed data.
@@ -142,26 +349,152 @@ class DCParser:
         """
         return self._data
 
+    def findings(self) -> Sequence[Vulnerability]:
+        """
+        Returns every vulnerability, most severe first, whether kept in
+        memory or spilled to disk.
+
+        :param self: ref to class self
+        :return: vulnerabilities, empty when nothing was parsed
+        :rtype: Sequence[Vulnerability]
+        """
+        if self._spilled is not None:
+            return self._spilled
+
+        return self._data.vulnerabilities if self._data else []
+
     def filter_by_min_severity(
             self,
-            min_sev: str) -> Optional[List[Vulnerability]]:
+            min_sev: str,
+            max_sev: Optional[str] = None
+    ) -> Optional[Sequence[Vulnerability]]:
         """
         Method to filter vulnerabilities below a curtain threshold
 
         :param self: ref to class self
         :param min_sev: Minimum severity to start including from
         :type min_sev: str
-        :return: list of vulnerabilities after filtration
-        :rtype: List[Vulnerability] | None
+        :param max_sev: Optional maximum severity to include up to
+        :type max_sev: Optional[str]
+        :return: list of vulnerabilities after filtration, a view reading
+        them back from disk when they were spilled
+        :rtype: Sequence[Vulnerability] | None
         """
-        vulns = self._data
-        if not vulns:
+        if not self._data:
             return None
 
-        min_rank = self._settings.severity_rank.get(min_sev, 0)
+        rank = self._settings.severity_rank
+        min_rank = rank.get(min_sev.lower(), 0)
+        max_rank = rank.get(max_sev.lower(), 0) if max_sev else len(rank)
+
+        if self._spilled is not None:
+            return self._spilled.select(
+                severity for severity in self._data.counts
+                if min_rank <= rank.get(severity, 0) <= max_rank)
+
+        vulns: List[Vulnerability] = []
+
+        # Buckets keep the most severe first ordering of the parsed data
+        for severity, bucket in self._by_severity.items():
+            if min_rank <= rank.get(severity, 0) <= max_rank:
+                vulns.extend(bucket)
+
+        return vulns
+
+    def dump_pack(self, path: Path) -> None:
+        """
+        Write the parsed data for later stages, atomically
+
+        :param self: ref to class self
+        :param path: output file
+        :type path: Path
+        """
+        write_pack(path, ParsedPack(
+            report_present=self.report_present,
+            failed=self.failed,
+            data=self._data,
+        ), self._spilled)
+
 
-        return [
-            vuln
-            for vuln in vulns.vulnerabilities
-            if self._settings.severity_rank.get(vuln.severity, 0) >= min_rank
-        ]
+def write_pack(
+        path: Path,
+        pack: ParsedPack,
+        spilled: Optional[Iterable[Vulnerability]] = None) -> None:
+    """
+    Write a parse stage pack atomically
+
+    :param path: output file
+    :type path: Path
+    :param pack: parse outcome
+    :type pack: ParsedPack
+    :param spilled: vulnerabilities spilled to disk, streamed into the
+    (empty) vulnerabilities of the pack
+    :type spilled: Optional[Iterable[Vulnerability]]
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")
+    text = pack.model_dump_json(exclude_none=True)
+
+    if spilled is None:
+        tmp.write_text(text)
+    else:
+        # Other values are JSON strings, their quotes would be escaped
+        head, tail = text.split('"vulnerabilities":[]', 1)
+
+        with tmp.open("w") as handle:
+            handle.write(head + '"vulnerabilities":[')
+
+            for i, vuln in enumerate(spilled):
+                handle.write(("," if i else "") +
+                             vuln.model_dump_json(exclude_none=True))
+
+            handle.write("]" + tail)
+
+    os.replace(tmp, path)
+
+
+class PackParser(DCParser):
+    """
+    Parser restoring the data written by ``DCParser.dump_pack`` instead of
+    parsing the report again
+    """
+    _pack_path: Path
+    _pack: Optional[ParsedPack]
+
+    def __init__(self, settings: Settings, pack_path: Path):
+        """
+        Initialises the parser from a pack file.
+
+        :raises ValueError: If the pack is invalid or of a newer version.
+        """
+        self._pack_path = pack_path
+        self._pack = None
+        super().__init__(settings)
+
+    def _load_data(self):
+        """
+        Loads the pack written by the parse stage.
+        """
+        try:
+            self._pack = ParsedPack.model_validate_json(
+                self._pack_path.read_bytes())
+        except ValidationError as e:
+            raise ValueError(f"Invalid pack {self._pack_path}: {e}")
+
+        if self._pack.version > PACK_VERSION:
+            raise ValueError(
+                f"Pack {self._pack_path} has version {self._pack.version}, "
+                f"this notifier supports up to {PACK_VERSION}")
+
+        self.report_present = self._pack.report_present
+        self.failed = self._pack.failed
+
+    def _parse(self) -> Optional[DataPack]:
+        """
+        The pack already holds the parsed data.
+
+        :param self: ref to class self
+        :return: simplified info
+        :rtype: Optional[DataPack]
+        """
+        return self._pack.data if self._pack else None
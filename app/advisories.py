@@ -0,0 +1,127 @@
+"""
+Resolution of the advisory link shown for a finding
+
+Every reference URL of a vulnerability is ranked against a fixed source
+precedence (vendor advisory, GitHub advisory, OSV, NVD...) and the best one
+wins. When no reference is recognised, the link falls back to the NVD
+(``CVE-*``) or GitHub (``GHSA-*``) page of the id, then to the first
+reference. The same vulnerability repeats across many dependencies of a
+report, so the result is memoised per vulnerability id.
+"""
+
+from __future__ import annotations
+import re
+from typing import List, Optional
+
+from app.models.report_models import Reference
+
+# Most authoritative source first
+SOURCE_PRECEDENCE = (
+    # Vendor / project security advisories, bulletins and announcements
+    re.compile(
+        r"^https?://(?!(?:www\.)?github\.com/advisories/|nvd\.nist\.gov/)"
+        r"[^/]+/.*(?:security[-_/]?(?:advisor|bulletin|announce)"
+        r"|/advisor(?:y|ies)/)", re.IGNORECASE),
+    # GitHub advisory database and repository advisories
+    re.compile(
+        r"^https?://(?:www\.)?github\.com/(?:advisories"
+        r"|[^/]+/[^/]+/security/advisories)/GHSA-", re.IGNORECASE),
+    re.compile(r"^https?://osv\.dev/vulnerability/", re.IGNORECASE),
+    re.compile(r"^https?://nvd\.nist\.gov/vuln/detail/", re.IGNORECASE),
+    re.compile(r"^https?://(?:www\.)?cve\.(?:org|mitre\.org)/",
+               re.IGNORECASE),
+    re.compile(r"^https?://ossindex\.sonatype\.org/vulnerability/",
+               re.IGNORECASE),
+    # Anything that still looks like an advisory page
+    re.compile(r"advisor|vuln|detail", re.IGNORECASE),
+)
+NVD_URL = "https://nvd.nist.gov/vuln/detail/{}"
+GHSA_URL = "https://github.com/advisories/{}"
+
+_CVE_ID = re.compile(r"CVE-\d{4}-\d{4,}", re.IGNORECASE)
+_GHSA_ID = re.compile(r"GHSA(?:-[23456789cfghjmpqrvwx]{4}){3}", re.IGNORECASE)
+
+
+def _rank(url: str) -> int:
+    for rank, pattern in enumerate(SOURCE_PRECEDENCE):
+        if pattern.search(url):
+            return rank
+
+    return len(SOURCE_PRECEDENCE)
+
+
+def fallback_url(vuln_id: str) -> str:
+    """
+    Canonical page of a vulnerability id
+
+    :param vuln_id: vulnerability id
+    :type vuln_id: str
+    :return: NVD page of a CVE, GitHub page of a GHSA, empty otherwise
+    :rtype: str
+    """
+    if _CVE_ID.fullmatch(vuln_id):
+        return NVD_URL.format(vuln_id.upper())
+
+    if _GHSA_ID.fullmatch(vuln_id):
+        return GHSA_URL.format(vuln_id)
+
+    return ""
+
+
+class AdvisoryResolver:
+    """
+    Picks the advisory link of each finding, one resolution per
+    vulnerability id
+    """
+    _memo: dict[str, str]
+
+    def __init__(self):
+        self._memo = {}
+
+    def resolve(
+            self,
+            vuln_id: Optional[str],
+            refs: List[Reference]) -> str:
+        """
+        Best advisory URL of a vulnerability
+
+        :param self: ref to class self
+        :param vuln_id: vulnerability id (``name`` in the report), None to
+        resolve without memoising
+        :type vuln_id: Optional[str]
+        :param refs: references of the vulnerability
+        :type refs: List[Reference]
+        :return: advisory URL, empty when there is none
+        :rtype: str
+        """
+        if vuln_id and vuln_id in self._memo:
+            return self._memo[vuln_id]
+
+        best = ""
+        best_rank = len(SOURCE_PRECEDENCE)
+
+        for ref in refs:
+            url = (ref.url or "").strip()
+
+            if not url:
+                continue
+
+            rank = _rank(url)
+
+            if rank < best_rank:
+                best, best_rank = url, rank
+
+                if not rank:
+                    break
+
+        if not best:
+            best = fallback_url(vuln_id or "") or next(
+                (ref.url.strip() for ref in refs if (ref.url or "").strip()),
+                "")
+
+        # Without references the fallback is as cheap as the memo, and an
+        # occurrence that has some must not be masked by it
+        if vuln_id and refs:
+            self._memo[vuln_id] = best
+
+        return best
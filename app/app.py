@@ -1,29 +1,254 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional
+
+from app import digest, gate, jobs, memory, package_index, rollup, summary
 from app.DCParser import DCParser
 from app.notifier_type.DiscordNotifier import DiscordNotifier
-from settings import Settings
-from utils.common import err
+from app.notifier_type.delivery import use_api_base
+from app.outbox import Outbox, replay
+from app.profiler import Profiler
+from app.routing import resolve_routes
+from settings import Settings, WebhookRoute
+from utils.common import err, in_context, log
 
 
 def run_notifier(settings: Settings) -> int:
     """
     Core notifier function
 
+    Safe to call concurrently from several threads or tasks with different
+    settings, every call only uses its own.
+
     :param settings: settings derived from env vars
     :type settings: Settings
     :return: software exit code
     :rtype: int
     """
+    with settings.activate():
+        return _run_notifier(settings)
+
+
+def _run_notifier(settings: Settings) -> int:
     parser = None
+    profiler = Profiler(settings)
+    routes = resolve_routes(settings)
+    code = 0
+
+    # Nothing to notify or write: stream the report up to the first finding
+    if gate.is_gate_only(settings, bool(routes)):
+        with profiler.phase("gate"):
+            return gate.run_gate(settings)
 
     if settings.report_json.exists():
-        parser = DCParser(settings)
+        with profiler.phase("parse"):
+            parser = DCParser(settings)
     else:
         err("Can't resolve the json report in the path location: ",
             str(settings.report_json))
 
-    if settings.discord_webhook_url:
-        notifier = DiscordNotifier(settings, parser)
+    with profiler.phase("summary"):
+        summary.write_summary(settings, parser)
+
+    with profiler.phase("index"):
+        package_index.write_index(settings, parser)
+
+    if routes and settings.digest_window_minutes > 0:
+        code = digest.spool(settings, parser, routes)
+    elif routes:
+        with profiler.phase("notify"):
+            code = _notify_routes(settings, parser, routes)
+
+    code = max(code, gate.gate_exit_code(settings, parser))
+    memory.log_peak_rss(settings)
+
+    return code
+
+
+def _notify_routes(
+        settings: Settings,
+        parser: Optional[DCParser],
+        routes: list[WebhookRoute]) -> int:
+    """
+    Deliver the run to every matched route, concurrently
+
+    :param settings: settings derived from env vars
+    :type settings: Settings
+    :param parser: parsed report, shared read-only by all routes
+    :type parser: Optional[DCParser]
+    :param routes: routes resolved for this run
+    :type routes: list[WebhookRoute]
+    :return: highest exit code of the deliveries
+    :rtype: int
+    """
+    if len(routes) == 1:
+        return DiscordNotifier(settings, parser, routes[0]).notify()
+
+    def deliver(route: WebhookRoute) -> int:
+        try:
+            return DiscordNotifier(settings, parser, route).notify()
+        except Exception as e:
+            err(f"Route '{route.name}' failed: ", e)
+            return 1
+
+    with ThreadPoolExecutor(max_workers=len(routes)) as pool:
+        return max(pool.map(in_context(deliver), routes))
+
+
+def run_replay(settings: Settings) -> int:
+    """
+    Deliver the messages queued in the outbox
+
+    :param settings: settings derived from env vars
+    :type settings: Settings
+    :return: software exit code, 1 if messages are left in the outbox
+    :rtype: int
+    """
+    if not settings.outbox_dir:
+        err("DC_OUTBOX_DIR is not set, nothing to replay.")
+        return 1
+
+    use_api_base(settings.discord_api_base)
+
+    _, left = replay(
+        Outbox(settings.outbox_dir),
+        interval=settings.replay_interval_ms / 1000,
+        retries=settings.send_retries,
+        backoff=settings.retry_backoff_ms / 1000)
+
+    if left:
+        log(f"{left} message(s) remain queued in {settings.outbox_dir}.")
+
+    return 1 if left else 0
+
+
+def run_digest(settings: Settings, serve: bool, force: bool) -> int:
+    """
+    Post the digests of ended windows
+
+    :param settings: settings derived from env vars
+    :type settings: Settings
+    :param serve: keep running and flush at every window boundary
+    :type serve: bool
+    :param force: flush windows that are still open
+    :type force: bool
+    :return: software exit code
+    :rtype: int
+    """
+    return digest.run_scheduler(settings, serve, force)
+
 
-        return notifier.notify()
+def run_submit(settings: Settings) -> int:
+    """
+    Queue the report in the worker spool instead of notifying
+
+    :param settings: settings derived from env vars
+    :type settings: Settings
+    :return: software exit code
+    :rtype: int
+    """
+    return jobs.submit(settings)
+
+
+def run_worker(settings: Settings, processes: int, once: bool) -> int:
+    """
+    Notify the reports queued in the worker spool
+
+    :param settings: settings derived from env vars
+    :type settings: Settings
+    :param processes: worker processes on this host
+    :type processes: int
+    :param once: exit once the spool is drained
+    :type once: bool
+    :return: software exit code
+    :rtype: int
+    """
+    return jobs.run_workers(settings, processes, once)
+
+
+def run_rollup(
+        settings: Settings,
+        inputs: List[Path],
+        out: Optional[Path],
+        notify: bool,
+        workers: int,
+        top: int) -> int:
+    """
+    Aggregate many run summaries / reports into one organisation view
+
+    :param settings: settings derived from env vars
+    :type settings: Settings
+    :param inputs: summaries, reports or directories holding them
+    :type inputs: List[Path]
+    :param out: file sink (JSON, or Markdown for ``.md``)
+    :type out: Optional[Path]
+    :param notify: post the rollup to DISCORD_WEBHOOK_URL
+    :type notify: bool
+    :param workers: worker processes, 0 = one per CPU
+    :type workers: int
+    :param top: length of the ranked lists
+    :type top: int
+    :return: software exit code
+    :rtype: int
+    """
+    result = rollup.run_rollup(
+        settings, inputs, workers=workers, top=top)
+    log(f"Rolled up {result.projects} project(s) from {result.inputs} "
+        f"input(s), {result.failed} failed.")
+
+    if out:
+        rollup.write_rollup(result, out)
+        log(f"Rollup written to {out}.")
+
+    if notify:
+        if not settings.discord_webhook_url:
+            err("DISCORD_WEBHOOK_URL is required to post the rollup.")
+            return 1
+
+        return DiscordNotifier(settings, None).notify_rollup(result)
+
+    if not out:
+        print(result.model_dump_json(indent=2))
 
     return 0
+
+
+def run_query(
+        settings: Settings,
+        kind: str,
+        pattern: str,
+        as_json: bool,
+        limit: int) -> int:
+    """
+    Look up the runs shipping a package, file or vulnerability
+
+    :param settings: settings derived from env vars
+    :type settings: Settings
+    :param kind: ``package``, ``file`` or ``cve``
+    :type kind: str
+    :param pattern: exact term or glob
+    :type pattern: str
+    :param as_json: print JSON lines instead of a table
+    :type as_json: bool
+    :param limit: maximum number of runs listed
+    :type limit: int
+    :return: software exit code, 1 if nothing matched
+    :rtype: int
+    """
+    if not settings.index_path:
+        err("DC_INDEX_PATH is not set, there is no index to query.")
+        return 2
+
+    hits = package_index.PackageIndex(settings.index_path).lookup(
+        kind, pattern, limit)
+
+    for hit in hits:
+        if as_json:
+            print(hit.model_dump_json())
+        else:
+            print(f"{hit.project}\t{hit.ref}\t{hit.pipeline_id or '-'}\t"
+                  f"{', '.join(hit.terms)}")
+
+    log(f"{len(hits)} run(s) match {kind} '{pattern}'.")
+
+    return 0 if hits else 1
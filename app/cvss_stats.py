@@ -0,0 +1,210 @@
+"""
+CVSS score statistics per severity
+
+Scores are collected column-wise while the report is parsed: one typed
+``array('d')`` per CVSS version (NaN when a finding is unscored) and an
+``array('B')`` of severity codes, 33 bytes per finding. The statistics are
+then computed in one pass per severity, vectorised with NumPy when it is
+installed (the arrays are shared without copying) and with the stdlib
+otherwise.
+"""
+
+from __future__ import annotations
+import math
+from array import array
+from bisect import bisect_left
+from itertools import compress
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+# Score columns: the best available score first, then each CVSS version
+COLUMNS = ("best", "v2", "v3", "v4")
+PERCENTILES = (50, 90, 99)
+# Histogram bins of one score point: [0, 1), [1, 2) ... [9, 10]
+HISTOGRAM_BINS = 10
+
+NAN = float("nan")
+
+
+class ScoreStats(BaseModel):
+    count: int
+    max: float
+    mean: float
+    p50: float
+    p90: float
+    p99: float
+    histogram: List[int]
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        return None
+
+    return numpy
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    """
+    Linear interpolation between closest ranks, as ``numpy.percentile``
+    """
+    pos = (len(ordered) - 1) * q / 100
+    low = math.floor(pos)
+    high = min(low + 1, len(ordered) - 1)
+
+    return ordered[low] + (ordered[high] - ordered[low]) * (pos - low)
+
+
+def _stats(
+        count: int,
+        top: float,
+        mean: float,
+        percentiles: List[float],
+        histogram: List[int]) -> ScoreStats:
+    p50, p90, p99 = (round(p, 2) for p in percentiles)
+
+    return ScoreStats(
+        count=count,
+        max=round(top, 1),
+        mean=round(mean, 2),
+        p50=p50,
+        p90=p90,
+        p99=p99,
+        histogram=histogram,
+    )
+
+
+class ScoreColumns:
+    """
+    Column store of the CVSS scores of all findings of a report
+    """
+    _severities: array
+    _columns: dict[str, array]
+    _codes: dict[str, int]
+
+    def __init__(self):
+        self._severities = array("B")
+        self._columns = {name: array("d") for name in COLUMNS}
+        self._codes = {}
+
+    def __len__(self) -> int:
+        return len(self._severities)
+
+    def add(
+            self,
+            severity: str,
+            v2: Optional[float],
+            v3: Optional[float],
+            v4: Optional[float]) -> None:
+        """
+        Append the scores of one finding
+
+        :param self: ref to class self
+        :param severity: lower case severity
+        :type severity: str
+        :param v2: CVSS v2 score
+        :type v2: Optional[float]
+        :param v3: CVSS v3 base score
+        :type v3: Optional[float]
+        :param v4: CVSS v4 base score
+        :type v4: Optional[float]
+        """
+        code = self._codes.setdefault(severity, len(self._codes))
+        best = next((s for s in (v3, v4, v2) if s is not None), None)
+
+        self._severities.append(code)
+
+        for name, score in zip(COLUMNS, (best, v2, v3, v4)):
+            self._columns[name].append(NAN if score is None else score)
+
+    def compute(self) -> dict[str, dict[str, ScoreStats]]:
+        """
+        Statistics of every score column per severity
+
+        :param self: ref to class self
+        :return: column name to severity to statistics, severities and
+        columns without any score are left out
+        :rtype: dict[str, dict[str, ScoreStats]]
+        """
+        numpy = _numpy()
+
+        if numpy is not None:
+            return self._compute_numpy(numpy)
+
+        return self._compute_stdlib()
+
+    def _compute_numpy(self, np) -> dict[str, dict[str, ScoreStats]]:
+        severities = np.frombuffer(self._severities, dtype=np.uint8)
+        masks = {
+            severity: severities == code
+            for severity, code in self._codes.items()
+        }
+        result: dict[str, dict[str, ScoreStats]] = {}
+
+        for name, column in self._columns.items():
+            scores = np.frombuffer(column, dtype=np.float64)
+            scored = ~np.isnan(scores)
+            per_severity: dict[str, ScoreStats] = {}
+
+            for severity, mask in masks.items():
+                values = scores[mask & scored]
+
+                if not values.size:
+                    continue
+
+                bins = np.clip(values.astype(np.int64), 0, HISTOGRAM_BINS - 1)
+                per_severity[severity] = _stats(
+                    int(values.size),
+                    float(values.max()),
+                    float(values.mean()),
+                    [float(p) for p in np.percentile(values, PERCENTILES)],
+                    np.bincount(bins, minlength=HISTOGRAM_BINS).tolist(),
+                )
+
+            if per_severity:
+                result[name] = per_severity
+
+        return result
+
+    def _compute_stdlib(self) -> dict[str, dict[str, ScoreStats]]:
+        # One byte mask per severity, built and applied at C speed
+        raw = self._severities.tobytes()
+        masks = {
+            severity: raw.translate(bytes(
+                int(i == code) for i in range(256)))
+            for severity, code in self._codes.items()
+        }
+        result: dict[str, dict[str, ScoreStats]] = {}
+
+        for name, column in self._columns.items():
+            per_severity: dict[str, ScoreStats] = {}
+
+            for severity, mask in masks.items():
+                # NaN is the only value not equal to itself
+                values = sorted(
+                    score for score in compress(column, mask)
+                    if score == score)
+
+                if not values:
+                    continue
+
+                # Values are sorted: bin counts are differences of ranks
+                edges = [0] + [
+                    bisect_left(values, edge)
+                    for edge in range(1, HISTOGRAM_BINS)
+                ] + [len(values)]
+
+                per_severity[severity] = _stats(
+                    len(values),
+                    values[-1],
+                    math.fsum(values) / len(values),
+                    [_percentile(values, q) for q in PERCENTILES],
+                    [b - a for a, b in zip(edges, edges[1:])],
+                )
+
+            if per_severity:
+                result[name] = per_severity
+
+        return result
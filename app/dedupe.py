@@ -0,0 +1,167 @@
+"""
+Idempotent sends: remember recently posted notifications
+
+Retried or re-run pipelines render exactly the same messages. Each
+notification is reduced to a digest of its rendered payloads (without the
+embed ``timestamp``, which changes on every run, and of the attachment
+paths, unique per run) with the content of the attached files, the
+destination webhook and the project / ref. Digests are kept in a small
+JSON file, least recently sent first, bounded in size and age; a
+notification whose digest is found there is not posted again.
+"""
+
+from __future__ import annotations
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from app.notifier_type.renderers import Payload
+from settings import Settings
+from utils.common import err, file_lock
+
+# Per-run embed fields excluded from the digest
+VOLATILE_KEYS = ("timestamp",)
+
+
+def notification_digest(
+        webhook_url: str,
+        project: str,
+        ref: str,
+        payloads: List[Payload]) -> str:
+    """
+    Stable digest of a rendered notification
+
+    :param webhook_url: destination webhook
+    :type webhook_url: str
+    :param project: project path or label
+    :type project: str
+    :param ref: commit ref name
+    :type ref: str
+    :param payloads: rendered messages, in order
+    :type payloads: List[Payload]
+    :return: hex digest
+    :rtype: str
+    """
+    digest = hashlib.sha256(
+        "\0".join((webhook_url, project, ref)).encode())
+
+    for payload in payloads:
+        # Attachment paths are unique per run, only their content counts
+        data = payload.model_dump(exclude_none=True, exclude={"files"})
+        data["embeds"] = [
+            {k: v for k, v in embed.items() if k not in VOLATILE_KEYS}
+            for embed in data.get("embeds") or []
+        ]
+        digest.update(json.dumps(
+            data, sort_keys=True, separators=(",", ":"),
+            ensure_ascii=False).encode())
+
+        for path in payload.files:
+            try:
+                with open(path, "rb") as f:
+                    digest.update(hashlib.file_digest(f, "sha256").digest())
+            except OSError:
+                continue
+
+    return digest.hexdigest()[:32]
+
+
+class DedupeStore:
+    _path: Path
+    _size: int
+    _ttl: float
+
+    def __init__(self, path: Path, size: int, ttl: float):
+        """
+        Store of recently sent digests
+
+        :param self: ref to class self
+        :param path: JSON file holding the digests (created on demand)
+        :type path: Path
+        :param size: maximum number of digests kept
+        :type size: int
+        :param ttl: seconds a digest suppresses identical notifications
+        :type ttl: float
+        """
+        self._path = path
+        self._size = max(1, size)
+        self._ttl = ttl
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> Optional[DedupeStore]:
+        """
+        Store configured by DC_DEDUPE_*, None when disabled
+
+        :param settings: settings derived from env vars
+        :type settings: Settings
+        :return: store or None
+        :rtype: Optional[DedupeStore]
+        """
+        if not settings.dedupe_path or settings.dedupe_ttl_minutes <= 0:
+            return None
+
+        return cls(
+            settings.dedupe_path,
+            settings.dedupe_size,
+            settings.dedupe_ttl_minutes * 60)
+
+    @property
+    def _lock_path(self) -> Path:
+        return self._path.with_name(f".{self._path.name}.lock")
+
+    def _load(self, now: float) -> dict[str, float]:
+        """
+        Unexpired digests, oldest first
+        """
+        try:
+            entries = json.loads(self._path.read_text())
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            err("Ignoring unreadable dedupe store: ", e)
+            return {}
+
+        return {
+            key: sent for key, sent in sorted(
+                entries.items(), key=lambda item: item[1])
+            if now - sent < self._ttl
+        }
+
+    def seen(self, digest: str) -> bool:
+        """
+        Whether an identical notification was sent within the TTL
+
+        :param self: ref to class self
+        :param digest: notification digest
+        :type digest: str
+        :return: True if the notification should be skipped
+        :rtype: bool
+        """
+        with file_lock(self._lock_path):
+            return digest in self._load(time.time())
+
+    def remember(self, digest: str) -> None:
+        """
+        Record a sent notification, evicting the least recently sent ones
+        beyond the store size
+
+        :param self: ref to class self
+        :param digest: notification digest
+        :type digest: str
+        """
+        now = time.time()
+
+        with file_lock(self._lock_path):
+            entries = self._load(now)
+            entries.pop(digest, None)
+            entries[digest] = now
+
+            for key in list(entries)[:max(0, len(entries) - self._size)]:
+                del entries[key]
+
+            tmp = self._path.with_name(f".{self._path.name}.tmp")
+            tmp.write_text(json.dumps(entries, separators=(",", ":")))
+            os.replace(tmp, self._path)
@@ -0,0 +1,476 @@
+"""
+Time-window digests: instead of posting one message per pipeline, runs
+append a compact summary to a local spool and a scheduled flush posts one
+combined message per channel and window.
+
+Spool layout (one directory per destination webhook)::
+
+    <DC_DIGEST_DIR>/<channel>/webhook            destination webhook URL
+    <DC_DIGEST_DIR>/<channel>/<window>.jsonl     one DigestEntry per line
+    <DC_DIGEST_DIR>/<channel>/<window>.flushing  window being posted
+    <DC_DIGEST_DIR>/<channel>/<window>.bad       unreadable lines, kept aside
+    <DC_DIGEST_DIR>/<channel>/flush.lock         held by the channel's flusher
+
+``<window>`` is the window start as a unix timestamp; a window is flushed
+once it has ended. Flushers (cron next to ``--serve``, several hosts) skip
+a channel another one is flushing, so a window is posted once.
+"""
+
+from __future__ import annotations
+import datetime
+import hashlib
+import heapq
+import os
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from disnake import SyncWebhook
+from pydantic import BaseModel, ValidationError
+
+from app.DCParser import SEVERITY_ORDER, DCParser, severity_order
+from app.notifier_type.delivery import use_api_base
+from app.notifier_type.renderers import (
+    COUNT_LABELS, MAX_FIELD_VALUE, SEVERITY_LABELS, SEVERITY_SHORT, Payload,
+    add_lines_field, clip)
+from app.summary import SummaryFinding, to_finding
+from app.notifier_type.utils import State, state_colour
+from app.outbox import deliver_or_queue
+from settings import Settings, WebhookRoute
+from utils.common import err, lock_handle, log, try_lock_handle
+
+WEBHOOK_FILE = "webhook"
+SPOOL_SUFFIX = ".jsonl"
+CLAIM_SUFFIX = ".flushing"
+BAD_SUFFIX = ".bad"
+FLUSH_LOCK = "flush.lock"
+DEFAULT_TOP = 10
+
+
+class DigestEntry(BaseModel):
+    project: str
+    ref: str
+    pipeline_url: Optional[str] = None
+    created: float
+    counts: dict[str, int] = {}
+    top: List[SummaryFinding] = []
+    issue: Optional[str] = None
+
+
+def _finding_rank(finding: SummaryFinding) -> tuple[int, float]:
+    return severity_order(finding.severity), -(finding.score or 0.0)
+
+
+def _finding_line(finding: SummaryFinding, projects: int) -> str:
+    ids = ", ".join(finding.ids) or "n/a"
+    link = f"[{ids}]({finding.url})" if finding.url else ids
+    label = SEVERITY_LABELS.get(finding.severity, finding.severity.upper())
+
+    return clip(
+        f"{label} **{finding.dependency}** `{finding.version}` {link} "
+        f"— {projects} project(s)", MAX_FIELD_VALUE)
+
+
+def channel_dir(settings: Settings, webhook_url: str) -> Path:
+    """
+    Spool directory of a destination webhook
+
+    :param settings: settings derived from env vars
+    :type settings: Settings
+    :param webhook_url: destination webhook
+    :type webhook_url: str
+    :return: directory holding the channel's windows
+    :rtype: Path
+    """
+    digest = hashlib.sha256(webhook_url.encode()).hexdigest()[:16]
+    return settings.digest_dir / digest
+
+
+def build_entry(
+        settings: Settings,
+        parser: Optional[DCParser],
+        route: WebhookRoute) -> DigestEntry:
+    """
+    Summarise this run for one route
+
+    :param settings: settings derived from env vars
+    :type settings: Settings
+    :param parser: parsed report, None if the report was missing
+    :type parser: Optional[DCParser]
+    :param route: route the entry is spooled for
+    :type route: WebhookRoute
+    :return: digest entry
+    :rtype: DigestEntry
+    """
+    entry = DigestEntry(
+        project=(settings.ci_project_path or settings.project_label
+                 or "project"),
+        ref=settings.ci_commit_ref_name or "ref",
+        pipeline_url=settings.pipeline_url,
+        created=time.time(),
+    )
+
+    if not parser:
+        entry.issue = "JSON report missing"
+        return entry
+
+    if parser.failed:
+        entry.issue = "parser failed"
+        return entry
+
+    data = parser.get_data()
+    vulns = parser.filter_by_min_severity(
+        route.min_severity, route.max_severity) or []
+    top = settings.max_items or DEFAULT_TOP
+
+    entry.counts = dict(data.counts) if data else {}
+    entry.top = [to_finding(vuln) for vuln in vulns[:top]]
+
+    return entry
+
+
+def _append_locked(path: Path, line: str) -> None:
+    """
+    Append a line to a spool file, safe against a concurrent flush
+
+    The flush renames the file before reading it; a writer that opened the
+    file just before the rename notices it no longer owns the path once it
+    holds the lock and retries on the new file.
+    """
+    while True:
+        with path.open("a", encoding="utf-8") as f:
+            lock_handle(f)
+
+            try:
+                current = path.stat().st_ino
+            except FileNotFoundError:
+                current = None
+
+            if current == os.fstat(f.fileno()).st_ino:
+                f.write(line)
+                f.flush()
+                return
+
+
+def spool(
+        settings: Settings,
+        parser: Optional[DCParser],
+        routes: List[WebhookRoute]) -> int:
+    """
+    Append this run to the current window of every route's channel
+
+    :param settings: settings derived from env vars
+    :type settings: Settings
+    :param parser: parsed report, None if the report was missing
+    :type parser: Optional[DCParser]
+    :param routes: routes resolved for this run
+    :type routes: List[WebhookRoute]
+    :return: software exit code
+    :rtype: int
+    """
+    window = settings.digest_window_minutes * 60
+    start = int(time.time() // window * window)
+
+    for route in routes:
+        entry = build_entry(settings, parser, route)
+
+        if (
+            settings.routes and
+            not entry.top and
+            not entry.issue and
+            not settings.notify_on_zero
+        ):
+            continue
+
+        directory = channel_dir(settings, route.webhook_url)
+        directory.mkdir(parents=True, exist_ok=True)
+        (directory / WEBHOOK_FILE).write_text(route.webhook_url)
+        _append_locked(
+            directory / f"{start}{SPOOL_SUFFIX}",
+            entry.model_dump_json(exclude_none=True) + "\n")
+
+    log("Run added to the digest spool.")
+
+    return 0
+
+
+def merge_entries(
+        entries: List[DigestEntry],
+        top: int) -> tuple[dict[str, int], List[tuple[SummaryFinding, set]]]:
+    """
+    Merge the entries of a window
+
+    Counts are summed per severity. Findings are de-duplicated across
+    projects by (dependency, version, ids) and the ``top`` most severe are
+    kept, each with the set of projects it affects.
+
+    :param entries: entries of one channel window
+    :type entries: List[DigestEntry]
+    :param top: number of findings to keep
+    :type top: int
+    :return: merged counts and the top findings with their projects
+    :rtype: tuple[dict[str, int], List[tuple[SummaryFinding, set]]]
+    """
+    counts: dict[str, int] = {}
+    findings: dict[tuple, tuple[SummaryFinding, set]] = {}
+
+    for entry in entries:
+        for severity, count in entry.counts.items():
+            counts[severity] = counts.get(severity, 0) + count
+
+        for finding in entry.top:
+            key = (finding.dependency, finding.version, tuple(finding.ids))
+            merged = findings.setdefault(key, (finding, set()))
+            merged[1].add(entry.project)
+
+    ranked = heapq.nsmallest(
+        top, findings.values(),
+        key=lambda item: (*_finding_rank(item[0]), -len(item[1])))
+
+    return counts, ranked
+
+
+def render_digest(
+        settings: Settings,
+        window_start: int,
+        entries: List[DigestEntry]) -> Payload:
+    """
+    Render one combined message for a channel window
+
+    :param settings: settings derived from env vars
+    :type settings: Settings
+    :param window_start: window start (unix timestamp)
+    :type window_start: int
+    :param entries: entries of the window
+    :type entries: List[DigestEntry]
+    :return: single webhook payload
+    :rtype: Payload
+    """
+    counts, ranked = merge_entries(
+        entries, settings.max_items or DEFAULT_TOP)
+    projects: dict[str, dict[str, int]] = {}
+    issues: List[str] = []
+
+    for entry in entries:
+        totals = projects.setdefault(entry.project, {})
+
+        for severity, count in entry.counts.items():
+            totals[severity] = totals.get(severity, 0) + count
+
+        if entry.issue:
+            issues.append(f"`{entry.project}` (`{entry.ref}`): {entry.issue}")
+
+    start = datetime.datetime.fromtimestamp(
+        window_start, datetime.timezone.utc)
+    end = start + datetime.timedelta(minutes=settings.digest_window_minutes)
+    vulnerable = any(
+        counts.get(s, 0) for s in ("critical", "high"))
+    state = State.VULNERABLE if vulnerable else (
+        State.ISSUE if issues else State.OK)
+
+    embed: dict = {
+        "type": "rich",
+        "title": (f"📋 Dependency-Check digest "
+                  f"{start:%Y-%m-%d %H:%M}–{end:%H:%M} UTC"),
+        "description": (f"{len(entries)} pipeline(s) across "
+                        f"{len(projects)} project(s)"),
+        "color": state_colour(state).value,
+        "timestamp": end.isoformat(),
+        "author": {"name": "OWASP | DC Notifier",
+                   "icon_url": settings.dc_icon},
+        "fields": [],
+    }
+
+    if counts:
+        add_lines_field(embed, "Vulnerabilities Count", [
+            f"{COUNT_LABELS.get(s, s)}: `{c}`" for s, c in counts.items()])
+
+    add_lines_field(embed, "Top findings", [
+        _finding_line(finding, len(where)) for finding, where in ranked])
+
+    by_risk = sorted(
+        projects.items(),
+        key=lambda item: tuple(-item[1].get(s, 0) for s in SEVERITY_ORDER))
+    add_lines_field(embed, "Projects", [
+        f"`{name}` " + " ".join(
+            f"{SEVERITY_SHORT.get(s, s.upper())}:{c}"
+            for s, c in totals.items() if c)
+        for name, totals in by_risk
+    ])
+
+    if issues:
+        add_lines_field(embed, "Issues", issues)
+
+    return Payload(embeds=[embed])
+
+
+def flush_due(settings: Settings, force: bool = False) -> int:
+    """
+    Post one digest per channel for every window that has ended
+
+    :param settings: settings derived from env vars
+    :type settings: Settings
+    :param force: flush open windows too
+    :type force: bool
+    :return: number of digests that could not be delivered
+    :rtype: int
+    """
+    if not settings.digest_dir.exists():
+        return 0
+
+    window = settings.digest_window_minutes * 60
+    now = time.time()
+    failed = 0
+
+    for directory in sorted(p for p in settings.digest_dir.iterdir()
+                            if p.is_dir()):
+        webhook_file = directory / WEBHOOK_FILE
+
+        if not webhook_file.exists():
+            continue
+
+        webhook_url = webhook_file.read_text().strip()
+
+        with (directory / FLUSH_LOCK).open("a") as lock:
+            if not try_lock_handle(lock):
+                log(f"Digest channel {directory.name} is being flushed by "
+                    "another process, skipped.")
+                continue
+
+            failed += _flush_channel(
+                settings, directory, webhook_url, now - window, force)
+
+    return failed
+
+
+def _flush_channel(
+        settings: Settings,
+        directory: Path,
+        webhook_url: str,
+        ended: float,
+        force: bool) -> int:
+    """
+    Flush the ended windows of a channel whose flush lock is held
+
+    :return: number of digests that could not be delivered
+    """
+    failed = 0
+
+    # Windows interrupted mid-flush are picked up again first
+    claims = sorted(directory.glob(f"*{CLAIM_SUFFIX}"))
+    spools = sorted(directory.glob(f"*{SPOOL_SUFFIX}"))
+
+    for path in claims + spools:
+        window_start = int(path.name.split(".")[0])
+
+        if path.suffix == SPOOL_SUFFIX:
+            if not force and window_start > ended:
+                continue
+
+            claimed = path.with_suffix(CLAIM_SUFFIX)
+
+            try:
+                os.replace(path, claimed)
+            except FileNotFoundError:
+                # Claimed by a flusher that held the lock before us
+                continue
+
+            path = claimed
+
+        try:
+            if not _flush_window(settings, webhook_url, window_start, path):
+                failed += 1
+        except FileNotFoundError:
+            continue
+
+    return failed
+
+
+def _flush_window(
+        settings: Settings,
+        webhook_url: str,
+        window_start: int,
+        path: Path) -> bool:
+    """
+    Deliver a claimed window file and remove it once handled
+
+    Lines that cannot be read (e.g. cut by a writer killed mid-append) are
+    moved to a ``.bad`` file next to it instead of blocking the window.
+    """
+    entries: List[DigestEntry] = []
+    bad: List[str] = []
+
+    with path.open(encoding="utf-8") as f:
+        # wait for writers that opened the file before it was claimed
+        lock_handle(f)
+
+        for line in f:
+            if not line.strip():
+                continue
+
+            try:
+                entries.append(DigestEntry.model_validate_json(line))
+            except ValidationError:
+                bad.append(line if line.endswith("\n") else line + "\n")
+
+    if bad:
+        quarantine = path.with_suffix(BAD_SUFFIX)
+
+        with quarantine.open("a", encoding="utf-8") as f:
+            f.writelines(bad)
+
+        err(f"{len(bad)} unreadable line(s) of digest window "
+            f"{window_start} moved to {quarantine}.")
+        # Already moved aside, not again when the window is retried
+        tmp = path.with_name(f".{path.name}.tmp")
+        tmp.write_text("".join(
+            e.model_dump_json(exclude_none=True) + "\n" for e in entries),
+            encoding="utf-8")
+        os.replace(tmp, path)
+
+    if entries:
+        payload = render_digest(settings, window_start, entries)
+
+        if not deliver_or_queue(
+                settings, SyncWebhook.from_url(webhook_url), webhook_url,
+                [payload]):
+            err(f"Digest window {window_start} kept for the next flush.")
+            return False
+
+    path.unlink(missing_ok=True)
+
+    return True
+
+
+def run_scheduler(settings: Settings, serve: bool, force: bool) -> int:
+    """
+    Flush due windows once, or keep flushing at every window boundary
+
+    :param settings: settings derived from env vars
+    :type settings: Settings
+    :param serve: keep running and flush after every window
+    :type serve: bool
+    :param force: flush windows that are still open (single run only)
+    :type force: bool
+    :return: software exit code
+    :rtype: int
+    """
+    if settings.digest_window_minutes <= 0:
+        err("DC_DIGEST_WINDOW_MINUTES must be set for digests.")
+        return 1
+
+    use_api_base(settings.discord_api_base)
+
+    if not serve:
+        return 1 if flush_due(settings, force=force) else 0
+
+    window = settings.digest_window_minutes * 60
+    log(f"Digest scheduler flushing every {settings.digest_window_minutes} "
+        "minute(s).")
+
+    try:
+        while True:
+            flush_due(settings)
+            time.sleep(window - time.time() % window + 1)
+    except KeyboardInterrupt:
+        return 0
@@ -0,0 +1,190 @@
+"""
+Full findings file attached when a message cannot show every finding
+
+Messages are bounded (DC_MAX_ITEMS, Discord's embed and content limits),
+so the complete list of a route goes into a file instead: CSV and / or a
+Markdown table (DC_FINDINGS_FILE). Rows are streamed straight from the
+parsed findings to disk, one line at a time, so the file is never built in
+memory. A file above the upload limit is gzipped, also streamed; one that
+still does not fit is not attached.
+
+Queued (outbox) and staged (render / send) payloads reference their files
+by path, so every run writes its own: the name carries the pipeline id and
+a hash of the content, and a later run or a concurrent pipeline sharing
+the directory never replaces the file of another.
+"""
+
+from __future__ import annotations
+import csv
+import gzip
+import hashlib
+import os
+import re
+import shutil
+from pathlib import Path
+from typing import IO, Iterable, Iterator, List, Sequence
+
+from app.DCParser import Vulnerability
+from app.notifier_type.renderers import fmt_score
+from settings import FindingsFormat, Settings, WebhookRoute
+from utils.common import err, log
+
+COLUMNS = (
+    "severity", "dependency", "version", "fixed_in", "ids", "score",
+    "cvss_v2", "cvss_v3", "cvss_v4", "url",
+)
+EXTENSIONS = {
+    FindingsFormat.CSV: "csv",
+    FindingsFormat.MARKDOWN: "md",
+}
+# Buffer of the file writes, rows are small
+WRITE_BUFFER = 1 << 16
+# Hex digits of the content hash in the file names
+NAME_HASH = 12
+_UNSAFE = re.compile(r"[^\w.-]+")
+
+
+def _rows(vulns: Iterable[Vulnerability]) -> Iterator[tuple[str, ...]]:
+    for vuln in vulns:
+        yield (
+            vuln.severity,
+            vuln.dependency,
+            vuln.version,
+            vuln.fixed_in or "",
+            " ".join(vuln.ids),
+            fmt_score(vuln.score) or "",
+            fmt_score(vuln.scorev2) or "",
+            fmt_score(vuln.scorev3) or "",
+            fmt_score(vuln.scorev4) or "",
+            vuln.url,
+        )
+
+
+def write_csv(handle: IO[str], vulns: Iterable[Vulnerability]) -> None:
+    """
+    Stream the findings as CSV, one row per finding
+
+    :param handle: text handle opened with ``newline=""``
+    :type handle: IO[str]
+    :param vulns: findings, in message order
+    :type vulns: Iterable[Vulnerability]
+    """
+    writer = csv.writer(handle)
+    writer.writerow(COLUMNS)
+    writer.writerows(_rows(vulns))
+
+
+def write_markdown(
+        handle: IO[str],
+        vulns: Iterable[Vulnerability],
+        title: str) -> None:
+    """
+    Stream the findings as a Markdown table, one line per finding
+
+    :param handle: text handle
+    :type handle: IO[str]
+    :param vulns: findings, in message order
+    :type vulns: Iterable[Vulnerability]
+    :param title: heading of the document
+    :type title: str
+    """
+    handle.write(f"# {title}\n\n")
+    handle.write("| " + " | ".join(COLUMNS) + " |\n")
+    handle.write("|" + "---|" * len(COLUMNS) + "\n")
+    # Cells are joined with NUL so a row is escaped with a few whole-line
+    # replaces instead of one per cell
+    handle.writelines(
+        "| " + "\0".join(row).replace("|", "\\|").replace("\n", " ")
+        .replace("\r", " ").replace("\0", " | ") + " |\n"
+        for row in _rows(vulns))
+
+
+def _gzip(path: Path) -> Path:
+    """
+    Replace a file by its gzipped copy, streamed
+    """
+    target = path.with_name(path.name + ".gz")
+    tmp = target.with_name(f".{target.name}.tmp")
+
+    with path.open("rb") as src, gzip.open(tmp, "wb", compresslevel=6) as dst:
+        shutil.copyfileobj(src, dst, WRITE_BUFFER)
+
+    os.replace(tmp, target)
+    path.unlink()
+
+    return target
+
+
+def write_findings(
+        settings: Settings,
+        route: WebhookRoute,
+        vulns: Sequence[Vulnerability],
+        title: str) -> List[str]:
+    """
+    Write the findings files of a route, ready to attach
+
+    :param settings: settings derived from env vars
+    :type settings: Settings
+    :param route: route the findings were selected for
+    :type route: WebhookRoute
+    :param vulns: every finding of the route, in message order
+    :type vulns: Sequence[Vulnerability]
+    :param title: heading of the Markdown file
+    :type title: str
+    :return: paths of the files to attach, empty when disabled or nothing
+    fits the upload limit
+    :rtype: List[str]
+    """
+    if not settings.findings_formats or not vulns:
+        return []
+
+    directory = settings.findings_dir or settings.report_json.parent
+    name = _UNSAFE.sub("_", route.name) or "default"
+    run = _UNSAFE.sub("_", settings.ci_pipeline_id) or "local"
+    limit = settings.upload_limit_mb * 1024 * 1024
+    used = 0
+    paths: List[str] = []
+
+    for fmt in settings.findings_formats:
+        stem = f"dc-findings-{name}-{run}"
+        ext = EXTENSIONS[fmt]
+        tmp = directory / f".{stem}.{os.getpid()}.{ext}.tmp"
+
+        try:
+            directory.mkdir(parents=True, exist_ok=True)
+
+            with tmp.open("w", encoding="utf-8", newline="",
+                          buffering=WRITE_BUFFER) as handle:
+                if fmt == FindingsFormat.CSV:
+                    write_csv(handle, vulns)
+                else:
+                    write_markdown(handle, vulns, title)
+
+            with tmp.open("rb") as handle:
+                tag = hashlib.file_digest(handle, "sha256").hexdigest()
+
+            path = directory / f"{stem}-{tag[:NAME_HASH]}.{ext}"
+            os.replace(tmp, path)
+            path.with_name(path.name + ".gz").unlink(missing_ok=True)
+
+            if path.stat().st_size > limit - used:
+                path = _gzip(path)
+        except OSError as e:
+            err("Could not write the findings file: ", e)
+            continue
+
+        size = path.stat().st_size
+
+        if size > limit - used:
+            err(f"Findings file {path} ({size} bytes) exceeds the upload "
+                f"limit of {settings.upload_limit_mb} MB, not attached.")
+            continue
+
+        used += size
+        paths.append(str(path))
+
+    if paths:
+        log(f"Full list of {len(vulns)} finding(s) attached "
+            f"({', '.join(Path(p).name for p in paths)}).")
+
+    return paths
@@ -0,0 +1,261 @@
+"""
+Pipeline gate implementing DC_FAIL_ON_VULN
+
+A gate-only run (nothing to notify, no sidecar or index to write) does not
+need the parsed report, only whether one finding reaches MIN_SEVERITY. The
+report is then streamed and the scan stops at the first qualifying
+``dependencies[].vulnerabilities[].severity``, so a large report with an
+early critical is gated without being loaded. ``ijson`` is used when
+installed, otherwise a chunked regex tokenizer tracks the same path.
+"""
+
+from __future__ import annotations
+import json
+import re
+from pathlib import Path
+from typing import TYPE_CHECKING, BinaryIO, Iterator, List, Optional
+
+from settings import Settings
+from utils.common import err, log
+
+if TYPE_CHECKING:
+    # Only for annotations: the gate-only path must stay free of the
+    # report models (and of disnake) to start in milliseconds
+    from app.DCParser import DCParser
+
+CHUNK_SIZE = 1 << 20
+
+# Exit code of a run failed by the gate
+GATE_EXIT_CODE = 1
+
+# Optional whitespace, then a string, a structural character or a bare
+# literal; a lone quote is a string cut by the chunk boundary
+_TOKEN = re.compile(
+    rb'\s*+(?:"(?:[^"\\]++|\\.)*+"|[{}\[\]:,]|[^\s{}\[\]:,"]++|")')
+# Everything up to the next bracket, strings included
+_SKIP = re.compile(rb'(?:"(?:[^"\\]++|\\.)*+"|[^"{}\[\]]++)*+')
+_PATH = (b"dependencies", None, b"vulnerabilities", None, b"severity")
+_OBJECT = b"{"
+_ARRAY = b"["
+
+
+def _ijson():
+    try:
+        import ijson
+    except ImportError:
+        return None
+
+    return ijson
+
+
+def _string(token: bytes) -> str:
+    """
+    Value of a JSON string token, escapes decoded
+    """
+    if b"\\" in token:
+        return json.loads(token)
+
+    return token[1:-1].decode(errors="replace")
+
+
+def _scan_severities(handle: BinaryIO) -> Iterator[str]:
+    """
+    Yield the finding severities of a report in document order, reading it
+    in chunks and tracking the JSON path with a minimal tokenizer
+
+    :param handle: report opened in binary mode
+    :type handle: BinaryIO
+    :return: severities of ``dependencies[].vulnerabilities[]``
+    :rtype: Iterator[str]
+    :raises ValueError: the report is truncated or not a JSON document
+    """
+    # One [kind, current key] frame per open container on the path; any
+    # other container is skipped bracket by bracket without tokenizing it
+    stack: List[list] = []
+    skip = 0
+    expect_key = False
+    started = False
+    carry = b""
+
+    while True:
+        chunk = handle.read(CHUNK_SIZE)
+        final = not chunk
+        buf = carry + chunk
+        end = len(buf)
+        pos = 0
+
+        while pos < end:
+            if skip:
+                pos = _SKIP.match(buf, pos).end()
+
+                if pos >= end or buf[pos:pos + 1] == b'"':
+                    break
+
+                skip += 1 if buf[pos:pos + 1] in (b"{", b"[") else -1
+                pos += 1
+                continue
+
+            match = _TOKEN.match(buf, pos)
+
+            if not match:
+                pos = end
+                break
+
+            token = match.group().lstrip()
+
+            # The token may continue in the next chunk
+            if not final and (match.end() == end or token == b'"'):
+                break
+
+            pos = match.end()
+            char = token[:1]
+
+            if token == b'"':
+                raise ValueError("Unterminated string in the report.")
+
+            if char == b'"':
+                if expect_key:
+                    stack[-1][1] = token[1:-1]
+                elif len(stack) == len(_PATH) and stack[-1][1] == _PATH[-1]:
+                    yield _string(token).lower()
+            elif char in (b"{", b"["):
+                depth = len(stack)
+
+                started = True
+
+                if depth and (
+                    depth >= len(_PATH) or stack[-1][1] != _PATH[depth - 1]
+                ):
+                    skip = 1
+                else:
+                    stack.append([char, None])
+                    expect_key = char == _OBJECT
+            elif char in (b"}", b"]"):
+                if stack:
+                    stack.pop()
+                expect_key = False
+            elif char == b",":
+                expect_key = bool(stack) and stack[-1][0] == _OBJECT
+            elif char == b":":
+                expect_key = False
+
+        if final:
+            if not started or stack or skip:
+                raise ValueError("The report is truncated or not JSON.")
+
+            return
+
+        carry = buf[pos:]
+
+
+def _severities(handle: BinaryIO) -> Iterator[str]:
+    ijson = _ijson()
+
+    if ijson is None:
+        yield from _scan_severities(handle)
+        return
+
+    try:
+        for severity in ijson.items(
+                handle, "dependencies.item.vulnerabilities.item.severity"):
+            yield str(severity).lower()
+    except ijson.JSONError as e:
+        raise ValueError(str(e)) from e
+
+
+def first_finding(settings: Settings, path: Path) -> Optional[str]:
+    """
+    Stream a report until the first finding at or above MIN_SEVERITY
+
+    :param settings: settings derived from env vars
+    :type settings: Settings
+    :param path: Dependency-Check JSON report
+    :type path: Path
+    :return: severity of the first qualifying finding, None if there is none
+    :rtype: Optional[str]
+    """
+    rank = settings.severity_rank
+    min_rank = rank.get(settings.min_severity.lower(), 0)
+
+    with path.open("rb") as handle:
+        for severity in _severities(handle):
+            if rank.get(severity, 0) >= min_rank:
+                return severity
+
+    return None
+
+
+def is_gate_only(settings: Settings, notifies: bool) -> bool:
+    """
+    Whether the run only has to gate, so the report need not be parsed
+
+    :param settings: settings derived from env vars
+    :type settings: Settings
+    :param notifies: whether the run has routes to notify
+    :type notifies: bool
+    :return: True when DC_FAIL_ON_VULN is the only output of the run
+    :rtype: bool
+    """
+    return (
+        settings.fail_on_vuln and
+        not notifies and
+        not settings.summary_path and
+        not settings.index_path
+    )
+
+
+def run_gate(settings: Settings) -> int:
+    """
+    Gate-only run: stream the report and stop at the first finding
+
+    :param settings: settings derived from env vars
+    :type settings: Settings
+    :return: software exit code
+    :rtype: int
+    """
+    if not settings.report_json.exists():
+        err("Can't resolve the json report in the path location: ",
+            str(settings.report_json))
+        return GATE_EXIT_CODE
+
+    try:
+        severity = first_finding(settings, settings.report_json)
+    except (OSError, ValueError) as e:
+        err("Could not scan the report for the gate: ", e)
+        return GATE_EXIT_CODE
+
+    return _verdict(settings, severity)
+
+
+def gate_exit_code(settings: Settings, parser: Optional[DCParser]) -> int:
+    """
+    Gate a run whose report has already been parsed
+
+    :param settings: settings derived from env vars
+    :type settings: Settings
+    :param parser: parsed report, None if the report was missing
+    :type parser: Optional[DCParser]
+    :return: software exit code, 0 when DC_FAIL_ON_VULN is off
+    :rtype: int
+    """
+    if not settings.fail_on_vuln:
+        return 0
+
+    if not parser or parser.failed:
+        err("The gate could not evaluate the report.")
+        return GATE_EXIT_CODE
+
+    vulns = parser.filter_by_min_severity(settings.min_severity) or []
+
+    return _verdict(settings, vulns[0].severity if vulns else None)
+
+
+def _verdict(settings: Settings, severity: Optional[str]) -> int:
+    if severity is None:
+        log(f"Gate passed: no findings at or above "
+            f"{settings.min_severity.value}.")
+        return 0
+
+    log(f"Gate failed: found a {severity} finding (DC_FAIL_ON_VULN, "
+        f"MIN_SEVERITY={settings.min_severity.value}).")
+    return GATE_EXIT_CODE
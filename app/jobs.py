@@ -0,0 +1,558 @@
+"""
+Shared job spool consumed by notifier workers on one or many hosts
+
+Pipelines ``submit`` their report to a spool directory on shared storage
+(DC_SPOOL_DIR) instead of notifying themselves; any number of ``worker``
+processes, on any number of hosts, parse and notify them. Layout::
+
+    <spool>/jobs/<id>/                   report and files of a job
+    <spool>/pending/<id>.json            queued job (ReportJob)
+    <spool>/leased/<id>.<worker>.json    job claimed by a worker
+    <spool>/done/<id>.json               completion marker (JobResult)
+
+Every state change is a single ``rename`` on the same file system, so
+exactly one worker wins a job. The lease is the leased file itself: its
+worker touches it while the job runs and other workers put it back to
+pending once it has not been touched for DC_LEASE_SECONDS (crashed
+worker). The completion marker is created exclusively once the job has
+been notified; a job is skipped whenever its marker exists, so a job
+that was reclaimed after being handled is not posted again. Right before
+posting, a worker also checks that it still holds the lease and that no
+marker exists, so a job reclaimed while it was running is posted by one
+worker only.
+
+Posting and writing the marker are not atomic: a worker that dies after
+posting but before its marker is written, or whose lease expires during
+the very send it checked for, leaves the job to be posted again.
+DC_DEDUPE_PATH on the workers suppresses that second post.
+"""
+
+from __future__ import annotations
+import os
+import re
+import shutil
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Iterator, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+from pydantic import BaseModel
+
+from app.notifier_type.delivery import delivery_guard
+from settings import Settings
+from utils.common import err, log
+
+JOBS_DIR = "jobs"
+PENDING_DIR = "pending"
+LEASED_DIR = "leased"
+DONE_DIR = "done"
+REPORT_FILE = "report.json"
+# Variables of the submitting pipeline carried with its job, in plain text
+# on the shared spool: never tokens or passwords. Webhooks and delivery
+# settings come from the worker's own environment
+JOB_ENV = (
+    "CI_PROJECT_URL", "CI_PROJECT_PATH", "CI_API_V4_URL", "CI_PROJECT_ID",
+    "CI_PIPELINE_URL", "CI_PIPELINE_ID", "CI_COMMIT_REF_NAME",
+    "DC_PROJECT_LABEL", "ARTIFACT_JOB_NAME", "DC_ARTIFACT_JOB_NAME",
+    "REPORT_HTML_NAME",
+)
+# Completion markers older than this are pruned by idle workers
+DONE_RETENTION = 7 * 24 * 3600
+PRUNE_INTERVAL = 3600
+
+_UNSAFE = re.compile(r"[^\w-]+")
+
+
+class ReportJob(BaseModel):
+    id: str
+    created: float
+    env: dict[str, str] = {}
+
+
+class JobResult(BaseModel):
+    id: str
+    worker: str
+    finished: float
+    exit_code: int
+    error: Optional[str] = None
+
+
+def _without_credentials(value: str) -> str:
+    """
+    Drop the ``user:password@`` part of a URL, other values are kept
+    """
+    parts = urlsplit(value)
+
+    if not parts.scheme or "@" not in parts.netloc:
+        return value
+
+    return urlunsplit(parts._replace(netloc=parts.netloc.rsplit("@", 1)[1]))
+
+
+def worker_name() -> str:
+    """
+    Identifier of this worker process, unique across hosts
+
+    :return: host name and process id, file name safe
+    :rtype: str
+    """
+    return _UNSAFE.sub("_", f"{socket.gethostname()}-{os.getpid()}")
+
+
+class Spool:
+    _root: Path
+
+    def __init__(self, root: Path):
+        """
+        Spool stored under the given directory (created on demand)
+
+        :param self: ref to class self
+        :param root: spool directory on storage shared by the workers
+        :type root: Path
+        """
+        self._root = root
+
+    def _dir(self, name: str) -> Path:
+        path = self._root / name
+        path.mkdir(parents=True, exist_ok=True)
+
+        return path
+
+    def job_dir(self, job_id: str) -> Path:
+        return self._root / JOBS_DIR / job_id
+
+    def done_path(self, job_id: str) -> Path:
+        return self._root / DONE_DIR / f"{job_id}.json"
+
+    def submit(self, report: Path, env: dict[str, str]) -> ReportJob:
+        """
+        Queue a report; the job only becomes visible once it is complete
+
+        :param self: ref to class self
+        :param report: Dependency-Check JSON report, copied into the spool
+        :type report: Path
+        :param env: variables of the submitting pipeline
+        :type env: dict[str, str]
+        :return: queued job
+        :rtype: ReportJob
+        """
+        # Ids sort by submission time, workers take the oldest first
+        job = ReportJob(
+            id=f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}",
+            created=time.time(),
+            env=env,
+        )
+        staging = self._dir(JOBS_DIR) / f".{job.id}.tmp"
+        staging.mkdir()
+        shutil.copyfile(report, staging / REPORT_FILE)
+        os.replace(staging, self.job_dir(job.id))
+
+        tmp = self._dir(PENDING_DIR) / f".{job.id}.tmp"
+        tmp.write_text(job.model_dump_json())
+        os.replace(tmp, self._root / PENDING_DIR / f"{job.id}.json")
+
+        return job
+
+    def claim(self, worker: str) -> Optional[tuple[ReportJob, Path]]:
+        """
+        Lease the oldest pending job
+
+        :param self: ref to class self
+        :param worker: name of the claiming worker
+        :type worker: str
+        :return: job and its lease file, None when nothing is pending
+        :rtype: Optional[tuple[ReportJob, Path]]
+        """
+        leased = self._dir(LEASED_DIR)
+
+        for name in sorted(self._entries(PENDING_DIR)):
+            job_id = name[:-len(".json")]
+            lease = leased / f"{job_id}.{worker}.json"
+
+            try:
+                # Only one of the workers racing for the job gets it
+                os.replace(self._root / PENDING_DIR / name, lease)
+                # The rename keeps the pending file's mtime: a job that
+                # waited longer than the lease would look expired at once
+                os.utime(lease)
+            except FileNotFoundError:
+                continue
+
+            try:
+                job = ReportJob.model_validate_json(lease.read_bytes())
+            except (OSError, ValueError) as e:
+                err(f"Dropping unreadable job {job_id}: ", e)
+                lease.unlink(missing_ok=True)
+                continue
+
+            return job, lease
+
+        return None
+
+    def reclaim_expired(self, lease_seconds: float) -> int:
+        """
+        Put jobs whose lease was not renewed in time back to pending
+
+        :param self: ref to class self
+        :param lease_seconds: lease duration
+        :type lease_seconds: float
+        :return: number of jobs put back
+        :rtype: int
+        """
+        now = time.time()
+        count = 0
+
+        for name in self._entries(LEASED_DIR):
+            lease = self._root / LEASED_DIR / name
+
+            try:
+                if now - lease.stat().st_mtime < lease_seconds:
+                    continue
+
+                os.replace(
+                    lease,
+                    self._root / PENDING_DIR / f"{name.split('.')[0]}.json")
+            except FileNotFoundError:
+                # Renewed, completed or reclaimed by another worker
+                continue
+
+            log(f"Lease of job {name.split('.')[0]} expired, job requeued.")
+            count += 1
+
+        return count
+
+    def complete(
+            self,
+            job: ReportJob,
+            lease: Path,
+            result: JobResult,
+            owned: bool = True) -> bool:
+        """
+        Record a handled job and release it
+
+        :param self: ref to class self
+        :param job: handled job
+        :type job: ReportJob
+        :param lease: lease file of the job
+        :type lease: Path
+        :param result: outcome of the job
+        :type result: JobResult
+        :param owned: False when the lease was lost meanwhile, the job's
+        files are then left to the worker now holding it
+        :type owned: bool
+        :return: False if another worker had already completed the job
+        :rtype: bool
+        """
+        self._dir(DONE_DIR)
+        created = True
+
+        try:
+            with open(self.done_path(job.id), "x", encoding="utf-8") as f:
+                f.write(result.model_dump_json(exclude_none=True))
+        except FileExistsError:
+            created = False
+
+        if owned:
+            self.release(job, lease)
+
+        return created
+
+    def holds(self, job: ReportJob, lease: Path) -> bool:
+        """
+        Whether a job is still leased by this worker and not completed,
+        renewing the lease
+
+        :param self: ref to class self
+        :param job: running job
+        :type job: ReportJob
+        :param lease: lease file of the job
+        :type lease: Path
+        :return: False when the job was reclaimed or completed meanwhile
+        :rtype: bool
+        """
+        if self.done_path(job.id).exists():
+            return False
+
+        try:
+            os.utime(lease)
+        except FileNotFoundError:
+            return False
+
+        return True
+
+    def release(self, job: ReportJob, lease: Path) -> None:
+        """
+        Remove a finished job and its files
+
+        :param self: ref to class self
+        :param job: finished job
+        :type job: ReportJob
+        :param lease: lease file of the job
+        :type lease: Path
+        """
+        lease.unlink(missing_ok=True)
+        shutil.rmtree(self.job_dir(job.id), ignore_errors=True)
+
+    def prune(self, retention: float = DONE_RETENTION) -> None:
+        """
+        Drop completion markers older than the retention
+
+        :param self: ref to class self
+        :param retention: seconds a marker is kept
+        :type retention: float
+        """
+        limit = time.time() - retention
+
+        for name in self._entries(DONE_DIR):
+            path = self._root / DONE_DIR / name
+
+            try:
+                if path.stat().st_mtime < limit:
+                    path.unlink()
+            except FileNotFoundError:
+                continue
+
+    def _entries(self, name: str) -> Iterator[str]:
+        with os.scandir(self._dir(name)) as entries:
+            for entry in entries:
+                if entry.name.endswith(".json"):
+                    yield entry.name
+
+
+def submit(settings: Settings) -> int:
+    """
+    Queue this pipeline's report in the spool
+
+    :param settings: settings derived from env vars
+    :type settings: Settings
+    :return: software exit code
+    :rtype: int
+    """
+    if not settings.spool_dir:
+        err("DC_SPOOL_DIR is not set, there is no spool to submit to.")
+        return 1
+
+    if not settings.report_json.exists():
+        err("Can't resolve the json report in the path location: ",
+            str(settings.report_json))
+        return 1
+
+    env = {
+        key: _without_credentials(os.environ[key])
+        for key in JOB_ENV if key in os.environ
+    }
+
+    try:
+        job = Spool(settings.spool_dir).submit(settings.report_json, env)
+    except OSError as e:
+        err("Could not submit the report: ", e)
+        return 1
+
+    log(f"Report submitted as job {job.id}.")
+
+    return 0
+
+
+def _job_settings(spool: Spool, job: ReportJob) -> Settings:
+    """
+    Worker's environment with the job's pipeline variables and files
+    """
+    directory = spool.job_dir(job.id)
+
+    return Settings.load_env({
+        **os.environ,
+        **job.env,
+        "REPORT_DIR": "",
+        "REPORT_JSON_NAME": str(directory / REPORT_FILE),
+        "DC_FINDINGS_DIR": str(directory),
+    })
+
+
+class _Heartbeat:
+    """
+    Keeps a lease alive while its job runs
+    """
+
+    def __init__(self, lease: Path, interval: float):
+        self._lease = lease
+        self._interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self.lost = False
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._interval):
+            try:
+                os.utime(self._lease)
+            except FileNotFoundError:
+                self.lost = True
+                return
+
+    def __enter__(self) -> _Heartbeat:
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+class _Ownership:
+    """
+    Delivery guard of a job: posts only while the job is still held, and
+    remembers whether it allowed or refused any
+    """
+
+    def __init__(self, spool: Spool, job: ReportJob, lease: Path):
+        self._spool = spool
+        self._job = job
+        self._lease = lease
+        self.posted = False
+        self.refused = False
+
+    def __call__(self) -> bool:
+        if self._spool.holds(self._job, self._lease):
+            self.posted = True
+            return True
+
+        self.refused = True
+        return False
+
+
+def process(settings: Settings, spool: Spool, worker: str) -> bool:
+    """
+    Claim and notify one job
+
+    :param settings: settings of the worker
+    :type settings: Settings
+    :param spool: shared spool
+    :type spool: Spool
+    :param worker: name of this worker
+    :type worker: str
+    :return: False when no job was pending
+    :rtype: bool
+    """
+    # app.app imports this module
+    from app import app
+
+    claimed = spool.claim(worker)
+
+    if not claimed:
+        return False
+
+    job, lease = claimed
+
+    if spool.done_path(job.id).exists():
+        # Handled by a worker whose lease expired before it released it
+        spool.release(job, lease)
+        return True
+
+    result = JobResult(
+        id=job.id, worker=worker, finished=0.0, exit_code=0)
+
+    # Checked again right before posting: a lease reclaimed while the job
+    # ran (stalled heartbeat, slow retries) must not post it twice
+    ownership = _Ownership(spool, job, lease)
+
+    with _Heartbeat(lease, settings.lease_seconds / 3) as heartbeat, \
+            delivery_guard(ownership):
+        try:
+            result.exit_code = app.run_notifier(_job_settings(spool, job))
+        except Exception as e:
+            err(f"Job {job.id} failed: ", e)
+            result.exit_code = 1
+            result.error = str(e)
+
+    if heartbeat.lost:
+        err(f"Lease of job {job.id} was lost while it ran.")
+
+    if ownership.refused and not ownership.posted:
+        # Nothing was posted: completing would hide the job from the worker
+        # now holding it
+        log(f"Job {job.id} left to the worker now holding it.")
+        return True
+
+    result.finished = time.time()
+
+    if not spool.complete(job, lease, result, owned=not heartbeat.lost):
+        err(f"Job {job.id} had already been completed by another worker.")
+
+    log(f"Job {job.id} done (exit code {result.exit_code}).")
+
+    return True
+
+
+def work(settings: Settings, once: bool) -> int:
+    """
+    Worker loop: consume jobs until the spool is drained (``once``) or
+    forever
+
+    :param settings: settings of the worker
+    :type settings: Settings
+    :param once: exit once nothing is pending
+    :type once: bool
+    :return: number of jobs handled
+    :rtype: int
+    """
+    spool = Spool(settings.spool_dir)
+    worker = worker_name()
+    handled = 0
+    pruned = 0.0
+
+    with settings.activate():
+        while True:
+            if process(settings, spool, worker):
+                handled += 1
+                continue
+
+            if spool.reclaim_expired(settings.lease_seconds):
+                continue
+
+            if once:
+                return handled
+
+            if time.time() - pruned > PRUNE_INTERVAL:
+                spool.prune()
+                pruned = time.time()
+
+            time.sleep(settings.worker_poll_ms / 1000)
+
+
+def run_workers(settings: Settings, processes: int, once: bool) -> int:
+    """
+    Run one or several worker processes on this host
+
+    :param settings: settings derived from env vars
+    :type settings: Settings
+    :param processes: worker processes, 1 runs in this process
+    :type processes: int
+    :param once: exit once nothing is pending
+    :type once: bool
+    :return: software exit code
+    :rtype: int
+    """
+    if not settings.spool_dir:
+        err("DC_SPOOL_DIR is not set, there is no spool to work on.")
+        return 1
+
+    start = time.perf_counter()
+
+    try:
+        if processes <= 1:
+            handled = work(settings, once)
+        else:
+            with ProcessPoolExecutor(max_workers=processes) as pool:
+                handled = sum(pool.map(
+                    partial(work, settings), [once] * processes))
+    except KeyboardInterrupt:
+        return 0
+
+    log(f"{handled} job(s) handled in "
+        f"{time.perf_counter() - start:.1f} s.")
+
+    return 0
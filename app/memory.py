@@ -0,0 +1,368 @@
+"""
+Memory budget of a run (DC_MEMORY_BUDGET_MB)
+
+A container with a hard memory limit kills the notifier when a very large
+report does not fit, and nothing is posted at all. Under a budget the
+report is streamed one dependency at a time (``report_stream``) and, once
+the process RSS exceeds the budget, the parsed findings are spilled to disk
+in runs sorted by severity. The runs are merged back lazily with
+``heapq.merge``: counts are kept aside, the top findings shown in messages
+only read the head of the runs and the findings file streams through all
+of them.
+"""
+
+from __future__ import annotations
+import heapq
+import json
+import os
+import sys
+import tempfile
+from itertools import islice
+from pathlib import Path
+from typing import (
+    Callable, Generic, Iterable, Iterator, List, Optional, TypeVar, overload)
+
+from pydantic import BaseModel
+
+from settings import Settings
+from utils.common import err, log
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None  # type: ignore[assignment]
+
+# Findings written per run at least, bounds the number of run files when
+# the process stays above the budget
+MIN_RUN = 4096
+# Runs merged at once; beyond this they are compacted into one
+MAX_RUNS = 64
+WRITE_BUFFER = 1 << 16
+
+_STATM = Path("/proc/self/statm")
+_PAGE_SIZE = (
+    os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096)
+
+M = TypeVar("M", bound=BaseModel)
+
+
+def current_rss() -> Optional[int]:
+    """
+    Resident set size of this process
+
+    :return: bytes, the peak where the current size is not available, None
+    when neither is
+    :rtype: Optional[int]
+    """
+    try:
+        return int(_STATM.read_bytes().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return peak_rss()
+
+
+def peak_rss() -> Optional[int]:
+    """
+    Peak resident set size of this process
+
+    :return: bytes, None where it is not available
+    :rtype: Optional[int]
+    """
+    if resource is None:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # Kilobytes, except on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def log_peak_rss(settings: Settings) -> None:
+    """
+    Log the peak RSS of the process when a memory budget is set
+
+    :param settings: settings derived from env vars
+    :type settings: Settings
+    """
+    peak = peak_rss()
+
+    if not settings.memory_budget_mb or peak is None:
+        return
+
+    log(f"Peak RSS {peak / 2**20:.0f} MB "
+        f"(DC_MEMORY_BUDGET_MB={settings.memory_budget_mb}).")
+
+
+class _Runs:
+    """
+    Run files of one parse, removed with the last view using them
+    """
+    directory: tempfile.TemporaryDirectory
+    paths: List[Path]
+    _created: int
+
+    def __init__(self, parent: Optional[Path]):
+        if parent:
+            parent.mkdir(parents=True, exist_ok=True)
+
+        self.directory = tempfile.TemporaryDirectory(
+            prefix="dc-spill-", dir=parent)
+        self.paths = []
+        self._created = 0
+
+    def path(self) -> Path:
+        self._created += 1
+        return Path(self.directory.name) / f"run-{self._created:05d}"
+
+
+def _line(order: int, item: BaseModel, severity: str) -> str:
+    # Fixed width order first: lines compare like their findings
+    return f"{order:03d}\t{json.dumps(severity)}\t{item.model_dump_json()}\n"
+
+
+def _read(path: Path) -> Iterator[str]:
+    with path.open(encoding="utf-8", buffering=WRITE_BUFFER) as handle:
+        yield from handle
+
+
+def _order(line: str) -> str:
+    return line[:3]
+
+
+class SpilledFindings(Generic[M]):
+    """
+    Read-only sequence of the findings merged back from the runs, in
+    severity order
+    """
+    _model: type[M]
+    _runs: _Runs
+    _tail: List[str]
+    _counts: dict[str, int]
+    _severities: Optional[frozenset[str]]
+
+    def __init__(
+            self,
+            model: type[M],
+            runs: _Runs,
+            tail: List[str],
+            counts: dict[str, int],
+            severities: Optional[frozenset[str]] = None):
+        self._model = model
+        self._runs = runs
+        self._tail = tail
+        self._counts = counts
+        self._severities = severities
+
+    def select(self, severities: Iterable[str]) -> SpilledFindings[M]:
+        """
+        The findings of the given severities only
+
+        :param self: ref to class self
+        :param severities: severities to keep
+        :type severities: Iterable[str]
+        :return: view over the same runs
+        :rtype: SpilledFindings
+        """
+        return SpilledFindings(
+            self._model, self._runs, self._tail, self._counts,
+            frozenset(severities))
+
+    def __len__(self) -> int:
+        return sum(
+            count for severity, count in self._counts.items()
+            if self._severities is None or severity in self._severities)
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def __iter__(self) -> Iterator[M]:
+        # Runs were written in document order and merge() keeps equal keys
+        # in the order of its inputs, as the in-memory stable sort does
+        merged = heapq.merge(
+            *(_read(path) for path in self._runs.paths), self._tail,
+            key=_order)
+        wanted = (
+            None if self._severities is None
+            else {json.dumps(s) for s in self._severities})
+
+        for line in merged:
+            _, severity, data = line.split("\t", 2)
+
+            if wanted is None or severity in wanted:
+                yield self._model.model_validate_json(data)
+
+    @overload
+    def __getitem__(self, index: int) -> M: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[M]: ...
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            if (index.start or 0) >= 0 and (index.stop or 0) >= 0:
+                return list(islice(self, index.start, index.stop, index.step))
+
+            return list(self)[index]
+
+        if index < 0:
+            return list(self)[index]
+
+        for item in islice(self, index, None):
+            return item
+
+        raise IndexError("finding index out of range")
+
+
+class SpillBuffer(Generic[M]):
+    """
+    Findings held in memory until the budget is exceeded, then spilled to
+    disk in sorted runs
+    """
+    _model: type[M]
+    _order: Callable[[str], int]
+    _budget: int
+    _directory: Optional[Path]
+    _pending: List[M]
+    _counts: dict[str, int]
+    _runs: Optional[_Runs]
+    _run_size: int
+    _spilled: int
+    _disabled: bool
+
+    def __init__(
+            self,
+            settings: Settings,
+            model: type[M],
+            order: Callable[[str], int]):
+        """
+        Buffer of the findings of one parse
+
+        :param self: ref to class self
+        :param settings: settings derived from env vars, no budget keeps
+        every finding in memory
+        :type settings: Settings
+        :param model: finding model, to read spilled findings back
+        :type model: type[M]
+        :param order: sort order of a severity, most severe first
+        :type order: Callable[[str], int]
+        """
+        self._model = model
+        self._order = order
+        self._budget = settings.memory_budget_mb * 1024 * 1024
+        self._directory = settings.spill_dir
+        self._pending = []
+        self._counts = {}
+        self._runs = None
+        self._run_size = 0
+        self._spilled = 0
+        self._disabled = not self._budget
+
+    def extend(self, items: List[M]) -> None:
+        """
+        Add findings, then spill them if the budget is exceeded. Call it
+        with whole dependencies so every finding is complete.
+
+        :param self: ref to class self
+        :param items: findings, in document order
+        :type items: List[M]
+        """
+        self._pending.extend(items)
+
+        for item in items:
+            severity = getattr(item, "severity")
+            self._counts[severity] = self._counts.get(severity, 0) + 1
+
+        if self._disabled or not self._pending:
+            return
+
+        if self._runs is None:
+            rss = current_rss()
+
+            if rss is None or rss <= self._budget:
+                return
+
+            log(f"Memory budget of {self._budget // 2**20} MB exceeded "
+                f"({rss / 2**20:.0f} MB), spilling findings to disk.")
+            # Freed memory is rarely returned to the system: the RSS stays
+            # above the budget, so further runs are spilled by size
+            self._run_size = max(len(self._pending), MIN_RUN)
+        elif len(self._pending) < self._run_size:
+            return
+
+        self._spill()
+
+    def _sorted_lines(self) -> Iterator[str]:
+        for item in sorted(self._pending, key=self._severity_order):
+            severity = getattr(item, "severity")
+            yield _line(self._order(severity), item, severity)
+
+    def _severity_order(self, item: M) -> int:
+        return self._order(getattr(item, "severity"))
+
+    def _spill(self) -> None:
+        try:
+            if self._runs is None:
+                self._runs = _Runs(self._directory)
+
+            path = self._runs.path()
+
+            with path.open(
+                    "w", encoding="utf-8", buffering=WRITE_BUFFER) as handle:
+                handle.writelines(self._sorted_lines())
+        except OSError as e:
+            err("Could not spill findings to disk, keeping them in "
+                "memory: ", e)
+            self._disabled = True
+            return
+
+        self._runs.paths.append(path)
+        self._spilled += len(self._pending)
+        self._pending = []
+
+        if len(self._runs.paths) >= MAX_RUNS:
+            try:
+                self._compact()
+            except OSError as e:
+                err("Could not compact the spilled findings: ", e)
+
+    def _compact(self) -> None:
+        """
+        Merge every run into one, keeping the number of open files bounded
+        """
+        runs = self._runs
+        path = runs.path()
+
+        with path.open(
+                "w", encoding="utf-8", buffering=WRITE_BUFFER) as handle:
+            handle.writelines(heapq.merge(
+                *(_read(p) for p in runs.paths), key=_order))
+
+        for old in runs.paths:
+            old.unlink()
+
+        runs.paths = [path]
+
+    def finish(self) -> List[M] | SpilledFindings[M]:
+        """
+        Every finding, sorted by severity (stable)
+
+        :param self: ref to class self
+        :return: list when nothing was spilled, otherwise a view merging
+        the runs back
+        :rtype: List[M] | SpilledFindings[M]
+        """
+        if self._runs is None:
+            self._pending.sort(key=self._severity_order)
+            return self._pending
+
+        if not self._disabled:
+            self._spill()
+
+        # Findings that could not be spilled are merged from memory
+        tail = list(self._sorted_lines())
+        self._pending = []
+
+        log(f"{self._spilled} finding(s) spilled to disk in "
+            f"{len(self._runs.paths)} run(s).")
+
+        return SpilledFindings(
+            self._model, self._runs, tail, dict(self._counts))
@@ -1,12 +1,20 @@
 from __future__ import annotations
 import datetime
-from typing import List, Optional
+from typing import List, Optional, Sequence
 import disnake
-from disnake import SyncWebhook, Embed
+from disnake import Colour, SyncWebhook, Embed
 
+from app.cvss_stats import ScoreStats
 from app.DCParser import DCParser, Vulnerability
+from app.dedupe import DedupeStore, notification_digest
+from app.findings_file import write_findings
+from app.notifier_type.delivery import may_deliver, use_api_base
+from app.notifier_type.renderers import Payload, RenderContext, get_renderer
+from app.outbox import deliver_or_queue
+from app.rollup import RollupResult, rollup_payload
 from app.notifier_type.utils import State, state_colour
-from settings import Settings, Severity
+from app.routing import default_route
+from settings import Settings, Severity, WebhookRoute
 from utils.common import err, log
 
 GWS_ICON = "https://files.gwssecureserver.co.uk/files/gws/logo-outline-ico.png"
@@ -25,16 +33,26 @@ class ParserFailedError(Exception):
 class DiscordNotifier:
     _settings: Settings
     _parser: Optional[DCParser]
-    _title: str = ""
-    _desc: str = ""
-    _has_vuln: bool = False
-    _has_issue: bool = False
-    _colour = state_colour(State.ISSUE)
-    _embed: Optional[Embed] = None
-    _has_report: bool = False
-    _webhook: SyncWebhook
-
-    def __init__(self, settings: Settings, parser: Optional[DCParser]):
+    _title: str
+    _desc: str
+    _has_vuln: bool
+    _has_issue: bool
+    _colour: Colour
+    _embed: Optional[Embed]
+    _counts: Optional[dict[str, int]]
+    _score_stats: dict[str, dict[str, ScoreStats]]
+    _vulns: Sequence[Vulnerability]
+    _has_report: bool
+    _delivery_failed: bool
+    _route: WebhookRoute
+    _link_urls: dict[str, Optional[str]]
+    _webhook: Optional[SyncWebhook]
+
+    def __init__(
+            self,
+            settings: Settings,
+            parser: Optional[DCParser],
+            route: Optional[WebhookRoute] = None):
         """
         Discord Notifier module initialiser for sending out Discord embeds
 
@@ -43,38 +61,112 @@ class DiscordNotifier:
         :type settings: Settings
         :param parser: Dependency Vulnerability Report Parser
         :type parser: Optional[DCParser]
+        :param route: webhook route to deliver to, defaults to
+        DISCORD_WEBHOOK_URL from MIN_SEVERITY up
+        :type route: Optional[WebhookRoute]
         """
         self._settings = settings
         self._parser = parser
-        self._webhook = SyncWebhook.from_url(
-            self._settings.discord_webhook_url)
+        self._route = route or default_route(settings)
+
+        # Per-notification state, never shared between instances
+        self._title = ""
+        self._desc = ""
+        self._has_vuln = False
+        self._has_issue = False
+        self._colour = state_colour(State.ISSUE)
+        self._embed = None
+        self._counts = None
+        self._score_stats = {}
+        self._vulns = []
+        self._has_report = False
+        self._delivery_failed = False
+        self._webhook = None
+
+        self._link_urls = {
+            "html": self._settings.html_url,
+            "zip": self._settings.zip_url,
+            "pipeline": self._settings.pipeline_url,
+            "repo": self._settings.repo_url,
+        }
 
     def notify(self):
+        payloads = self.prepare()
+
+        if payloads is None:
+            return 0
+
+        if not payloads:
+            err("Notification not sent due to missing embeds.")
+            return self._exit_code()
+
+        return self.send(payloads)
+
+    def send(self, payloads: List[Payload]) -> int:
+        """
+        Method for delivering already rendered payloads to the route
+
+        :param self: ref to class self
+        :param payloads: webhook payloads to send, in order
+        :type payloads: List[Payload]
+        :return: software exit code
+        :rtype: int
+        """
+        self._deliver(payloads)
+
+        return self._exit_code()
+
+    def prepare(self) -> Optional[List[Payload]]:
+        """
+        Method for building the notification of the route without sending
+        it
+
+        :param self: ref to class self
+        :return: webhook payloads to send, in order, None when the route
+        has nothing to post
+        :rtype: Optional[List[Payload]]
+        """
         try:
             self._check_report_presence()
             self._check_parser_success()
         except FileNotFoundError as e:
             err("Report not found: ", e)
-            return 0
+            return self._render()
         except ParserFailedError as e:
             err("Parser Error: ", e)
-            return 0
+            return self._render()
 
         counts = self._get_vuln_counts()
-        filtered = self._get_vuln_above_lvl()
+        filtered = self._get_vuln_above_lvl(
+            self._route.min_severity, self._route.max_severity)
+
+        if (
+            self._settings.routes and
+            not filtered and
+            not self._settings.notify_on_zero
+        ):
+            log(f"Route '{self._route.name}' has no findings, skipped.")
+            return None
 
         if counts and (counts["critical"] > 0 or counts["high"]) > 0:
             self._has_vuln = True
 
+        self._counts = counts
+        self._score_stats = self._get_score_stats()
+        self._vulns = filtered or []
         self._embed = self._create_embed()
 
-        self._embed_vuln_counter(counts=counts)
-
-        self._embed_vuln_fields(vulns=filtered)
+        return self._render()
 
-        self._send_notification()
+    def _exit_code(self) -> int:
+        """
+        Method for resolving the exit code of the notification
 
-        return 0
+        :param self: ref to class self
+        :return: 1 if a message was lost, 0 otherwise
+        :rtype: int
+        """
+        return 1 if self._delivery_failed else 0
 
     def _check_report_presence(self) -> None:
         """
@@ -83,7 +175,7 @@ class DiscordNotifier:
         :param self: ref to class self
         :raises FileNotFoundError: Missing file
         """
-        if not self._settings.report_json.exists():
+        if not self._report_present():
             self._has_issue = True
             self._has_vuln = False
             self._desc = (
@@ -95,7 +187,6 @@ class DiscordNotifier:
             )
 
             self._embed = self._create_embed()
-            self._send_notification()
             raise FileNotFoundError(
                 f"The file '{self._settings.report_json}' does not exist.")
 
@@ -118,7 +209,6 @@ class DiscordNotifier:
                 f"` (`{self._settings.ci_commit_ref_name or 'ref'}`)."
             )
             self._embed = self._create_embed()
-            self._send_notification()
             raise ParserFailedError(
                 "The parser experienced error while parsing "
                 f"'{self._settings.report_json}'")
@@ -181,7 +271,7 @@ class DiscordNotifier:
         elif self._has_issue:
             prefix = "⚠️ Dependency-Check __Unknown Issue__"
 
-            if not self._settings.report_json.exists():
+            if not self._report_present():
                 prefix = "⚠️ Dependency-Check __JSON Report Missing__"
 
             if self._parser and self._parser.failed:
@@ -202,85 +292,118 @@ class DiscordNotifier:
 
         return prefix + suffix
 
-    def _embed_vuln_counter(
-            self,
-            counts: dict[str, int] | None) -> None:
+    def notify_rollup(self, rollup: RollupResult) -> int:
         """
-        Method for embedding vulnerability counter
+        Method for posting an organisation rollup instead of a single report
 
         :param self: ref to class self
-        :param counts: Key value pair of vuln level to integer count
-        :type counts: dict[str, int] | None
+        :param rollup: aggregated rollup
+        :type rollup: RollupResult
+        :return: software exit code
+        :rtype: int
         """
+        self._has_vuln = bool(
+            rollup.counts.get("critical") or rollup.counts.get("high"))
+        self._desc = (
+            f"{rollup.projects} project(s), "
+            f"{rollup.unique_vulnerabilities} unique vulnerabilities "
+            f"from {rollup.inputs} input(s)."
+        )
+        self._embed = self._create_embed()
+        label = self._settings.project_label
+        self._embed.title = "📊 Dependency-Check rollup" + (
+            f" ({label})" if label else "")
 
-        if counts and self._has_vuln and self._embed and not self._has_issue:
-            value = ""
+        self._deliver([rollup_payload(self._embed.to_dict(), rollup)])
 
-            for count in counts:
-                value += f"**{count.capitalize()}**: `{counts[count]}`\n"
+        return self._exit_code()
 
-            self._embed.add_field(
-                name="Vulnerabilities Count",
-                value=value,
-                inline=False)
+    def _render(self) -> List[Payload]:
+        """
+        Method for rendering the embed and findings with the renderer of the
+        configured notify mode, attaching the full findings file when the
+        renderer had to leave findings out
 
-    def _embed_vuln_fields(self, vulns: Optional[List[Vulnerability]]):
+        :param self: ref to class self
+        :return: webhook payloads to send, in order
+        :rtype: List[Payload]
         """
-        Method for embedding vulnerability fields
+        if not self._embed:
+            return []
+
+        links = {
+            key: self._link_urls[key]
+            for key in self._settings.buttons
+            if self._link_urls.get(key)
+        }
+
+        renderer = get_renderer(self._settings.notify_mode)
+        header = self._embed.to_dict()
+        payloads = renderer.render(RenderContext(
+            header=header,
+            vulns=self._vulns,
+            counts=self._counts,
+            links=links,
+            max_items=self._settings.max_items,
+            show_counts=self._has_vuln and not self._has_issue,
+            score_stats=self._score_stats,
+        ))
+
+        if renderer.truncated and payloads:
+            # The full list goes with the last message, after the findings
+            payloads[-1].files = write_findings(
+                self._settings, self._route, self._vulns,
+                header.get("title") or "Dependency-Check findings")
+
+        return payloads
+
+    def _report_present(self) -> bool:
+        """
+        Method to determine if the report was available to the parser
 
         :param self: ref to class self
-        :param vulns: List of vulnerabilities
-        :type vulns: Optional[List[Vulnerability]]
+        :return: False if the report is missing
+        :rtype: bool
         """
+        if self._parser:
+            return self._parser.report_present
 
-        if vulns and self._embed:
-            max_embed = 20
-
-            for dep in vulns:
-                if max_embed == 0:
-                    break
-
-                max_embed -= 1
-
-                severity = "N/A"
-                cvssv3 = "n/a"
-
-                if dep.severity.lower() == 'low':
-                    severity = "🟩 Low"
-                elif dep.severity.lower() == 'medium':
-                    severity = "🟨 Medium"
-                elif dep.severity.lower() == 'moderate':
-                    severity = "🟧 Moderate"
-                elif dep.severity.lower() == 'high':
-                    severity = "🅾️ HIGH"
-                elif dep.severity.lower() == 'critical':
-                    severity = "📛 CRITICAL!!!"
-
-                if dep.scorev3 and dep.scorev3 != "Unknown":
-                    cvssv3 = "{:.1f}".format(float(dep.scorev3))
-
-                self._embed.add_field(
-                    name=f"{severity} - {dep.dependency} "
-                    f"(ver: `{dep.version}`) "
-                    f"CVSSv2: `{dep.scorev2}` "
-                    f"CVSSv3: `{cvssv3}`",
-                    value=f"""
-                    [{", ".join(dep.ids)}]({dep.url})
-                    """,
-                    inline=False)
-
-    def _send_notification(self):
+        return self._settings.report_json.exists()
+
+    def _deliver(self, payloads: List[Payload]) -> None:
         """
-        Method for sending notifications
+        Method for delivering rendered payloads, unless an identical
+        notification was sent recently (DC_DEDUPE_PATH)
 
         :param self: ref to class self
+        :param payloads: webhook payloads to send, in order
+        :type payloads: List[Payload]
         """
-        if self._embed:
-            self._webhook.send(embed=self._embed)
-            log("Notification sent.")
+        store = DedupeStore.from_settings(self._settings)
+        digest = notification_digest(
+            self._route.webhook_url,
+            self._settings.ci_project_path or self._settings.project_label,
+            self._settings.ci_commit_ref_name,
+            payloads)
+
+        if store and store.seen(digest):
+            log("Identical notification already sent, skipped.")
+            return
+
+        if not may_deliver():
+            log("Notification no longer owned by this run, skipped.")
             return
 
-        err("Notification not sent due to missing embeds.")
+        if not self._webhook:
+            use_api_base(self._settings.discord_api_base)
+            self._webhook = SyncWebhook.from_url(self._route.webhook_url)
+
+        if not deliver_or_queue(
+                self._settings, self._webhook, self._route.webhook_url,
+                payloads):
+            self._delivery_failed = True
+        elif store:
+            store.remember(digest)
 
     def _get_vuln_counts(self):
         """
@@ -294,19 +417,34 @@ class DiscordNotifier:
             if data_pack and data_pack.counts:
                 return data_pack.counts
 
+    def _get_score_stats(self) -> dict[str, dict[str, ScoreStats]]:
+        """
+        Method for getting the CVSS score statistics
+
+        :param self: ref to class self
+        :return: CVSS column to severity to score statistics
+        :rtype: dict[str, dict[str, ScoreStats]]
+        """
+        data_pack = self._parser.get_data() if self._parser else None
+
+        return data_pack.score_stats if data_pack else {}
+
     def _get_vuln_above_lvl(
         self,
-        severity: Optional[Severity] = None
-    ) -> Optional[List[Vulnerability]]:
+        severity: Optional[Severity] = None,
+        max_severity: Optional[Severity] = None
+    ) -> Optional[Sequence[Vulnerability]]:
         """
         Method to filter out vulnerabilities below threshold
 
         :param self: ref to class self
         :param severity: Minimum Severity level
         :type severity: Optional[Severity]
+        :param max_severity: Maximum Severity level
+        :type max_severity: Optional[Severity]
         :return: list of vulnerabilities after filtration
-        :rtype: List[Vulnerability] | None
+        :rtype: Sequence[Vulnerability] | None
         """
         if self._parser:
             return self._parser.filter_by_min_severity(
-                severity or self._settings.min_severity)
+                severity or self._settings.min_severity, max_severity)
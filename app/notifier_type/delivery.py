@@ -0,0 +1,179 @@
+"""
+Low-level delivery of rendered payloads to a Discord webhook
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
+
+import disnake
+import requests
+from disnake import (DiscordServerError, Embed, File, HTTPException,
+                     SyncWebhook)
+
+from app.notifier_type.renderers import Payload
+from utils.common import err
+
+# Raised by SyncWebhook once its own 5 attempts all got a 429 or 5xx
+# (the failed response is falsy, so it never reaches its final raise)
+_EXHAUSTED_MESSAGE = "Unreachable code in HTTP handling."
+
+# Last check before a notification is posted, set by the spool workers
+_guard: ContextVar[Optional[Callable[[], bool]]] = ContextVar(
+    "delivery_guard", default=None)
+
+
+@contextmanager
+def delivery_guard(check: Callable[[], bool]) -> Iterator[None]:
+    """
+    Make every delivery of the wrapped block ask ``check`` first
+
+    Context scoped like the settings, so route threads started with
+    ``in_context`` inherit it.
+
+    :param check: returns False when the notification must not be posted
+    :type check: Callable[[], bool]
+    """
+    token = _guard.set(check)
+
+    try:
+        yield
+    finally:
+        _guard.reset(token)
+
+
+def may_deliver() -> bool:
+    """
+    Whether the active delivery guard, if any, allows posting now
+
+    :return: True without a guard
+    :rtype: bool
+    """
+    check = _guard.get()
+
+    return check is None or check()
+
+
+def use_api_base(api_base: str) -> None:
+    """
+    Point every webhook call at another Discord API base (e.g. the mock)
+
+    :param api_base: API base URL, ignored when empty
+    :type api_base: str
+    """
+    if api_base:
+        # disnake resolves every webhook route against this base
+        disnake.http.Route.BASE = api_base
+
+
+def send_payload(webhook: SyncWebhook, payload: Payload) -> None:
+    """
+    Send one rendered payload
+
+    :param webhook: target webhook
+    :type webhook: SyncWebhook
+    :param payload: rendered message
+    :type payload: Payload
+    """
+    kwargs: dict[str, Any] = {}
+
+    if payload.content:
+        kwargs["content"] = payload.content
+
+    if payload.embeds:
+        kwargs["embeds"] = [Embed.from_dict(e) for e in payload.embeds]
+
+    files = [path for path in payload.files if Path(path).is_file()]
+
+    if len(files) < len(payload.files):
+        # e.g. replayed from the outbox after the job's files were cleaned
+        err("Attachment(s) missing, sending without them: ",
+            ", ".join(sorted(set(payload.files) - set(files))))
+
+    if files:
+        # Opened per attempt, disnake closes them after the request
+        kwargs["files"] = [File(path) for path in files]
+
+    webhook.send(**kwargs)
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Whether a failed send may succeed later (outage, rate limit, network)
+    rather than being rejected for good (bad payload, deleted webhook)
+
+    :param error: exception raised by the send
+    :type error: Exception
+    :return: True for transient failures
+    :rtype: bool
+    """
+    if _retried_by_disnake(error):
+        return True
+
+    if isinstance(error, HTTPException):
+        return error.status == 429 or error.status >= 500
+
+    return isinstance(error, (requests.RequestException, OSError))
+
+
+def _retried_by_disnake(error: Exception) -> bool:
+    """
+    Whether the error comes out of SyncWebhook's own retry loop, which
+    already spent up to 5 attempts (sleeping 1 + 2 * attempt seconds
+    between them) on 429 and 5xx responses
+
+    :param error: exception raised by the send
+    :type error: Exception
+    :return: True when retrying again would only repeat that loop
+    :rtype: bool
+    """
+    if isinstance(error, DiscordServerError):
+        return True
+
+    if isinstance(error, HTTPException) and error.status == 429:
+        return True
+
+    return (isinstance(error, RuntimeError)
+            and str(error) == _EXHAUSTED_MESSAGE)
+
+
+def send_with_retry(
+        webhook: SyncWebhook,
+        payload: Payload,
+        retries: int,
+        backoff: float) -> None:
+    """
+    Send a payload, retrying transient failures with exponential backoff
+
+    Outages and rate limits (429, 5xx) are already retried by SyncWebhook
+    itself, about 25 s worst case, and are not retried again here: only
+    network errors use ``retries``. Worst-case wall time is therefore
+    roughly 25 s plus ``backoff * (2 ** retries - 1)``.
+
+    :param webhook: target webhook
+    :type webhook: SyncWebhook
+    :param payload: rendered message
+    :type payload: Payload
+    :param retries: additional attempts after the first one
+    :type retries: int
+    :param backoff: delay before the first retry in seconds, doubled after
+    every attempt
+    :type backoff: float
+    :raises Exception: the last error once the attempts are exhausted or
+    the error is not retryable
+    """
+    attempt = 0
+
+    while True:
+        try:
+            send_payload(webhook, payload)
+            return
+        except Exception as e:
+            if (attempt >= retries or not is_retryable(e)
+                    or _retried_by_disnake(e)):
+                raise
+
+            time.sleep(backoff * (2 ** attempt))
+            attempt += 1
@@ -0,0 +1,481 @@
+"""
+Renderers turning a parsed report into Discord webhook payloads, one per
+DC_NOTIFY_MODE. Every renderer packs its output against Discord's message
+limits so a report needs as few requests (and bytes) as possible.
+"""
+
+from __future__ import annotations
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Any, Iterable, List, Optional, Sequence
+
+from pydantic import BaseModel
+
+from app.cvss_stats import ScoreStats
+from app.DCParser import Vulnerability
+from settings import NotifyMode
+
+# Discord message / embed limits
+MAX_CONTENT = 2000
+MAX_EMBED_TOTAL = 6000
+MAX_FIELDS = 25
+MAX_FIELD_NAME = 256
+MAX_FIELD_VALUE = 1024
+MAX_TITLE = 256
+
+# Upper bound of messages a single notification may fan out to
+MAX_MESSAGES = 10
+
+SEVERITY_LABELS = {
+    "low": "🟩 Low",
+    "medium": "🟨 Medium",
+    "moderate": "🟧 Moderate",
+    "high": "🅾️ HIGH",
+    "critical": "📛 CRITICAL!!!",
+}
+SEVERITY_SHORT = {
+    "low": "LOW",
+    "medium": "MED",
+    "moderate": "MOD",
+    "high": "HIGH",
+    "critical": "CRIT",
+}
+COUNT_LABELS = {s: f"**{s.capitalize()}**" for s in SEVERITY_LABELS}
+# Histogram bars, from an empty bin to the fullest one
+SPARK_BARS = "▁▂▃▄▅▆▇█"
+LINK_LABELS = {
+    "html": "HTML report",
+    "zip": "Artifacts (zip)",
+    "pipeline": "Pipeline",
+    "repo": "Repository",
+}
+
+
+class Payload(BaseModel):
+    content: Optional[str] = None
+    embeds: List[dict[str, Any]] = []
+    # Paths of local files uploaded with the message
+    files: List[str] = []
+
+
+@dataclass
+class RenderContext:
+    """
+    Everything a renderer needs, prepared once by the notifier
+
+    ``header`` is the base embed (title, description, colour, author,
+    footer...) as produced by ``Embed.to_dict``.
+    """
+    header: dict[str, Any]
+    vulns: Sequence[Vulnerability] = field(default_factory=list)
+    counts: Optional[dict[str, int]] = None
+    links: dict[str, str] = field(default_factory=dict)
+    max_items: int = 0
+    show_counts: bool = False
+    score_stats: dict[str, dict[str, ScoreStats]] = field(
+        default_factory=dict)
+
+
+def fmt_score(score: Optional[float]) -> Optional[str]:
+    """
+    Format a CVSS score with one decimal, None when unscored
+    """
+    if score is None:
+        return None
+
+    return "{:.1f}".format(score)
+
+
+def sparkline(histogram: List[int]) -> str:
+    """
+    One bar per histogram bin, scaled to the fullest bin
+    """
+    top = max(histogram, default=0)
+
+    if not top:
+        return ""
+
+    steps = len(SPARK_BARS) - 1
+
+    return "".join(
+        SPARK_BARS[-(-count * steps // top)] for count in histogram)
+
+
+def clip(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+def _embed_size(embed: dict[str, Any]) -> int:
+    """
+    Characters of an embed counted towards Discord's 6000 limit
+    """
+    size = len(embed.get("title") or "")
+    size += len(embed.get("description") or "")
+    size += len((embed.get("footer") or {}).get("text") or "")
+    size += len((embed.get("author") or {}).get("name") or "")
+
+    for fld in embed.get("fields") or []:
+        size += len(fld["name"]) + len(fld["value"])
+
+    return size
+
+
+def add_lines_field(
+        embed: dict[str, Any],
+        name: str,
+        lines: Iterable[str]) -> bool:
+    """
+    Append a field of whole lines to an embed, as many as fit in a field
+    value; the field is left out when the embed has no room left for it
+
+    :param embed: embed dict, as produced by ``Embed.to_dict``
+    :type embed: dict[str, Any]
+    :param name: field name
+    :type name: str
+    :param lines: field lines, in display order
+    :type lines: Iterable[str]
+    :return: whether the field was added
+    :rtype: bool
+    """
+    value = ""
+
+    for line in lines:
+        line = clip(line, MAX_FIELD_VALUE - 1)
+
+        if len(value) + len(line) + 1 > MAX_FIELD_VALUE:
+            break
+
+        value += line + "\n"
+
+    fields = embed.setdefault("fields", [])
+
+    if (
+        not value or
+        len(fields) >= MAX_FIELDS or
+        _embed_size(embed) + len(name) + len(value) > MAX_EMBED_TOTAL
+    ):
+        return False
+
+    fields.append({"name": name, "value": value, "inline": False})
+
+    return True
+
+
+def _limit_items(
+        vulns: Sequence[Vulnerability],
+        max_items: int) -> tuple[Sequence[Vulnerability], int]:
+    """
+    Apply DC_MAX_ITEMS (0 = unlimited)
+
+    :return: the findings to show and how many were left out
+    """
+    if max_items > 0 and len(vulns) > max_items:
+        return vulns[:max_items], len(vulns) - max_items
+
+    return vulns, 0
+
+
+class Renderer(ABC):
+    """
+    Base renderer, turns a render context into webhook payloads
+
+    ``truncated`` is set by ``render`` when some of the findings did not
+    make it into the payloads.
+    """
+    truncated: bool = False
+
+    @abstractmethod
+    def render(self, ctx: RenderContext) -> List[Payload]:
+        """
+        Build the webhook payloads of a notification
+
+        :param self: ref to class self
+        :param ctx: what to render
+        :type ctx: RenderContext
+        :return: payloads, in posting order
+        :rtype: List[Payload]
+        """
+
+    @staticmethod
+    def _header(ctx: RenderContext) -> dict[str, Any]:
+        embed = dict(ctx.header)
+        embed["title"] = clip(embed.get("title") or "", MAX_TITLE)
+        embed["fields"] = list(embed.get("fields") or [])
+        return embed
+
+    @staticmethod
+    def _counts_field(ctx: RenderContext) -> Optional[dict[str, Any]]:
+        if not ctx.show_counts or not ctx.counts:
+            return None
+
+        value = "".join(
+            f"{COUNT_LABELS.get(sev) or f'**{sev.capitalize()}**'}: "
+            f"`{count}`\n"
+            for sev, count in ctx.counts.items())
+
+        return {"name": "Vulnerabilities Count", "value": value,
+                "inline": False}
+
+    @staticmethod
+    def _scores_field(ctx: RenderContext) -> Optional[dict[str, Any]]:
+        stats = ctx.score_stats.get("best")
+
+        if not ctx.show_counts or not stats:
+            return None
+
+        order = list(ctx.counts or {}) + [
+            sev for sev in stats if sev not in (ctx.counts or {})]
+        value = "".join(
+            f"{COUNT_LABELS.get(sev) or f'**{sev.capitalize()}**'}: "
+            f"max `{fmt_score(stats[sev].max)}` · "
+            f"mean `{fmt_score(stats[sev].mean)}` · "
+            f"p50 `{fmt_score(stats[sev].p50)}` · "
+            f"p90 `{fmt_score(stats[sev].p90)}` "
+            f"`{sparkline(stats[sev].histogram)}`\n"
+            for sev in order if sev in stats)
+
+        return {"name": "CVSS scores (0-10)",
+                "value": clip(value, MAX_FIELD_VALUE), "inline": False}
+
+    @staticmethod
+    def _links_field(ctx: RenderContext) -> Optional[dict[str, Any]]:
+        if not ctx.links:
+            return None
+
+        value = " · ".join(
+            f"[{LINK_LABELS.get(key, key)}]({url})"
+            for key, url in ctx.links.items())
+
+        return {"name": "Links", "value": clip(value, MAX_FIELD_VALUE),
+                "inline": False}
+
+
+class LinkRenderer(Renderer):
+    """
+    Header embed with the report / pipeline links only
+    """
+
+    def render(self, ctx: RenderContext) -> List[Payload]:
+        embed = self._header(ctx)
+        links = self._links_field(ctx)
+
+        if links:
+            embed["fields"].append(links)
+
+        # None of the findings are listed in this mode
+        self.truncated = bool(ctx.vulns)
+
+        return [Payload(embeds=[embed])]
+
+
+class SummaryRenderer(Renderer):
+    """
+    Header embed with counts and the findings packed densely: one line per
+    finding, lines grouped into fields per severity, fields packed into as
+    few messages as the 6000 character budget allows.
+    """
+    with_links: bool = False
+
+    def render(self, ctx: RenderContext) -> List[Payload]:
+        embed = self._header(ctx)
+
+        for extra in (
+            self._counts_field(ctx),
+            self._scores_field(ctx),
+            self._links_field(ctx) if self.with_links else None,
+        ):
+            if extra:
+                embed["fields"].append(extra)
+
+        shown, hidden = _limit_items(ctx.vulns, ctx.max_items)
+        fields = self._finding_fields(shown)
+
+        if hidden:
+            fields.append({"name": "…", "value": f"and {hidden} more "
+                           "finding(s) not shown", "inline": False})
+            self.truncated = True
+
+        messages = [embed]
+        used = _embed_size(embed)
+
+        for fld in fields:
+            size = len(fld["name"]) + len(fld["value"])
+            current = messages[-1]
+
+            if (
+                len(current["fields"]) >= MAX_FIELDS or
+                used + size > MAX_EMBED_TOTAL
+            ):
+                if len(messages) >= MAX_MESSAGES:
+                    self.truncated = True
+                    break
+
+                current = self._continuation(embed, len(messages) + 1)
+                messages.append(current)
+                used = _embed_size(current)
+
+            current["fields"].append(fld)
+            used += size
+
+        return [Payload(embeds=[e]) for e in messages]
+
+    @staticmethod
+    def _continuation(header: dict[str, Any], page: int) -> dict[str, Any]:
+        embed: dict[str, Any] = {
+            "title": clip(f"{header.get('title') or ''} ({page})",
+                          MAX_TITLE),
+            "fields": [],
+        }
+
+        for key in ("type", "color", "url"):
+            if key in header:
+                embed[key] = header[key]
+
+        return embed
+
+    @staticmethod
+    def _finding_line(vuln: Vulnerability) -> str:
+        ids = ", ".join(vuln.ids) or "n/a"
+        link = f"[{ids}]({vuln.url})" if vuln.url else ids
+        scores = " ".join(
+            f"{label} `{value}`"
+            for label, value in (
+                ("v2", fmt_score(vuln.scorev2)),
+                ("v3", fmt_score(vuln.scorev3)),
+                ("v4", fmt_score(vuln.scorev4)),
+            ) if value)
+
+        fix = f" → `{vuln.fixed_in}`" if vuln.fixed_in else ""
+
+        return (f"**{vuln.dependency}** `{vuln.version}`{fix}"
+                f"{' ' + scores if scores else ''} {link}\n")
+
+    def _finding_fields(
+            self,
+            vulns: Sequence[Vulnerability]) -> List[dict[str, Any]]:
+        fields: List[dict[str, Any]] = []
+        severity = None
+        value = ""
+
+        def flush() -> None:
+            if value and severity is not None:
+                name = SEVERITY_LABELS.get(severity, severity.upper())
+                fields.append({"name": name, "value": value,
+                               "inline": False})
+
+        for vuln in vulns:
+            line = clip(self._finding_line(vuln), MAX_FIELD_VALUE)
+
+            if (
+                vuln.severity != severity or
+                len(value) + len(line) > MAX_FIELD_VALUE
+            ):
+                flush()
+                severity = vuln.severity
+                value = ""
+
+            value += line
+
+        flush()
+
+        return fields
+
+
+class BothRenderer(SummaryRenderer):
+    """
+    Summary renderer that also carries the links field
+    """
+    with_links = True
+
+
+class PlainRenderer(Renderer):
+    """
+    Plain text content (no embed): a dense fixed-width table packed into a
+    single 2000 character message
+    """
+
+    def render(self, ctx: RenderContext) -> List[Payload]:
+        title = ctx.header.get("title") or ""
+        lines = [f"**{title}**"]
+
+        if ctx.header.get("description"):
+            lines.append(ctx.header["description"])
+
+        if ctx.show_counts and ctx.counts:
+            lines.append(" ".join(
+                f"{SEVERITY_SHORT.get(sev, sev.upper())}:{count}"
+                for sev, count in ctx.counts.items()))
+
+        links = " ".join(
+            f"<{url}>" for url in ctx.links.values())
+        head = "\n".join(lines) + "\n"
+        tail = f"{links}\n" if links else ""
+
+        shown, hidden = _limit_items(ctx.vulns, ctx.max_items)
+
+        if not shown:
+            return [Payload(content=clip(head + tail, MAX_CONTENT))]
+
+        dep_width = min(32, max(len(v.dependency) for v in shown[:200]))
+        ver_width = min(16, max(len(v.version) for v in shown[:200]))
+        fix_width = min(16, max(len(v.fixed_in or "") for v in shown[:200]))
+        rows: List[str] = []
+        budget = MAX_CONTENT - len(head) - len(tail) - len("```\n```\n")
+
+        for i, vuln in enumerate(shown):
+            score = fmt_score(vuln.score)
+            row = (
+                f"{SEVERITY_SHORT.get(vuln.severity, vuln.severity[:4]):<4} "
+                f"{score or '-':>4} "
+                f"{vuln.dependency[:dep_width]:<{dep_width}} "
+                f"{vuln.version[:ver_width]:<{ver_width}} "
+                f"{self._fix_column(vuln, fix_width)}"
+                f"{','.join(vuln.ids)}\n"
+            )
+            more = hidden + len(shown) - i - 1
+            reserve = len(f"+{more} more\n") if more else 0
+
+            if len(row) + reserve > budget:
+                hidden += len(shown) - i
+                break
+
+            rows.append(row)
+            budget -= len(row)
+
+        if hidden:
+            rows.append(f"+{hidden} more\n")
+            self.truncated = True
+
+        content = head + "```\n" + "".join(rows) + "```\n" + tail
+
+        return [Payload(content=clip(content, MAX_CONTENT))]
+
+    @staticmethod
+    def _fix_column(vuln: Vulnerability, width: int) -> str:
+        # Left out entirely when none of the shown findings has a fix
+        if not width:
+            return ""
+
+        fix = f"→{vuln.fixed_in[:width]}" if vuln.fixed_in else "-"
+
+        return f"{fix:<{width + 1}} "
+
+
+RENDERERS: dict[NotifyMode, type[Renderer]] = {
+    NotifyMode.LINK: LinkRenderer,
+    NotifyMode.SUMMARY: SummaryRenderer,
+    NotifyMode.BOTH: BothRenderer,
+    NotifyMode.PLAIN: PlainRenderer,
+}
+
+
+def get_renderer(mode: NotifyMode) -> Renderer:
+    """
+    Renderer implementing a DC_NOTIFY_MODE
+
+    :param mode: notification mode
+    :type mode: NotifyMode
+    :return: renderer instance
+    :rtype: Renderer
+    """
+    return RENDERERS[mode]()
@@ -0,0 +1,397 @@
+"""
+Durable on-disk outbox for payloads that could not be delivered
+
+Layout of the outbox directory:
+
+- ``outbox.log``: append-only queue, one ``<key>\\t<record json>`` line
+  per payload, in send order.
+- ``outbox.acked``: append-only list of delivered (or dropped) keys.
+- ``replay.lock``: held by the one replay draining the outbox.
+
+Keeping the key in front of the JSON lets replay skip delivered records
+without decoding them, and acknowledging a record is a single short append.
+The queue is compacted once everything in it has been acknowledged.
+"""
+
+from __future__ import annotations
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import IO, List
+
+from disnake import SyncWebhook
+from pydantic import BaseModel
+
+from app.notifier_type.delivery import is_retryable, send_with_retry
+from app.notifier_type.renderers import Payload
+from settings import Settings
+from utils.common import err, file_lock, in_context, log
+
+QUEUE_FILE = "outbox.log"
+ACKED_FILE = "outbox.acked"
+LOCK_FILE = ".lock"
+REPLAY_LOCK_FILE = "replay.lock"
+MAX_REPLAY_WORKERS = 8
+ACK_FSYNC_EVERY = 64
+
+
+class OutboxRecord(BaseModel):
+    key: str
+    webhook: str
+    created: float
+    payload: Payload
+
+
+def make_keys(webhook_url: str, payloads: List[Payload]) -> List[str]:
+    """
+    Idempotency keys of a batch of payloads for a given webhook
+
+    Keys cover the whole batch and the position in it, so continuation
+    messages that happen to be identical across runs stay distinct while
+    re-queuing the same batch yields the same keys.
+
+    :param webhook_url: destination webhook
+    :type webhook_url: str
+    :param payloads: rendered messages of one notification
+    :type payloads: List[Payload]
+    :return: hex digests identifying each delivery
+    :rtype: List[str]
+    """
+    batch = hashlib.sha256(webhook_url.encode())
+
+    for payload in payloads:
+        batch.update(json.dumps(
+            payload.model_dump(exclude_none=True),
+            sort_keys=True, separators=(",", ":"),
+            ensure_ascii=False).encode())
+
+    digest = batch.hexdigest()[:24]
+
+    return [f"{digest}-{i}" for i in range(len(payloads))]
+
+
+class Outbox:
+    _directory: Path
+    _ack_lock: threading.Lock
+
+    def __init__(self, directory: Path):
+        """
+        Outbox stored under the given directory (created on demand)
+
+        :param self: ref to class self
+        :param directory: outbox directory
+        :type directory: Path
+        """
+        self._directory = directory
+        self._ack_lock = threading.Lock()
+
+    @property
+    def queue_path(self) -> Path:
+        return self._directory / QUEUE_FILE
+
+    @property
+    def acked_path(self) -> Path:
+        return self._directory / ACKED_FILE
+
+    @property
+    def replay_lock_path(self) -> Path:
+        return self._directory / REPLAY_LOCK_FILE
+
+    def append(self, webhook_url: str, payloads: List[Payload]) -> int:
+        """
+        Durably queue payloads for later delivery, in order
+
+        :param self: ref to class self
+        :param webhook_url: destination webhook
+        :type webhook_url: str
+        :param payloads: rendered messages
+        :type payloads: List[Payload]
+        :return: number of queued payloads
+        :rtype: int
+        """
+        now = time.time()
+        lines = []
+
+        for key, payload in zip(make_keys(webhook_url, payloads), payloads):
+            record = OutboxRecord(
+                key=key,
+                webhook=webhook_url,
+                created=now,
+                payload=payload,
+            )
+            lines.append(
+                f"{record.key}\t{record.model_dump_json(exclude_none=True)}\n")
+
+        with file_lock(self._directory / LOCK_FILE):
+            with self.queue_path.open("a", encoding="utf-8") as f:
+                f.write("".join(lines))
+                f.flush()
+                os.fsync(f.fileno())
+
+        return len(lines)
+
+    def _acked_keys(self) -> set[str]:
+        if not self.acked_path.exists():
+            return set()
+
+        with self.acked_path.open(encoding="utf-8") as f:
+            return {line.rstrip("\n") for line in f if line.strip()}
+
+    def pending(self) -> List[OutboxRecord]:
+        """
+        Queued records not acknowledged yet, oldest first, without
+        duplicates
+
+        :param self: ref to class self
+        :return: records to deliver
+        :rtype: List[OutboxRecord]
+        """
+        if not self.queue_path.exists():
+            return []
+
+        done = self._acked_keys()
+        records: List[OutboxRecord] = []
+
+        with self.queue_path.open(encoding="utf-8") as f:
+            for line in f:
+                key, _, body = line.partition("\t")
+
+                if not body or key in done:
+                    continue
+
+                done.add(key)
+                records.append(OutboxRecord.model_validate_json(body))
+
+        return records
+
+    def ack(self, handle: IO[str], key: str, count: int) -> None:
+        """
+        Record a key as delivered (thread-safe)
+
+        :param self: ref to class self
+        :param handle: open handle of the acked file
+        :type handle: IO[str]
+        :param key: record key
+        :type key: str
+        :param count: running number of acks, used to batch fsyncs
+        :type count: int
+        """
+        with self._ack_lock:
+            handle.write(key + "\n")
+            handle.flush()
+
+            if count % ACK_FSYNC_EVERY == 0:
+                os.fsync(handle.fileno())
+
+    def compact(self) -> None:
+        """
+        Drop acknowledged records, truncating the outbox when it is drained
+
+        :param self: ref to class self
+        """
+        with file_lock(self._directory / LOCK_FILE):
+            if not self.queue_path.exists():
+                return
+
+            done = self._acked_keys()
+            tmp = self.queue_path.with_suffix(".tmp")
+            kept = 0
+
+            with (
+                self.queue_path.open(encoding="utf-8") as src,
+                tmp.open("w", encoding="utf-8") as dst,
+            ):
+                for line in src:
+                    if line.partition("\t")[0] not in done:
+                        dst.write(line)
+                        kept += 1
+
+                dst.flush()
+                os.fsync(dst.fileno())
+
+            if kept:
+                os.replace(tmp, self.queue_path)
+            else:
+                tmp.unlink()
+                self.queue_path.unlink()
+
+            self.acked_path.unlink(missing_ok=True)
+
+
+def deliver_or_queue(
+        settings: Settings,
+        webhook: SyncWebhook,
+        webhook_url: str,
+        payloads: List[Payload]) -> bool:
+    """
+    Send payloads in order, retrying transient failures. Payloads that still
+    cannot be delivered are queued in the outbox (if configured) together
+    with everything after them, so ordering survives the outage.
+
+    :param settings: settings derived from env vars
+    :type settings: Settings
+    :param webhook: target webhook
+    :type webhook: SyncWebhook
+    :param webhook_url: URL of the webhook, stored with queued payloads
+    :type webhook_url: str
+    :param payloads: rendered messages
+    :type payloads: List[Payload]
+    :return: False if any payload was lost
+    :rtype: bool
+    """
+    retryable = False
+    undelivered: List[Payload] = []
+
+    for i, payload in enumerate(payloads):
+        try:
+            send_with_retry(
+                webhook,
+                payload,
+                retries=settings.send_retries,
+                backoff=settings.retry_backoff_ms / 1000)
+        except Exception as e:
+            err("Notification failed: ", e)
+            retryable = is_retryable(e)
+            undelivered = payloads[i:]
+            break
+
+    if not undelivered:
+        log("Notification sent." if len(payloads) == 1
+            else f"Notification sent ({len(payloads)} messages).")
+        return True
+
+    if not retryable or not settings.outbox_dir:
+        err(f"{len(undelivered)} message(s) lost.")
+        return False
+
+    try:
+        queued = Outbox(settings.outbox_dir).append(webhook_url, undelivered)
+    except OSError as e:
+        err("Could not write to the outbox: ", e)
+        return False
+
+    log(f"{queued} message(s) queued in the outbox for replay.")
+
+    return True
+
+
+class _RateLimiter:
+    """
+    Minimum spacing between sends to one webhook
+    """
+
+    def __init__(self, interval: float):
+        self._interval = interval
+        self._next = 0.0
+
+    def wait(self) -> None:
+        now = time.monotonic()
+
+        if now < self._next:
+            time.sleep(self._next - now)
+            now = self._next
+
+        self._next = now + self._interval
+
+
+def replay(
+        outbox: Outbox,
+        interval: float,
+        retries: int,
+        backoff: float) -> tuple[int, int]:
+    """
+    Drain the outbox: deliver every pending record in order per webhook,
+    rate limited, webhooks drained in parallel. A webhook stops draining at
+    its first transient failure so its order is preserved for the next
+    replay; permanently rejected records are dropped.
+
+    The whole drain holds an exclusive lock, so overlapping replays wait
+    for each other and never post the same record twice. Records queued
+    meanwhile are left for the next replay.
+
+    :param outbox: outbox to drain
+    :type outbox: Outbox
+    :param interval: minimum seconds between two sends to the same webhook
+    :type interval: float
+    :param retries: retries per record for transient failures
+    :type retries: int
+    :param backoff: initial retry backoff in seconds
+    :type backoff: float
+    :return: number of delivered records and records left in the outbox
+    :rtype: tuple[int, int]
+    """
+    with file_lock(outbox.replay_lock_path):
+        return _replay_locked(outbox, interval, retries, backoff)
+
+
+def _replay_locked(
+        outbox: Outbox,
+        interval: float,
+        retries: int,
+        backoff: float) -> tuple[int, int]:
+    records = outbox.pending()
+
+    if not records:
+        return 0, 0
+
+    by_webhook: dict[str, List[OutboxRecord]] = {}
+
+    for record in records:
+        by_webhook.setdefault(record.webhook, []).append(record)
+
+    counter = {"acked": 0, "sent": 0}
+    counter_lock = threading.Lock()
+
+    def drain(
+            handle: IO[str],
+            webhook_url: str,
+            queue: List[OutboxRecord]) -> int:
+        webhook = SyncWebhook.from_url(webhook_url)
+        limiter = _RateLimiter(interval)
+
+        for i, record in enumerate(queue):
+            limiter.wait()
+
+            try:
+                send_with_retry(webhook, record.payload, retries, backoff)
+            except Exception as e:
+                if is_retryable(e):
+                    err(f"Replay paused for a webhook, {len(queue) - i} "
+                        "record(s) kept: ", e)
+                    return len(queue) - i
+
+                err(f"Dropping undeliverable outbox record {record.key}: ", e)
+            else:
+                with counter_lock:
+                    counter["sent"] += 1
+
+            with counter_lock:
+                counter["acked"] += 1
+                count = counter["acked"]
+
+            outbox.ack(handle, record.key, count)
+
+        return 0
+
+    outbox.acked_path.parent.mkdir(parents=True, exist_ok=True)
+
+    with outbox.acked_path.open("a", encoding="utf-8") as handle:
+        workers = min(MAX_REPLAY_WORKERS, len(by_webhook))
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            left = sum(pool.map(
+                in_context(lambda item: drain(handle, *item)),
+                by_webhook.items()))
+
+        handle.flush()
+        os.fsync(handle.fileno())
+
+    outbox.compact()
+    log(f"Outbox replay delivered {counter['sent']} message(s), "
+        f"{left} left.")
+
+    return counter["sent"], left
@@ -0,0 +1,212 @@
+"""
+Inverted package index across runs, for "who ships X" queries
+
+Every parsed report contributes its package ids (``packages[].id`` and
+``relatedDependencies[].packageIds``), file names and vulnerability ids.
+They are stored in SQLite (DC_INDEX_PATH) as postings from each term to the
+run (project, ref, pipeline) that contains it; a new run of the same
+project / ref replaces its previous postings, so the index reflects what
+every ref currently ships. Lookups only touch the index.
+"""
+
+from __future__ import annotations
+import datetime
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+from pydantic import BaseModel
+
+from app.DCParser import DCParser
+from settings import Settings
+from utils.common import err, log
+
+KINDS = ("package", "file", "cve")
+# Seconds a writer waits for a concurrent one to finish
+BUSY_TIMEOUT = 30
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    project TEXT NOT NULL,
+    ref TEXT NOT NULL,
+    pipeline_id TEXT NOT NULL,
+    pipeline_url TEXT,
+    report_date TEXT NOT NULL,
+    indexed_at TEXT NOT NULL,
+    UNIQUE (project, ref)
+);
+CREATE TABLE IF NOT EXISTS terms (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    term TEXT NOT NULL,
+    UNIQUE (kind, term)
+);
+CREATE TABLE IF NOT EXISTS postings (
+    term_id INTEGER NOT NULL REFERENCES terms (id),
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    PRIMARY KEY (term_id, run_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_run ON postings (run_id);
+"""
+
+
+class IndexHit(BaseModel):
+    project: str
+    ref: str
+    pipeline_id: str
+    pipeline_url: Optional[str] = None
+    report_date: str
+    terms: List[str]
+
+
+class PackageIndex:
+    _path: Path
+
+    def __init__(self, path: Path):
+        """
+        Index stored in the given SQLite file (created on demand)
+
+        :param self: ref to class self
+        :param path: SQLite database file
+        :type path: Path
+        """
+        self._path = path
+
+    def _connect(self) -> sqlite3.Connection:
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self._path, timeout=BUSY_TIMEOUT)
+        # WAL lets queries run while a pipeline is writing its run
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        conn.executescript(SCHEMA)
+
+        return conn
+
+    def add_run(
+            self,
+            project: str,
+            ref: str,
+            pipeline_id: str,
+            pipeline_url: Optional[str],
+            report_date: str,
+            terms: Iterable[tuple[str, str]]) -> int:
+        """
+        Store the terms of a run, replacing the previous run of the same
+        project and ref, in one transaction
+
+        :param self: ref to class self
+        :param project: project path or label
+        :type project: str
+        :param ref: commit ref name
+        :type ref: str
+        :param pipeline_id: CI pipeline id
+        :type pipeline_id: str
+        :param pipeline_url: CI pipeline URL
+        :type pipeline_url: Optional[str]
+        :param report_date: report date from the report metadata
+        :type report_date: str
+        :param terms: (kind, term) pairs
+        :type terms: Iterable[tuple[str, str]]
+        :return: number of postings stored
+        :rtype: int
+        """
+        rows = sorted(set(terms))
+        now = datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "DELETE FROM runs WHERE project = ? AND ref = ?",
+                (project, ref))
+            run_id = conn.execute(
+                "INSERT INTO runs (project, ref, pipeline_id, pipeline_url,"
+                " report_date, indexed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (project, ref, pipeline_id, pipeline_url, report_date, now),
+            ).lastrowid
+            conn.executemany(
+                "INSERT OR IGNORE INTO terms (kind, term) VALUES (?, ?)",
+                rows)
+            conn.executemany(
+                "INSERT INTO postings (term_id, run_id) SELECT id, ? FROM"
+                " terms WHERE kind = ? AND term = ?",
+                ((run_id, kind, term) for kind, term in rows))
+
+        return len(rows)
+
+    def lookup(
+            self,
+            kind: str,
+            pattern: str,
+            limit: int = 1000) -> List[IndexHit]:
+        """
+        Runs containing a term
+
+        :param self: ref to class self
+        :param kind: ``package``, ``file`` or ``cve``
+        :type kind: str
+        :param pattern: exact term or glob (``pkg:maven/org.foo/bar@*``),
+        case-sensitive; prefix globs are answered from the index
+        :type pattern: str
+        :param limit: maximum number of runs returned
+        :type limit: int
+        :return: matching runs with the terms they matched, by project
+        :rtype: List[IndexHit]
+        """
+        if not self._path.exists():
+            return []
+
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT r.project, r.ref, r.pipeline_id, r.pipeline_url,"
+                " r.report_date, group_concat(t.term, char(10))"
+                " FROM terms t"
+                " JOIN postings p ON p.term_id = t.id"
+                " JOIN runs r ON r.id = p.run_id"
+                " WHERE t.kind = ? AND t.term GLOB ?"
+                " GROUP BY r.id ORDER BY r.project, r.ref LIMIT ?",
+                (kind, pattern, limit),
+            ).fetchall()
+
+        return [
+            IndexHit(
+                project=project,
+                ref=ref,
+                pipeline_id=pipeline_id,
+                pipeline_url=pipeline_url,
+                report_date=report_date,
+                terms=sorted(terms.split("\n")),
+            )
+            for (project, ref, pipeline_id, pipeline_url, report_date,
+                 terms) in rows
+        ]
+
+
+def write_index(settings: Settings, parser: Optional[DCParser]) -> None:
+    """
+    Add the run to the package index if DC_INDEX_PATH is configured
+
+    :param settings: settings derived from env vars
+    :type settings: Settings
+    :param parser: parsed report, None if the report was missing
+    :type parser: Optional[DCParser]
+    """
+    if not settings.index_path or not parser or parser.failed:
+        return
+
+    data = parser.get_data()
+
+    try:
+        count = PackageIndex(settings.index_path).add_run(
+            project=settings.ci_project_path or settings.project_label,
+            ref=settings.ci_commit_ref_name,
+            pipeline_id=settings.ci_pipeline_id,
+            pipeline_url=settings.pipeline_url,
+            report_date=data.report_date if data else "",
+            terms=parser.get_index_terms())
+    except (OSError, sqlite3.Error) as e:
+        err("Could not update the package index: ", e)
+        return
+
+    log(f"Indexed {count} package(s), file(s) and id(s) "
+        f"in {settings.index_path}.")
@@ -0,0 +1,159 @@
+"""
+Opt-in profiling of the notifier phases using cProfile and tracemalloc
+
+Both profilers are process wide: only one phase is profiled at a time, the
+phases of concurrent notifications (routes, worker threads) that start
+meanwhile run unprofiled.
+"""
+
+import cProfile
+import itertools
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+from settings import Settings
+from utils.common import err, log
+
+TOP_ALLOCATIONS = 25
+TRACEBACK_DEPTH = 25
+
+# Held while a phase is profiled
+_ACTIVE = threading.Lock()
+_RUNS = itertools.count(1)
+
+
+class Profiler:
+    _enabled: bool
+    _directory: Path
+    _run: str
+    _index: int
+
+    def __init__(self, settings: Settings):
+        """
+        Phase profiler, a no-op unless PROFILING is enabled
+
+        :param self: ref to class self
+        :param settings: settings derived from env vars
+        :type settings: Settings
+        """
+        self._enabled = settings.profiling
+        self._directory = settings.profile_dir
+        # Artifacts of every run kept apart, also across processes
+        self._run = (f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-"
+                     f"{next(_RUNS)}")
+        self._index = 0
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """
+        Profile the wrapped block as a named phase.
+
+        Writes ``<run>-<n>-<name>.prof`` (cProfile stats) and
+        ``<run>-<n>-<name>.alloc.txt`` (top allocations by line) into the
+        profile directory once the block exits, even if it raised. The
+        block runs unprofiled while another phase is being profiled.
+
+        :param self: ref to class self
+        :param name: phase name used for the artifact file names
+        :type name: str
+        """
+        if not self._enabled:
+            yield
+            return
+
+        if not _ACTIVE.acquire(blocking=False):
+            log(f"Phase '{name}' not profiled, another phase is being "
+                "profiled.")
+            yield
+            return
+
+        try:
+            with self._profile(name):
+                yield
+        finally:
+            _ACTIVE.release()
+
+    @contextmanager
+    def _profile(self, name: str) -> Iterator[None]:
+        self._index += 1
+        stem = f"{self._run}-{self._index:02d}-{name}"
+
+        owns_tracing = not tracemalloc.is_tracing()
+
+        if owns_tracing:
+            tracemalloc.start(TRACEBACK_DEPTH)
+
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+        profile = cProfile.Profile()
+        profile.enable()
+
+        try:
+            yield
+        finally:
+            profile.disable()
+            after = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+
+            if owns_tracing:
+                tracemalloc.stop()
+
+            try:
+                self._directory.mkdir(parents=True, exist_ok=True)
+                profile.dump_stats(self._directory / f"{stem}.prof")
+                self._write_allocations(
+                    self._directory / f"{stem}.alloc.txt",
+                    name, before, after, current, peak)
+                log(f"Profile for phase '{name}' written to "
+                    f"{self._directory / stem}.*")
+            except OSError as e:
+                err(f"Could not write profile for phase '{name}': ", e)
+
+    @staticmethod
+    def _write_allocations(
+            path: Path,
+            name: str,
+            before: tracemalloc.Snapshot,
+            after: tracemalloc.Snapshot,
+            current: int,
+            peak: int) -> None:
+        """
+        Write the top allocation growth of a phase as plain text
+
+        :param path: output file
+        :type path: Path
+        :param name: phase name
+        :type name: str
+        :param before: snapshot taken when the phase started
+        :type before: tracemalloc.Snapshot
+        :param after: snapshot taken when the phase finished
+        :type after: tracemalloc.Snapshot
+        :param current: traced memory at the end of the phase (bytes)
+        :type current: int
+        :param peak: peak traced memory during the phase (bytes)
+        :type peak: int
+        """
+        ignore = (
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(
+                False, "<frozen importlib._bootstrap_external>"),
+        )
+        diff = after.filter_traces(ignore).compare_to(
+            before.filter_traces(ignore), "lineno")
+
+        lines = [
+            f"phase: {name}",
+            f"traced memory at end: {current / 1024:.1f} KiB",
+            f"traced memory peak: {peak / 1024:.1f} KiB",
+            "",
+            f"top {TOP_ALLOCATIONS} allocation sites (growth during phase):",
+        ]
+        lines.extend(str(stat) for stat in diff[:TOP_ALLOCATIONS])
+
+        path.write_text("\n".join(lines) + "\n")
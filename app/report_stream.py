@@ -0,0 +1,156 @@
+"""
+Streaming reader of the dependencies of a Dependency-Check JSON report
+
+``json.loads`` materialises the whole document and the report model then
+holds it a second time, several times the size of the file. This reader
+decodes one ``dependencies[]`` element at a time from a chunked read, so
+only the dependency being handled is in memory. The other top-level
+members (``scanInfo``, ``projectInfo``...) are small and kept whole.
+"""
+
+from __future__ import annotations
+import json
+import re
+from pathlib import Path
+from typing import Any, Iterator, TextIO
+
+CHUNK_SIZE = 1 << 20
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+class _Reader:
+    """
+    Chunked JSON text with just enough structure to walk two levels
+    """
+    _handle: TextIO
+    _buf: str
+    _pos: int
+    _eof: bool
+
+    def __init__(self, handle: TextIO):
+        self._handle = handle
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self) -> bool:
+        """
+        Read more of the document, at least doubling what is buffered so a
+        value larger than a chunk is decoded a logarithmic number of times
+        """
+        if self._eof:
+            return False
+
+        left = len(self._buf) - self._pos
+        chunk = self._handle.read(max(CHUNK_SIZE, left))
+
+        if not chunk:
+            self._eof = True
+            return False
+
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+
+        return True
+
+    def _skip_whitespace(self) -> None:
+        while True:
+            self._pos = _WHITESPACE.match(self._buf, self._pos).end()
+
+            if self._pos < len(self._buf) or not self._fill():
+                return
+
+    def consume(self, char: str) -> bool:
+        self._skip_whitespace()
+
+        if self._buf.startswith(char, self._pos):
+            self._pos += 1
+            return True
+
+        return False
+
+    def expect(self, char: str) -> None:
+        if not self.consume(char):
+            found = self._buf[self._pos:self._pos + 20] or "end of file"
+            raise ValueError(f"Expected '{char}' in the report, found "
+                             f"'{found}'")
+
+    def value(self, decoder: json.JSONDecoder) -> Any:
+        self._skip_whitespace()
+
+        while True:
+            try:
+                value, end = decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                # Cut by the end of the buffer, or invalid
+                if self._fill():
+                    continue
+                raise
+
+            # A number or literal may go on in the next chunk
+            if end == len(self._buf) and self._fill():
+                continue
+
+            self._pos = end
+
+            return value
+
+
+class ReportStream:
+    """
+    Dependencies of a report, decoded one at a time
+    """
+    _path: Path
+    header: dict[str, Any]
+
+    def __init__(self, path: Path):
+        """
+        Stream over the given report, nothing is read until iterated
+
+        :param self: ref to class self
+        :param path: Dependency-Check JSON report
+        :type path: Path
+        """
+        self._path = path
+        self.header = {}
+
+    def dependencies(self) -> Iterator[dict[str, Any]]:
+        """
+        Yield the raw ``dependencies[]`` elements in document order, the
+        other top-level members are collected into ``header`` on the way
+
+        :param self: ref to class self
+        :raises ValueError: The report is not valid JSON
+        :return: raw dependencies
+        :rtype: Iterator[dict[str, Any]]
+        """
+        decoder = json.JSONDecoder()
+
+        with self._path.open(encoding="utf-8") as handle:
+            reader = _Reader(handle)
+            reader.expect("{")
+
+            if reader.consume("}"):
+                return
+
+            while True:
+                key = reader.value(decoder)
+                reader.expect(":")
+
+                if key == "dependencies" and reader.consume("["):
+                    if not reader.consume("]"):
+                        while True:
+                            yield reader.value(decoder)
+
+                            if reader.consume("]"):
+                                break
+
+                            reader.expect(",")
+                else:
+                    self.header[key] = reader.value(decoder)
+
+                if reader.consume("}"):
+                    return
+
+                reader.expect(",")
@@ -0,0 +1,373 @@
+"""
+Organisation-wide rollup across many projects' run summaries or reports
+
+Inputs are run summaries (``DC_SUMMARY_PATH`` artifacts, JSON or
+MessagePack) and/or raw Dependency-Check JSON reports. They are loaded in
+parallel worker processes, reduced to one record per project (the most
+recent one wins) and aggregated with plain hash maps: per-severity totals,
+unique vulnerabilities, and for every dependency / vulnerability the set of
+projects it affects.
+"""
+
+from __future__ import annotations
+import datetime
+import heapq
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
+from functools import partial
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+from pydantic import BaseModel
+
+from app.DCParser import SEVERITY_ORDER, DCParser, severity_order
+from app.notifier_type.renderers import (
+    COUNT_LABELS, SEVERITY_LABELS, Payload, add_lines_field)
+from app.summary import RunSummary, build_summary, load_summary
+from settings import Settings
+from utils.common import err, log
+
+SUMMARY_SUFFIXES = (".json", ".msgpack")
+# Top-level keys every Dependency-Check JSON report has
+REPORT_KEYS = frozenset(("reportSchema", "scanInfo", "dependencies"))
+DEFAULT_TOP = 15
+
+
+class RollupItem(BaseModel):
+    name: str
+    projects: int
+    severity: str
+
+
+class RollupResult(BaseModel):
+    generated_at: str
+    inputs: int
+    projects: int
+    failed: int = 0
+    counts: dict[str, int] = {}
+    unique_vulnerabilities: int = 0
+    top_dependencies: List[RollupItem] = []
+    top_vulnerabilities: List[RollupItem] = []
+    top_projects: List[tuple[str, dict[str, int]]] = []
+
+
+def collect_inputs(paths: Iterable[Path]) -> List[Path]:
+    """
+    Expand directories into the summary / report files below them
+
+    :param paths: files and directories given on the command line
+    :type paths: Iterable[Path]
+    :return: input files, sorted and de-duplicated
+    :rtype: List[Path]
+    """
+    found: set[Path] = set()
+
+    for path in paths:
+        if path.is_dir():
+            found.update(
+                p for p in path.rglob("*")
+                if p.is_file() and p.suffix in SUMMARY_SUFFIXES)
+        elif path.is_file():
+            found.add(path)
+        else:
+            err(f"Rollup input not found: {path}")
+
+    return sorted(found)
+
+
+class _NotAnInput(Exception):
+    """
+    JSON file that is neither a summary nor a report (parse pack, rendered
+    payloads, spool or outbox file...)
+    """
+
+
+def _is_summary(path: Path) -> bool:
+    """
+    Tell summaries from reports by their fields, skipping other JSON
+    """
+    if path.suffix == ".msgpack":
+        return True
+
+    data = json.loads(path.read_bytes())
+
+    if not isinstance(data, dict):
+        raise _NotAnInput()
+
+    if REPORT_KEYS <= data.keys():
+        return False
+
+    if (
+        "generated_at" in data and
+        data.keys() <= RunSummary.model_fields.keys()
+    ):
+        return True
+
+    raise _NotAnInput()
+
+
+def _load_one(settings: Settings, path: Path) -> RunSummary:
+    """
+    Load a summary, or summarise a raw Dependency-Check report
+
+    :raises _NotAnInput: the file is some other JSON document
+    """
+    if _is_summary(path):
+        return load_summary(path)
+
+    parser = DCParser(replace(settings, report_json=path))
+
+    if parser.failed:
+        raise ValueError(f"could not parse report {path}")
+
+    summary = build_summary(settings, parser)
+    # Raw reports carry no CI context; identify them by their own metadata
+    summary.project = summary.report_name or path.parent.name or path.stem
+    summary.ref = ""
+    summary.generated_at = summary.report_date or summary.generated_at
+
+    return summary
+
+
+def _load_chunk(
+        settings: Settings,
+        paths: List[Path]) -> tuple[List[RunSummary], int]:
+    """
+    Worker entry point: load a chunk of inputs
+
+    :return: loaded summaries and the number of inputs that failed, other
+    JSON documents are left out of both
+    """
+    summaries: List[RunSummary] = []
+    failed = 0
+
+    with settings.activate():
+        for path in paths:
+            try:
+                summary = _load_one(settings, path)
+            except _NotAnInput:
+                log(f"Ignoring {path}: not a summary or report.")
+                continue
+            except Exception as e:
+                err(f"Skipping rollup input {path}: ", e)
+                failed += 1
+                continue
+
+            # Only what the aggregation needs travels back to the parent
+            summaries.append(summary.model_copy(
+                update={"top": [], "fingerprints": [], "score_stats": {}}))
+
+    return summaries, failed
+
+
+def _worse(a: str, b: Optional[str]) -> str:
+    if b is None:
+        return a
+
+    return a if severity_order(a) < severity_order(b) else b
+
+
+def aggregate(
+        summaries: Iterable[RunSummary],
+        inputs: int,
+        failed: int,
+        top: int = DEFAULT_TOP) -> RollupResult:
+    """
+    Merge per-project summaries into the organisation view
+
+    :param summaries: loaded summaries, several per project allowed
+    :type summaries: Iterable[RunSummary]
+    :param inputs: number of inputs given
+    :type inputs: int
+    :param failed: number of inputs that could not be loaded
+    :type failed: int
+    :param top: length of the ranked lists
+    :type top: int
+    :return: aggregated rollup
+    :rtype: RollupResult
+    """
+    latest: dict[tuple[str, str], RunSummary] = {}
+
+    for summary in summaries:
+        key = (summary.project, summary.ref)
+        current = latest.get(key)
+
+        if current is None or summary.generated_at > current.generated_at:
+            latest[key] = summary
+
+    counts: dict[str, int] = {}
+    dependencies: dict[str, tuple[set[str], str]] = {}
+    vulnerabilities: dict[str, set[str]] = {}
+    per_project: dict[str, dict[str, int]] = {}
+
+    for (project, _), summary in latest.items():
+        totals = per_project.setdefault(project, {})
+
+        for severity, count in summary.counts.items():
+            counts[severity] = counts.get(severity, 0) + count
+            totals[severity] = totals.get(severity, 0) + count
+
+        for dependency, severity in summary.dependencies.items():
+            where, worst = dependencies.get(dependency, (set(), severity))
+            where.add(project)
+            dependencies[dependency] = (where, _worse(severity, worst))
+
+        for vuln_id in summary.cves:
+            vulnerabilities.setdefault(vuln_id, set()).add(project)
+
+    def by_spread(item: tuple[str, tuple[set[str], str]]) -> tuple:
+        name, (where, severity) = item
+        return -len(where), severity_order(severity), name
+
+    top_dependencies = [
+        RollupItem(name=name, projects=len(where), severity=severity)
+        for name, (where, severity) in heapq.nsmallest(
+            top, dependencies.items(), key=by_spread)
+    ]
+    top_vulnerabilities = [
+        RollupItem(name=name, projects=len(where), severity="")
+        for name, where in heapq.nsmallest(
+            top, vulnerabilities.items(),
+            key=lambda item: (-len(item[1]), item[0]))
+    ]
+    top_projects = heapq.nsmallest(
+        top, per_project.items(),
+        key=lambda item: tuple(-item[1].get(s, 0) for s in SEVERITY_ORDER))
+
+    return RollupResult(
+        generated_at=datetime.datetime.now(
+            datetime.timezone.utc).isoformat(),
+        inputs=inputs,
+        projects=len(per_project),
+        failed=failed,
+        counts=counts,
+        unique_vulnerabilities=len(vulnerabilities),
+        top_dependencies=top_dependencies,
+        top_vulnerabilities=top_vulnerabilities,
+        top_projects=top_projects,
+    )
+
+
+def run_rollup(
+        settings: Settings,
+        paths: List[Path],
+        workers: int = 0,
+        top: int = DEFAULT_TOP) -> RollupResult:
+    """
+    Load all inputs in parallel and aggregate them
+
+    :param settings: settings derived from env vars, shared with the
+    workers
+    :type settings: Settings
+    :param paths: summaries, reports or directories holding them
+    :type paths: List[Path]
+    :param workers: worker processes, 0 = one per CPU
+    :type workers: int
+    :param top: length of the ranked lists
+    :type top: int
+    :return: aggregated rollup
+    :rtype: RollupResult
+    """
+    inputs = collect_inputs(paths)
+    workers = workers or os.cpu_count() or 1
+    # A few chunks per worker keeps them busy without per-file IPC
+    size = max(1, min(256, len(inputs) // (workers * 4) or 1))
+    chunks = [inputs[i:i + size] for i in range(0, len(inputs), size)]
+    summaries: List[RunSummary] = []
+    failed = 0
+
+    load = partial(_load_chunk, settings)
+
+    if workers == 1 or len(chunks) <= 1:
+        results = list(map(load, chunks))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(load, chunks))
+
+    for loaded, bad in results:
+        summaries.extend(loaded)
+        failed += bad
+
+    return aggregate(summaries, len(summaries) + failed, failed, top)
+
+
+def write_rollup(result: RollupResult, path: Path) -> None:
+    """
+    File sink: JSON, or Markdown when the path ends in ``.md``
+
+    :param result: aggregated rollup
+    :type result: RollupResult
+    :param path: output file
+    :type path: Path
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    if path.suffix.lower() != ".md":
+        path.write_text(result.model_dump_json(indent=2))
+        return
+
+    severities = sorted(result.counts, key=severity_order)
+    lines = [
+        "# Dependency-Check rollup",
+        "",
+        f"Generated {result.generated_at} from {result.inputs} input(s), "
+        f"{result.projects} project(s), {result.failed} failed.",
+        "",
+        "| Severity | Findings |",
+        "| --- | ---: |",
+        *(f"| {s} | {result.counts[s]} |" for s in severities),
+        "",
+        f"Unique vulnerabilities: {result.unique_vulnerabilities}",
+        "",
+        "## Most widespread vulnerable dependencies",
+        "",
+        "| Dependency | Projects | Worst severity |",
+        "| --- | ---: | --- |",
+        *(f"| {d.name} | {d.projects} | {d.severity} |"
+          for d in result.top_dependencies),
+        "",
+        "## Most widespread vulnerabilities",
+        "",
+        "| Vulnerability | Projects |",
+        "| --- | ---: |",
+        *(f"| {v.name} | {v.projects} |" for v in result.top_vulnerabilities),
+        "",
+        "## Projects with the most severe findings",
+        "",
+        "| Project | " + " | ".join(severities) + " |",
+        "| --- |" + " ---: |" * len(severities),
+        *(f"| {name} | " + " | ".join(
+            str(totals.get(s, 0)) for s in severities) + " |"
+          for name, totals in result.top_projects),
+        "",
+    ]
+    path.write_text("\n".join(lines))
+
+
+def rollup_payload(header: dict, result: RollupResult) -> Payload:
+    """
+    Render the rollup onto a notifier header embed
+
+    :param header: header embed as produced by ``Embed.to_dict``
+    :type header: dict
+    :param result: aggregated rollup
+    :type result: RollupResult
+    :return: single webhook payload
+    :rtype: Payload
+    """
+    embed = dict(header)
+    embed["fields"] = []
+
+    add_lines_field(embed, "Vulnerabilities Count", [
+        f"{COUNT_LABELS.get(s, s)}: `{c}`" for s, c in result.counts.items()])
+    add_lines_field(embed, "Most widespread vulnerable dependencies", [
+        f"{SEVERITY_LABELS.get(d.severity, d.severity)} **{d.name}** "
+        f"— {d.projects} project(s)"
+        for d in result.top_dependencies])
+    add_lines_field(embed, "Most widespread vulnerabilities", [
+        f"`{v.name}` — {v.projects} project(s)"
+        for v in result.top_vulnerabilities])
+
+    return Payload(embeds=[embed])
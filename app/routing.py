@@ -0,0 +1,52 @@
+"""
+Resolution of the webhook routing table for a single run
+"""
+
+from fnmatch import fnmatchcase
+from typing import List
+
+from settings import Settings, WebhookRoute
+
+
+def default_route(settings: Settings) -> WebhookRoute:
+    """
+    The implicit route used when no routing table is configured
+
+    :param settings: settings derived from env vars
+    :type settings: Settings
+    :return: route to DISCORD_WEBHOOK_URL from MIN_SEVERITY up
+    :rtype: WebhookRoute
+    """
+    return WebhookRoute(
+        webhook_url=settings.discord_webhook_url,
+        min_severity=settings.min_severity,
+        name="default",
+    )
+
+
+def resolve_routes(settings: Settings) -> List[WebhookRoute]:
+    """
+    Select the routes that apply to this run's project and ref
+
+    Globs are matched case-sensitively, ``*`` matches across ``/`` so
+    ``group/*`` covers nested sub-groups too.
+
+    :param settings: settings derived from env vars
+    :type settings: Settings
+    :return: matching routes, in table order
+    :rtype: List[WebhookRoute]
+    """
+    if not settings.routes:
+        if settings.discord_webhook_url:
+            return [default_route(settings)]
+
+        return []
+
+    project = settings.ci_project_path or settings.project_label
+    ref = settings.ci_commit_ref_name
+
+    return [
+        route
+        for route in settings.routes
+        if fnmatchcase(project, route.project) and fnmatchcase(ref, route.ref)
+    ]
@@ -0,0 +1,277 @@
+"""
+Staged CLI: parse, render and send as separate steps
+
+Each stage reads the intermediate of the previous one, so the report is
+parsed once (e.g. in the scan job) and rendered / sent by lightweight
+downstream jobs:
+
+- ``parse``: report -> pack (``ParsedPack`` JSON, the parsed data)
+- ``render``: pack -> rendered payloads per route (``RenderedRun`` JSON)
+- ``send``: rendered payloads -> Discord
+
+Webhook URLs are never written to the intermediates; ``send`` resolves the
+routes by name from its own environment. Findings files attached by
+``render`` are referenced by path and must be available to ``send``.
+``bench`` times every stage on the configured report.
+"""
+
+import os
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List, Optional, TypeVar
+
+from pydantic import BaseModel, ValidationError
+
+from app import gate, memory, package_index, summary
+from app.DCParser import DCParser, PackParser, ParsedPack, write_pack
+from app.notifier_type.DiscordNotifier import DiscordNotifier
+from app.notifier_type.renderers import Payload
+from app.profiler import Profiler
+from app.routing import default_route, resolve_routes
+from settings import Settings, WebhookRoute
+from utils.common import err, log
+
+RENDERED_VERSION = 1
+
+T = TypeVar("T")
+
+
+class RenderedRoute(BaseModel):
+    route: str
+    payloads: List[Payload]
+
+
+class RenderedRun(BaseModel):
+    """
+    Serialised outcome of the render stage
+    """
+    version: int = RENDERED_VERSION
+    project: str = ""
+    ref: str = ""
+    routes: List[RenderedRoute] = []
+
+
+def _stage_routes(settings: Settings) -> List[WebhookRoute]:
+    # Same selection as run, except that without a routing table rendering
+    # needs the severity range only, not a webhook
+    if settings.routes:
+        return resolve_routes(settings)
+
+    return [default_route(settings)]
+
+
+def render_run(settings: Settings, parser: DCParser) -> RenderedRun:
+    """
+    Render the notification of every route of the run
+
+    :param settings: settings derived from env vars
+    :type settings: Settings
+    :param parser: parsed (or restored) report
+    :type parser: DCParser
+    :return: rendered payloads per route, routes with nothing to post are
+    left out
+    :rtype: RenderedRun
+    """
+    run = RenderedRun(
+        project=settings.ci_project_path or settings.project_label,
+        ref=settings.ci_commit_ref_name,
+    )
+
+    for route in _stage_routes(settings):
+        payloads = DiscordNotifier(settings, parser, route).prepare()
+
+        if payloads:
+            run.routes.append(
+                RenderedRoute(route=route.name, payloads=payloads))
+
+    return run
+
+
+def _write_json(path: Path, model: BaseModel) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_text(model.model_dump_json(exclude_none=True))
+    os.replace(tmp, path)
+
+
+def run_parse(settings: Settings, out: Path) -> int:
+    """
+    Parse stage: parse the report once and write the pack
+
+    Also writes the summary sidecar and applies DC_FAIL_ON_VULN, as both
+    only depend on the parsed data.
+
+    :param settings: settings derived from env vars
+    :type settings: Settings
+    :param out: pack file
+    :type out: Path
+    :return: software exit code
+    :rtype: int
+    """
+    profiler = Profiler(settings)
+
+    if not settings.report_json.exists():
+        err("Can't resolve the json report in the path location: ",
+            str(settings.report_json))
+        # Later stages still report the missing report
+        write_pack(out, ParsedPack(report_present=False))
+        return gate.gate_exit_code(settings, None)
+
+    with profiler.phase("parse"):
+        parser = DCParser(settings)
+
+    with profiler.phase("summary"):
+        summary.write_summary(settings, parser)
+
+    with profiler.phase("index"):
+        package_index.write_index(settings, parser)
+
+    parser.dump_pack(out)
+    log(f"Parsed pack written to {out}.")
+    memory.log_peak_rss(settings)
+
+    return gate.gate_exit_code(settings, parser)
+
+
+def run_render(settings: Settings, pack: Path, out: Path) -> int:
+    """
+    Render stage: turn a pack into the payloads of every route
+
+    :param settings: settings derived from env vars
+    :type settings: Settings
+    :param pack: pack written by the parse stage
+    :type pack: Path
+    :param out: rendered payloads file
+    :type out: Path
+    :return: software exit code
+    :rtype: int
+    """
+    try:
+        parser = PackParser(settings, pack)
+    except (OSError, ValueError) as e:
+        err("Could not load the parsed pack: ", e)
+        return 1
+
+    run = render_run(settings, parser)
+    _write_json(out, run)
+    log(f"Rendered {sum(len(r.payloads) for r in run.routes)} message(s) "
+        f"for {len(run.routes)} route(s) to {out}.")
+
+    return 0
+
+
+def run_send(settings: Settings, rendered: Path) -> int:
+    """
+    Send stage: deliver rendered payloads to the routes' webhooks
+
+    :param settings: settings derived from env vars
+    :type settings: Settings
+    :param rendered: payloads file written by the render stage
+    :type rendered: Path
+    :return: highest exit code of the deliveries
+    :rtype: int
+    """
+    try:
+        run = RenderedRun.model_validate_json(rendered.read_bytes())
+    except (OSError, ValidationError) as e:
+        err("Could not load the rendered payloads: ", e)
+        return 1
+
+    if run.version > RENDERED_VERSION:
+        err(f"Rendered payloads have version {run.version}, this notifier "
+            f"supports up to {RENDERED_VERSION}.")
+        return 1
+
+    routes = {route.name: route for route in _stage_routes(settings)}
+    code = 0
+
+    for batch in run.routes:
+        route = routes.get(batch.route)
+
+        if not route or not route.webhook_url:
+            err(f"No webhook configured for route '{batch.route}'.")
+            code = 1
+            continue
+
+        code = max(
+            code, DiscordNotifier(settings, None, route).send(batch.payloads))
+
+    return code
+
+
+def _timed(timings: dict[str, List[float]], stage: str,
+           call: Callable[[], T]) -> T:
+    start = time.perf_counter()
+    result = call()
+    timings.setdefault(stage, []).append(time.perf_counter() - start)
+
+    return result
+
+
+def run_bench(settings: Settings, repeat: int, send: bool) -> int:
+    """
+    Time every stage on the configured report
+
+    :param settings: settings derived from env vars
+    :type settings: Settings
+    :param repeat: iterations per stage
+    :type repeat: int
+    :param send: also time the send stage (point DISCORD_API_BASE at the
+    mock to keep Discord out of it)
+    :type send: bool
+    :return: software exit code
+    :rtype: int
+    """
+    if not settings.report_json.exists():
+        err("Can't resolve the json report in the path location: ",
+            str(settings.report_json))
+        return 1
+
+    timings: dict[str, List[float]] = {}
+    sizes: dict[str, int] = {}
+    routes = {route.name: route for route in _stage_routes(settings)}
+    rendered: Optional[RenderedRun] = None
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pack = Path(tmp) / "pack.json"
+        payloads = Path(tmp) / "payloads.json"
+
+        for _ in range(max(1, repeat)):
+            parser = _timed(timings, "parse", lambda: DCParser(settings))
+            _timed(timings, "pack write", lambda: parser.dump_pack(pack))
+            restored = _timed(
+                timings, "pack read", lambda: PackParser(settings, pack))
+            rendered = _timed(
+                timings, "render", lambda: render_run(settings, restored))
+            _timed(timings, "payloads write",
+                   lambda: _write_json(payloads, rendered))
+
+            if send:
+                for batch in rendered.routes:
+                    _timed(timings, "send", lambda: DiscordNotifier(
+                        settings, None, routes[batch.route]).send(
+                            batch.payloads))
+
+        sizes["report"] = settings.report_json.stat().st_size
+        sizes["pack"] = pack.stat().st_size
+        sizes["payloads"] = payloads.stat().st_size
+
+    print(f"{'stage':<16}{'min ms':>10}{'median ms':>12}{'max ms':>10}")
+
+    for stage, values in timings.items():
+        print(f"{stage:<16}{min(values) * 1000:>10.1f}"
+              f"{statistics.median(values) * 1000:>12.1f}"
+              f"{max(values) * 1000:>10.1f}")
+
+    print()
+
+    for name, size in sizes.items():
+        print(f"{name + ' bytes':<16}{size:>10}")
+
+    if rendered:
+        print(f"{'messages':<16}"
+              f"{sum(len(r.payloads) for r in rendered.routes):>10}")
+
+    return 0
@@ -0,0 +1,236 @@
+"""
+Compact, versioned summary of a run for downstream jobs
+
+The summary holds what other jobs (gates, dashboards, release notes, later
+notifier runs) usually need from a Dependency-Check report: per-severity
+counts and CVSS score statistics, the top findings, a fingerprint per
+finding, the unique vulnerability ids and the affected dependencies with
+the version fixing them. It is written as compact JSON, or MessagePack
+when the optional ``msgpack`` package is installed, and loads in
+milliseconds instead of re-parsing the full report.
+"""
+
+from __future__ import annotations
+import datetime
+import hashlib
+import os
+from pathlib import Path
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+from app.cvss_stats import ScoreStats
+from app.DCParser import DCParser, Vulnerability, severity_order
+from app.versions import fix_order
+from settings import Settings, SummaryFormat
+from utils.common import err, log
+
+SUMMARY_VERSION = 1
+
+
+class SummaryFinding(BaseModel):
+    dependency: str
+    version: str
+    ids: List[str]
+    severity: str
+    score: Optional[float] = None
+    url: str = ""
+    fixed_in: Optional[str] = None
+
+
+class RunSummary(BaseModel):
+    version: int = SUMMARY_VERSION
+    generated_at: str
+    project: str
+    ref: str
+    pipeline_id: str = ""
+    pipeline_url: Optional[str] = None
+    report_name: str = ""
+    report_date: str = ""
+    engine_version: str = ""
+    total: int = 0
+    counts: dict[str, int] = {}
+    top: List[SummaryFinding] = []
+    fingerprints: List[str] = []
+    cves: List[str] = []
+    dependencies: dict[str, str] = {}
+    # Dependency to the lowest version fixing all of its findings
+    fixed_in: dict[str, str] = {}
+    score_stats: dict[str, dict[str, ScoreStats]] = {}
+
+
+def to_finding(vuln: Vulnerability) -> SummaryFinding:
+    return SummaryFinding(
+        dependency=vuln.dependency,
+        version=vuln.version,
+        ids=vuln.ids,
+        severity=vuln.severity,
+        score=vuln.score,
+        url=vuln.url,
+        fixed_in=vuln.fixed_in,
+    )
+
+
+def fingerprint(vuln: Vulnerability) -> str:
+    """
+    Stable identifier of a finding across runs
+
+    :param vuln: parsed finding
+    :type vuln: Vulnerability
+    :return: 16 hex chars derived from dependency, version and ids
+    :rtype: str
+    """
+    key = f"{vuln.dependency}|{vuln.version}|{','.join(sorted(vuln.ids))}"
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+
+def build_summary(settings: Settings, parser: DCParser) -> RunSummary:
+    """
+    Summarise a parsed report
+
+    :param settings: settings derived from env vars
+    :type settings: Settings
+    :param parser: parsed report
+    :type parser: DCParser
+    :return: run summary
+    :rtype: RunSummary
+    """
+    data = parser.get_data()
+    summary = RunSummary(
+        generated_at=datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        project=settings.ci_project_path or settings.project_label,
+        ref=settings.ci_commit_ref_name,
+        pipeline_id=settings.ci_pipeline_id,
+        pipeline_url=settings.pipeline_url,
+    )
+
+    if not data:
+        return summary
+
+    cves: set[str] = set()
+    dependencies: dict[str, str] = {}
+    fixed_in: dict[str, str] = {}
+    fingerprints: set[str] = set()
+
+    findings = parser.findings()
+
+    for vuln in findings:
+        cves.update(vuln.ids)
+        fingerprints.add(fingerprint(vuln))
+        worst = dependencies.get(vuln.dependency)
+
+        if (
+            worst is None or
+            severity_order(vuln.severity) < severity_order(worst)
+        ):
+            dependencies[vuln.dependency] = vuln.severity
+
+        fix = fixed_in.get(vuln.dependency)
+
+        # Several versions of a dependency need the highest of their fixes
+        if vuln.fixed_in and (
+            fix is None or fix_order(vuln.fixed_in) > fix_order(fix)
+        ):
+            fixed_in[vuln.dependency] = vuln.fixed_in
+
+    top = parser.filter_by_min_severity(settings.min_severity) or []
+
+    summary.report_name = data.report_name
+    summary.report_date = data.report_date
+    summary.engine_version = data.engine_version
+    summary.total = len(findings)
+    summary.counts = dict(data.counts)
+    summary.top = [to_finding(v) for v in top[:settings.summary_top]]
+    summary.fingerprints = sorted(fingerprints)
+    summary.cves = sorted(cves)
+    summary.dependencies = dependencies
+    summary.fixed_in = fixed_in
+    summary.score_stats = data.score_stats
+
+    return summary
+
+
+def _msgpack():
+    try:
+        import msgpack
+    except ImportError:
+        raise RuntimeError(
+            "DC_SUMMARY_FORMAT=msgpack requires the msgpack package")
+
+    return msgpack
+
+
+def dump_summary(
+        summary: RunSummary,
+        path: Path,
+        fmt: SummaryFormat = SummaryFormat.JSON) -> None:
+    """
+    Write a summary atomically
+
+    :param summary: run summary
+    :type summary: RunSummary
+    :param path: output file
+    :type path: Path
+    :param fmt: encoding
+    :type fmt: SummaryFormat
+    """
+    if fmt == SummaryFormat.MSGPACK:
+        data = _msgpack().packb(
+            summary.model_dump(exclude_none=True), use_bin_type=True)
+    else:
+        data = summary.model_dump_json(exclude_none=True).encode()
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def load_summary(path: Path) -> RunSummary:
+    """
+    Load a summary written by ``dump_summary``, in either encoding
+
+    :param path: summary file
+    :type path: Path
+    :return: run summary
+    :rtype: RunSummary
+    :raises ValueError: If the file is not a summary of a supported version.
+    """
+    data = path.read_bytes()
+
+    if data[:1] == b"{":
+        summary = RunSummary.model_validate_json(data)
+    else:
+        summary = RunSummary.model_validate(
+            _msgpack().unpackb(data, raw=False))
+
+    if summary.version > SUMMARY_VERSION:
+        raise ValueError(
+            f"Summary {path} has version {summary.version}, this notifier "
+            f"supports up to {SUMMARY_VERSION}")
+
+    return summary
+
+
+def write_summary(settings: Settings, parser: Optional[DCParser]) -> None:
+    """
+    Emit the summary sidecar if DC_SUMMARY_PATH is configured
+
+    :param settings: settings derived from env vars
+    :type settings: Settings
+    :param parser: parsed report, None if the report was missing
+    :type parser: Optional[DCParser]
+    """
+    if not settings.summary_path or not parser or parser.failed:
+        return
+
+    try:
+        dump_summary(
+            build_summary(settings, parser),
+            settings.summary_path,
+            settings.summary_format)
+    except (OSError, RuntimeError) as e:
+        err("Could not write the summary: ", e)
+        return
+
+    log(f"Summary written to {settings.summary_path}.")
@@ -0,0 +1,173 @@
+"""
+"Fixed in" versions from the vulnerable software ranges of a report
+
+Each finding lists the CPE ranges it affects (``versionStartIncluding``,
+``versionEndExcluding`` / ``versionEndIncluding``). The ranges that apply
+to a dependency are the ones Dependency-Check matched, narrowed to those
+containing the installed version when it is known; the dependency is fixed
+from the highest end bound of all its findings. Version strings repeat
+across ranges and findings, so each one is parsed once into a comparable
+key.
+"""
+
+from __future__ import annotations
+import re
+from functools import lru_cache
+from typing import List, Optional
+
+from app.models.report_models import Software, VulnerableSoftwareItem
+
+# Qualifiers sorting before the release they qualify, lowest first
+PRE_RELEASE = {
+    q: rank for rank, names in enumerate((
+        ("dev", "snapshot"),
+        ("alpha", "a"),
+        ("beta", "b"),
+        ("milestone", "m"),
+        ("rc", "cr", "pre", "preview"),
+    )) for q in names
+}
+# Qualifiers naming the release itself
+RELEASE = {"final", "ga", "release", "r"}
+# Distinct versions kept parsed
+VERSION_CACHE_SIZE = 16384
+
+_TOKEN = re.compile(r"\d+|[a-z]+")
+# Element of a version key: (kind, number, text)
+_END = (1, 0, "")
+
+Key = tuple[tuple[int, int, str], ...]
+
+
+@lru_cache(maxsize=VERSION_CACHE_SIZE)
+def version_key(version: str) -> Key:
+    """
+    Comparable key of a version string
+
+    Numbers compare numerically and trailing zeros of the release are
+    ignored (``1.2`` == ``1.2.0``), pre-release qualifiers sort before the
+    release (``1.2-rc1`` < ``1.2``) and other qualifiers after it.
+
+    :param version: version string as found in the report
+    :type version: str
+    :return: key ordering versions, cached per string
+    :rtype: Key
+    """
+    tokens = [t for t in _TOKEN.findall(version.lower()) if t not in RELEASE]
+    release = 0
+
+    while release < len(tokens) and tokens[release].isdigit():
+        release += 1
+
+    numbers = [int(t) for t in tokens[:release]]
+
+    while numbers and not numbers[-1]:
+        numbers.pop()
+
+    key = [(2, n, "") for n in numbers]
+
+    for token in tokens[release:]:
+        if token.isdigit():
+            key.append((2, int(token), ""))
+        elif token in PRE_RELEASE:
+            key.append((0, PRE_RELEASE[token], token))
+        else:
+            key.append((1, 1, token))
+
+    key.append(_END)
+
+    return tuple(key)
+
+
+def fix_order(fixed_in: str) -> tuple[Key, bool]:
+    """
+    Sort key of a "fixed in" value, ``>1.2`` sorting right after ``1.2``
+
+    :param fixed_in: value produced by ``FixVersion``
+    :type fixed_in: str
+    :return: version key and whether the bound is exclusive
+    :rtype: tuple[Key, bool]
+    """
+    after = fixed_in.startswith(">")
+
+    return version_key(fixed_in.lstrip(">")), after
+
+
+def _contains(software: Software, version: Key) -> bool:
+    start = software.versionStartIncluding
+
+    if start and version < version_key(start):
+        return False
+
+    if software.versionEndExcluding:
+        return version < version_key(software.versionEndExcluding)
+
+    if software.versionEndIncluding:
+        return version <= version_key(software.versionEndIncluding)
+
+    return True
+
+
+class FixVersion:
+    """
+    Running minimum version fixing every finding of one dependency
+    """
+    _version: Optional[Key]
+    _best: Optional[tuple[Key, bool]]
+    _text: Optional[str]
+
+    def __init__(self, version: str):
+        """
+        Fix of a dependency at the given installed version
+
+        :param self: ref to class self
+        :param version: installed version, ``Unknown`` if not known
+        :type version: str
+        """
+        self._version = (
+            version_key(version) if any(c.isdigit() for c in version)
+            else None)
+        self._best = None
+        self._text = None
+
+    def add(self, software: List[VulnerableSoftwareItem]) -> None:
+        """
+        Account for the vulnerable software ranges of one finding
+
+        :param self: ref to class self
+        :param software: ``vulnerableSoftware`` of the finding
+        :type software: List[VulnerableSoftwareItem]
+        """
+        ranges = [item.software for item in software]
+        matched = [
+            sw for sw in ranges
+            if (sw.vulnerabilityIdMatched or "").lower() == "true"
+        ]
+
+        # A range the installed version is not in cannot tell its fix
+        if self._version is not None:
+            matched = [
+                sw for sw in matched or ranges
+                if _contains(sw, self._version)
+            ] or [sw for sw in ranges if _contains(sw, self._version)]
+
+        for sw in matched:
+            if sw.versionEndExcluding:
+                bound = (version_key(sw.versionEndExcluding), False)
+                text = sw.versionEndExcluding
+            elif sw.versionEndIncluding:
+                bound = (version_key(sw.versionEndIncluding), True)
+                text = f">{sw.versionEndIncluding}"
+            else:
+                continue
+
+            if self._best is None or bound > self._best:
+                self._best, self._text = bound, text
+
+    @property
+    def value(self) -> Optional[str]:
+        """
+        Lowest version fixing every finding added so far, ``>x`` when only
+        the last vulnerable version is known, None when no range bounds it
+        """
+        return self._text
@@ -1,6 +1,6 @@
+import argparse
 import sys
 from pathlib import Path
-from app import app
 
 
 def _maybe_load_dotenv() -> None:
@@ -14,15 +14,175 @@ def _maybe_load_dotenv() -> None:
         load_dotenv(override=False)
 
 
+def _build_arg_parser() -> argparse.ArgumentParser:
+    """command line interface, configuration itself comes from env vars"""
+    parser = argparse.ArgumentParser(
+        description="OWASP Dependency-Check Discord notifier")
+    commands = parser.add_subparsers(dest="command")
+
+    commands.add_parser(
+        "run", help="parse the report and notify (default)")
+    commands.add_parser(
+        "replay", help="deliver the messages queued in DC_OUTBOX_DIR")
+
+    digest = commands.add_parser(
+        "digest", help="post the digests of ended windows")
+    digest.add_argument(
+        "--serve", action="store_true",
+        help="keep running and flush at every window boundary")
+    digest.add_argument(
+        "--force", action="store_true",
+        help="also flush windows that are still open")
+
+    commands.add_parser(
+        "submit", help="queue the report in DC_SPOOL_DIR for the workers")
+
+    worker = commands.add_parser(
+        "worker", help="notify the reports queued in DC_SPOOL_DIR")
+    worker.add_argument(
+        "--processes", type=int, default=1,
+        help="worker processes on this host (default: 1)")
+    worker.add_argument(
+        "--once", action="store_true",
+        help="exit once no job is pending instead of waiting for more")
+
+    rollup = commands.add_parser(
+        "rollup", help="aggregate many run summaries or reports")
+    rollup.add_argument(
+        "inputs", nargs="+", type=Path,
+        help="summary / report files or directories holding them")
+    rollup.add_argument(
+        "--out", type=Path, default=None,
+        help="write the rollup to a file (.md for Markdown, else JSON)")
+    rollup.add_argument(
+        "--notify", action="store_true",
+        help="post the rollup to DISCORD_WEBHOOK_URL")
+    rollup.add_argument(
+        "--workers", type=int, default=0,
+        help="worker processes (default: one per CPU)")
+    rollup.add_argument(
+        "--top", type=int, default=15,
+        help="length of the ranked lists")
+
+    parse = commands.add_parser(
+        "parse", help="parse the report once and write the parsed pack")
+    parse.add_argument(
+        "--out", type=Path, default=Path("dc-pack.json"),
+        help="pack file (default: dc-pack.json)")
+
+    render = commands.add_parser(
+        "render", help="render the notification of a parsed pack")
+    render.add_argument(
+        "--pack", type=Path, default=Path("dc-pack.json"),
+        help="pack written by the parse stage (default: dc-pack.json)")
+    render.add_argument(
+        "--out", type=Path, default=Path("dc-payloads.json"),
+        help="rendered payloads file (default: dc-payloads.json)")
+
+    send = commands.add_parser(
+        "send", help="deliver rendered payloads")
+    send.add_argument(
+        "--payloads", type=Path, default=Path("dc-payloads.json"),
+        help="payloads written by the render stage "
+             "(default: dc-payloads.json)")
+
+    query = commands.add_parser(
+        "query", help="find the projects / refs shipping a package or id")
+    query.add_argument(
+        "kind", choices=["package", "file", "cve"],
+        help="package id (purl), dependency file name or vulnerability id")
+    query.add_argument(
+        "pattern",
+        help="exact value or glob, e.g. 'pkg:npm/lodash@*'")
+    query.add_argument(
+        "--json", action="store_true",
+        help="print one JSON object per run")
+    query.add_argument(
+        "--limit", type=int, default=1000,
+        help="maximum number of runs listed")
+
+    bench = commands.add_parser(
+        "bench", help="time every stage on the configured report")
+    bench.add_argument(
+        "--repeat", type=int, default=5,
+        help="iterations per stage")
+    bench.add_argument(
+        "--send", action="store_true",
+        help="also time sending (point DISCORD_API_BASE at the mock)")
+
+    return parser
+
+
+def _dispatch(args: argparse.Namespace, settings) -> int:
+    """
+    run the selected command
+
+    :param args: parsed command line
+    :type args: argparse.Namespace
+    :param settings: settings derived from env vars
+    :type settings: Settings
+    :return: software exit code
+    :rtype: int
+    """
+    if args.command in (None, "run"):
+        from app import gate
+        from app.routing import resolve_routes
+
+        # Gate-only runs skip importing the parser models and disnake
+        if gate.is_gate_only(settings, bool(resolve_routes(settings))):
+            return gate.run_gate(settings)
+
+    from app import app, stages
+
+    if args.command == "replay":
+        return app.run_replay(settings)
+
+    if args.command == "digest":
+        return app.run_digest(settings, args.serve, args.force)
+
+    if args.command == "submit":
+        return app.run_submit(settings)
+
+    if args.command == "worker":
+        return app.run_worker(settings, args.processes, args.once)
+
+    if args.command == "rollup":
+        return app.run_rollup(
+            settings, args.inputs, args.out, args.notify, args.workers,
+            args.top)
+
+    if args.command == "query":
+        return app.run_query(
+            settings, args.kind, args.pattern, args.json, args.limit)
+
+    if args.command == "parse":
+        return stages.run_parse(settings, args.out)
+
+    if args.command == "render":
+        return stages.run_render(settings, args.pack, args.out)
+
+    if args.command == "send":
+        return stages.run_send(settings, args.payloads)
+
+    if args.command == "bench":
+        return stages.run_bench(settings, args.repeat, args.send)
+
+    return app.run_notifier(settings)
+
+
 def main():
     """ENTRYPOINT"""
+    args = _build_arg_parser().parse_args()
     _maybe_load_dotenv()
 
     from settings import Settings
 
     settings = Settings.load_env()
 
-    sys.exit(app.run_notifier(settings))
+    with settings.activate():
+        code = _dispatch(args, settings)
+
+    sys.exit(code)
 
 
 if __name__ == "__main__":
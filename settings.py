@@ -1,9 +1,12 @@
 from __future__ import annotations
+import json
 import os
+from contextlib import contextmanager
+from contextvars import ContextVar
 from dataclasses import dataclass
 from enum import Enum
 from pathlib import Path
-from typing import Any, List
+from typing import Iterator, List, Mapping
 
 
 def _parse_bool(val: str | None, default: bool = False) -> bool:
@@ -110,18 +113,199 @@ class NotifyMode(str, Enum):
             )
 
 
+class SummaryFormat(str, Enum):
+    JSON = "json"
+    MSGPACK = "msgpack"
+
+    @classmethod
+    def load_env(cls, value: str | None, default: SummaryFormat | None = None
+                 ) -> SummaryFormat:
+        if not value:
+            return default or cls.JSON
+
+        v = value.strip().lower()
+
+        try:
+            return cls(v)  # Lookup by value, not by name
+
+        except ValueError:
+            allowed = ", ".join(m.value for m in cls)
+
+            raise ValueError(
+                f"Invalid DC_SUMMARY_FORMAT {value!r}. "
+                f"Must be one of: {allowed}"
+            )
+
+
+class FindingsFormat(str, Enum):
+    CSV = "csv"
+    MARKDOWN = "md"
+
+    @classmethod
+    def load_env(cls, value: str | None) -> List[FindingsFormat]:
+        """
+        Parse a comma separated list of findings file formats
+
+        :param value: Raw value (DC_FINDINGS_FILE), empty disables the file
+        :type value: str | None
+        :return: formats in the given order, without duplicates
+        :rtype: List[FindingsFormat]
+        :raises ValueError: If a format is unknown.
+        """
+        formats: List[FindingsFormat] = []
+
+        for raw in (value or "").split(","):
+            v = raw.strip().lower()
+
+            if not v:
+                continue
+
+            try:
+                fmt = cls(v)  # Lookup by value, not by name
+
+            except ValueError:
+                allowed = ", ".join(m.value for m in cls)
+
+                raise ValueError(
+                    f"Invalid DC_FINDINGS_FILE {raw!r}. "
+                    f"Must be one of: {allowed}"
+                )
+
+            if fmt not in formats:
+                formats.append(fmt)
+
+        return formats
+
+
 @dataclass(frozen=True)
-class Settings:
+class WebhookRoute:
+    """
+    One entry of the webhook routing table
 
-    # instance tracker
-    _instance = None
+    A route matches a run when the project path and ref match its globs, and
+    receives the findings whose severity lies within
+    [min_severity, max_severity].
+    """
+    webhook_url: str
+    min_severity: Severity
+    max_severity: Severity | None = None
+    project: str = "*"
+    ref: str = "*"
+    name: str = ""
+
+    @classmethod
+    def load_env(
+            cls,
+            value: str | None,
+            file: str | None = None) -> List[WebhookRoute]:
+        """
+        Parse the routing table from inline JSON or a JSON file.
+
+        The table is a list of objects with the keys ``webhook`` (required),
+        ``min_severity``, ``max_severity``, ``project``, ``ref`` and
+        ``name``.
+
+        :param value: Inline JSON (DC_ROUTES)
+        :type value: str | None
+        :param file: Path to a JSON file (DC_ROUTES_FILE), used if value is
+        empty
+        :type file: str | None
+        :return: Parsed routes, empty if no table is configured
+        :rtype: List[WebhookRoute]
+        :raises ValueError: If the table is malformed.
+        """
+        raw = (value or "").strip()
+
+        if not raw and file and file.strip():
+            raw = Path(file.strip()).read_text()
+
+        if not raw:
+            return []
+
+        try:
+            entries = json.loads(raw)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid DC_ROUTES JSON: {e}")
+
+        if not isinstance(entries, list):
+            raise ValueError("DC_ROUTES must be a JSON list of routes")
+
+        routes: List[WebhookRoute] = []
+
+        for i, entry in enumerate(entries):
+            if not isinstance(entry, dict) or not entry.get("webhook"):
+                raise ValueError(
+                    f"DC_ROUTES[{i}] must be an object with a 'webhook' URL")
+
+            max_severity = entry.get("max_severity")
+
+            routes.append(cls(
+                webhook_url=str(entry["webhook"]).strip(),
+                min_severity=Severity.load_env(
+                    entry.get("min_severity"), Severity.LOW),
+                max_severity=(
+                    Severity.load_env(max_severity)
+                    if max_severity else None),
+                project=str(entry.get("project") or "*"),
+                ref=str(entry.get("ref") or "*"),
+                name=str(entry.get("name") or f"route-{i}"),
+            ))
+
+        return routes
+
+
+# Settings of the notification running in the current thread / task
+_ACTIVE: ContextVar[Settings | None] = ContextVar("settings", default=None)
+
+
+@dataclass(frozen=True)
+class Settings:
     dc_icon: str
 
     # Development behaviour
     debugging: bool
+    profiling: bool
+    profile_dir: Path
 
     # Webhook
     discord_webhook_url: str
+    discord_api_base: str
+    routes: List[WebhookRoute]
+
+    # Delivery
+    send_retries: int
+    retry_backoff_ms: int
+    outbox_dir: Path | None
+    replay_interval_ms: int
+    dedupe_path: Path | None
+    dedupe_ttl_minutes: int
+    dedupe_size: int
+
+    # Digest
+    digest_window_minutes: int
+    digest_dir: Path
+
+    # Summary sidecar
+    summary_path: Path | None
+    summary_format: SummaryFormat
+    summary_top: int
+
+    # Findings file
+    findings_formats: List[FindingsFormat]
+    findings_dir: Path | None
+    upload_limit_mb: int
+
+    # Package index
+    index_path: Path | None
+
+    # Worker spool
+    spool_dir: Path | None
+    lease_seconds: int
+    worker_poll_ms: int
+
+    # Memory budget
+    memory_budget_mb: int
+    spill_dir: Path | None
 
     # Report discovery
     report_dir: Path | None
@@ -162,71 +346,126 @@ class Settings:
     severity_order: List[str]
     severity_rank: dict[str, int]
 
-    # i am singleton
-    def __new__(cls, *args: Any, **kwargs: Any):
-        if not hasattr(cls, 'instance'):
-            cls._instance = super(Settings, cls).__new__(cls)
-            cls._instance.__init__(*args, **kwargs)
-
-        return cls._instance
-
     @staticmethod
-    def load_env() -> Settings:
+    def load_env(env: Mapping[str, str] | None = None) -> Settings:
         """
         populate class variables with env var values
 
+        :param env: variables to read instead of the process environment,
+        e.g. those a spooled job was submitted with
+        :type env: Mapping[str, str] | None
         :return: Settings class with values
         :rtype: Settings
         """
+        getenv = (os.environ if env is None else env).get
+
         # Development
-        debugging = _parse_bool(os.getenv("DEBUGGING"), default=False)
+        debugging = _parse_bool(getenv("DEBUGGING"), default=False)
+        profiling = _parse_bool(getenv("PROFILING"), default=False)
+        profile_dir = Path(getenv("PROFILE_DIR", "").strip() or "profiles")
 
         # Read raw envs once
-        discord_webhook_url = os.getenv("DISCORD_WEBHOOK_URL", "").strip()
-        dc_icon = os.getenv(
+        discord_webhook_url = getenv("DISCORD_WEBHOOK_URL", "").strip()
+        discord_api_base = getenv(
+            "DISCORD_API_BASE", "").strip().rstrip("/")
+        routes = WebhookRoute.load_env(
+            getenv("DC_ROUTES"), getenv("DC_ROUTES_FILE"))
+
+        # Delivery
+        send_retries = _parse_int(getenv("DC_SEND_RETRIES"), default=3)
+        retry_backoff_ms = _parse_int(
+            getenv("DC_RETRY_BACKOFF_MS"), default=1000)
+        outbox_dir_raw = getenv("DC_OUTBOX_DIR", "").strip()
+        outbox_dir = Path(outbox_dir_raw) if outbox_dir_raw else None
+        replay_interval_ms = _parse_int(
+            getenv("DC_REPLAY_INTERVAL_MS"), default=400)
+        dedupe_path_raw = getenv("DC_DEDUPE_PATH", "").strip()
+        dedupe_path = Path(dedupe_path_raw) if dedupe_path_raw else None
+        dedupe_ttl_minutes = _parse_int(
+            getenv("DC_DEDUPE_TTL_MINUTES"), default=1440)
+        dedupe_size = _parse_int(getenv("DC_DEDUPE_SIZE"), default=256)
+
+        # Digest
+        digest_window_minutes = _parse_int(
+            getenv("DC_DIGEST_WINDOW_MINUTES"), default=0)
+        digest_dir = Path(
+            getenv("DC_DIGEST_DIR", "").strip() or ".dc-digest")
+
+        # Summary sidecar
+        summary_path_raw = getenv("DC_SUMMARY_PATH", "").strip()
+        summary_path = Path(summary_path_raw) if summary_path_raw else None
+        summary_format = SummaryFormat.load_env(
+            getenv("DC_SUMMARY_FORMAT"), SummaryFormat.JSON)
+        summary_top = _parse_int(getenv("DC_SUMMARY_TOP"), default=20)
+
+        # Findings file
+        findings_formats = FindingsFormat.load_env(
+            getenv("DC_FINDINGS_FILE", "csv"))
+        findings_dir_raw = getenv("DC_FINDINGS_DIR", "").strip()
+        findings_dir = Path(findings_dir_raw) if findings_dir_raw else None
+        upload_limit_mb = _parse_int(
+            getenv("DC_UPLOAD_LIMIT_MB"), default=10)
+
+        # Package index
+        index_path_raw = getenv("DC_INDEX_PATH", "").strip()
+        index_path = Path(index_path_raw) if index_path_raw else None
+
+        # Worker spool
+        spool_dir_raw = getenv("DC_SPOOL_DIR", "").strip()
+        spool_dir = Path(spool_dir_raw) if spool_dir_raw else None
+        lease_seconds = _parse_int(getenv("DC_LEASE_SECONDS"), default=300)
+        worker_poll_ms = _parse_int(
+            getenv("DC_WORKER_POLL_MS"), default=1000)
+
+        # Memory budget
+        memory_budget_mb = _parse_int(
+            getenv("DC_MEMORY_BUDGET_MB"), default=0)
+        spill_dir_raw = getenv("DC_SPILL_DIR", "").strip()
+        spill_dir = Path(spill_dir_raw) if spill_dir_raw else None
+        dc_icon = getenv(
             "DC_ICON", "https://gitlab.griffin-studio.dev/external-projects/"
             "garage/owasp-dependency-check-notifier/-/raw/main/static/icons.png"
             "?ref_type=heads")
 
         # Report paths
-        report_dir_raw = os.getenv("REPORT_DIR", "").strip()
+        report_dir_raw = getenv("REPORT_DIR", "").strip()
         report_dir = Path(report_dir_raw) if report_dir_raw else None
 
-        report_json = os.getenv(
+        report_json = getenv(
             "REPORT_JSON_NAME", "dependency-check-report.json").strip()
-        report_html = os.getenv(
+        report_html = getenv(
             "REPORT_HTML_NAME", "dependency-check-report.html").strip()
 
         # Behaviour
         min_severity = Severity.load_env(
-            os.getenv("MIN_SEVERITY") or os.getenv("DC_MIN_SEVERITY"),
+            getenv("MIN_SEVERITY") or getenv("DC_MIN_SEVERITY"),
             Severity.LOW)
         notify_mode = NotifyMode.load_env(
-            os.getenv("DC_NOTIFY_MODE"), NotifyMode.BOTH)
-        attach_html = _parse_bool(os.getenv("ATTACH_HTML") or os.getenv(
+            getenv("DC_NOTIFY_MODE"), NotifyMode.BOTH)
+        attach_html = _parse_bool(getenv("ATTACH_HTML") or getenv(
             "DC_ATTACH_HTML"), default=False)
         notify_on_zero = _parse_bool(
-            os.getenv("DC_NOTIFY_ON_ZERO"), default=False)
-        max_items = _parse_int(os.getenv("DC_MAX_ITEMS"), default=10)
-        project_label = os.getenv("DC_PROJECT_LABEL", "").strip()
+            getenv("DC_NOTIFY_ON_ZERO"), default=False)
+        max_items = _parse_int(getenv("DC_MAX_ITEMS"), default=10)
+        project_label = getenv("DC_PROJECT_LABEL", "").strip()
         fail_on_vuln = _parse_bool(
-            os.getenv("DC_FAIL_ON_VULN"), default=False)
-        quiet = _parse_bool(os.getenv("DC_QUIET"), default=False)
+            getenv("DC_FAIL_ON_VULN"), default=False)
+        quiet = _parse_bool(getenv("DC_QUIET"), default=False)
 
         # GitLab CI envs
-        ci_project_url = os.getenv("CI_PROJECT_URL", "").rstrip("/")
-        ci_project_path = os.getenv("CI_PROJECT_PATH", "").strip()
-        ci_api_v4_url = os.getenv("CI_API_V4_URL", "").rstrip("/")
-        ci_project_id = os.getenv("CI_PROJECT_ID", "").strip()
-        ci_pipeline_url = os.getenv("CI_PIPELINE_URL", "").strip()
-        ci_pipeline_id = os.getenv("CI_PIPELINE_ID", "").strip()
-        ci_commit_ref_name = os.getenv("CI_COMMIT_REF_NAME", "").strip()
-        ci_repository_url = os.getenv("CI_REPOSITORY_URL", "").strip()
-        artifact_job_name = (os.getenv("ARTIFACT_JOB_NAME") or os.getenv(
+        ci_project_url = getenv("CI_PROJECT_URL", "").rstrip("/")
+        ci_project_path = getenv("CI_PROJECT_PATH", "").strip()
+        ci_api_v4_url = getenv("CI_API_V4_URL", "").rstrip("/")
+        ci_project_id = getenv("CI_PROJECT_ID", "").strip()
+        ci_pipeline_url = getenv("CI_PIPELINE_URL", "").strip()
+        ci_pipeline_id = getenv("CI_PIPELINE_ID", "").strip()
+        ci_commit_ref_name = getenv("CI_COMMIT_REF_NAME", "").strip()
+        ci_repository_url = getenv("CI_REPOSITORY_URL", "").strip()
+        artifact_job_name = (getenv("ARTIFACT_JOB_NAME") or getenv(
             "DC_ARTIFACT_JOB_NAME") or "dependency_check").strip()
 
         # Buttons
-        buttons_raw = os.getenv("DC_BUTTONS", "html,zip,pipeline,repo")
+        buttons_raw = getenv("DC_BUTTONS", "html,zip,pipeline,repo")
         buttons = [b.strip().lower()
                    for b in buttons_raw.split(",") if b.strip()]
 
@@ -281,7 +520,32 @@ class Settings:
 
         return Settings(
             debugging=debugging,
+            profiling=profiling,
+            profile_dir=profile_dir,
             discord_webhook_url=discord_webhook_url,
+            discord_api_base=discord_api_base,
+            routes=routes,
+            send_retries=send_retries,
+            retry_backoff_ms=retry_backoff_ms,
+            outbox_dir=outbox_dir,
+            replay_interval_ms=replay_interval_ms,
+            dedupe_path=dedupe_path,
+            dedupe_ttl_minutes=dedupe_ttl_minutes,
+            dedupe_size=dedupe_size,
+            digest_window_minutes=digest_window_minutes,
+            digest_dir=digest_dir,
+            summary_path=summary_path,
+            summary_format=summary_format,
+            summary_top=summary_top,
+            findings_formats=findings_formats,
+            findings_dir=findings_dir,
+            upload_limit_mb=upload_limit_mb,
+            index_path=index_path,
+            spool_dir=spool_dir,
+            lease_seconds=lease_seconds,
+            worker_poll_ms=worker_poll_ms,
+            memory_budget_mb=memory_budget_mb,
+            spill_dir=spill_dir,
             dc_icon=dc_icon,
             report_dir=report_dir,
             report_json=report_json,
@@ -312,10 +576,36 @@ class Settings:
             repo_url=repo_url,
         )
 
+    @contextmanager
+    def activate(self) -> Iterator[Settings]:
+        """
+        Make these settings the active ones of the current context (thread
+        or asyncio task) for the duration of the block
+
+        :return: these settings
+        :rtype: Iterator[Settings]
+        """
+        token = _ACTIVE.set(self)
+
+        try:
+            yield self
+        finally:
+            _ACTIVE.reset(token)
+
     @classmethod
-    def get_instance(cls) -> 'Settings':
-        if cls._instance is None:
+    def get_instance(cls) -> Settings:
+        """
+        Settings of the notification running in the current context
+
+        :return: active settings
+        :rtype: Settings
+        :raises ValueError: If no settings are active in this context.
+        """
+        settings = _ACTIVE.get()
+
+        if settings is None:
             raise ValueError(
-                "Settings not initialized. Call load_env() first.")
+                "Settings not active. Use Settings.load_env().activate() "
+                "first.")
 
-        return cls._instance
+        return settings
@@ -0,0 +1,97 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app import dedupe
+from app.dedupe import DedupeStore, notification_digest
+from app.notifier_type.renderers import Payload
+
+WEBHOOK = "https://discord.com/api/webhooks/1/a"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = SimpleNamespace(value=1_000_000.0)
+    monkeypatch.setattr(
+        dedupe, "time", SimpleNamespace(time=lambda: now.value))
+
+    return now
+
+
+def _payload(timestamp: str, files=()) -> Payload:
+    return Payload(embeds=[{"title": "Report", "timestamp": timestamp}],
+                   files=[str(path) for path in files])
+
+
+def _digest(*payloads, webhook=WEBHOOK) -> str:
+    return notification_digest(webhook, "group/project", "main",
+                               list(payloads))
+
+
+def test_digest_ignores_the_embed_timestamp():
+    assert (_digest(_payload("2026-10-19T10:00:00")) ==
+            _digest(_payload("2026-10-19T11:00:00")))
+
+
+def test_digest_ignores_attachment_paths_but_not_their_content(tmp_path):
+    first = tmp_path / "run-1" / "findings.csv"
+    second = tmp_path / "run-2" / "findings.csv"
+
+    for path in (first, second):
+        path.parent.mkdir()
+        path.write_text("lodash,4.17.15,CVE-2020-8203\n")
+
+    assert (_digest(_payload("t1", [first])) ==
+            _digest(_payload("t2", [second])))
+
+    second.write_text("lodash,4.17.15,CVE-2021-23337\n")
+
+    assert (_digest(_payload("t1", [first])) !=
+            _digest(_payload("t2", [second])))
+
+
+def test_digest_depends_on_the_webhook_and_content():
+    assert (_digest(_payload("t")) !=
+            _digest(_payload("t"), webhook=WEBHOOK + "b"))
+    assert (_digest(_payload("t")) !=
+            _digest(Payload(embeds=[{"title": "Other"}])))
+
+
+def test_digest_expires_after_the_ttl(tmp_path, clock):
+    store = DedupeStore(tmp_path / "dedupe.json", size=10, ttl=60)
+    store.remember("a")
+
+    clock.value += 59
+    assert store.seen("a")
+
+    clock.value += 1
+    assert not store.seen("a")
+
+
+def test_least_recently_sent_digest_is_evicted(tmp_path, clock):
+    store = DedupeStore(tmp_path / "dedupe.json", size=2, ttl=3600)
+
+    for key in ("a", "b"):
+        store.remember(key)
+        clock.value += 1
+
+    # Sending "a" again makes "b" the least recently sent
+    store.remember("a")
+    clock.value += 1
+    store.remember("c")
+
+    assert store.seen("a")
+    assert not store.seen("b")
+    assert store.seen("c")
+
+
+def test_unreadable_store_is_ignored(tmp_path, clock):
+    path = tmp_path / "dedupe.json"
+    path.write_text("not json")
+    store = DedupeStore(path, size=10, ttl=60)
+
+    assert not store.seen("a")
+
+    store.remember("a")
+
+    assert store.seen("a")
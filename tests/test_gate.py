@@ -0,0 +1,104 @@
+import io
+import json
+
+import pytest
+
+from app import gate
+from settings import Settings
+
+REPORT = json.dumps({
+    "reportSchema": "1.1",
+    "scanInfo": {"engineVersion": "9.0.9", "dataSource": [
+        {"name": "{[\"severity\"]}", "timestamp": "x"}]},
+    "dependencies": [
+        {"fileName": "a \"quoted\" [name] \\", "vulnerabilities": [
+            {"name": "CVE-1", "severity": "LOW",
+             "references": [{"severity": "CRITICAL"}]},
+            {"name": "CVE-2", "severity": "Medium"},
+        ]},
+        {"fileName": "b.jar", "severity": "CRITICAL"},
+        {"fileName": "c.jar", "vulnerabilities": [
+            {"cvssv3": {"baseSeverity": "CRITICAL"}, "severity": "HIGH"},
+        ]},
+    ],
+}, indent=1).encode().replace(b'"Medium"', b'"Me\\u0064ium"')
+
+
+def _scan(data: bytes, chunk_size: int, monkeypatch) -> list:
+    monkeypatch.setattr(gate, "CHUNK_SIZE", chunk_size)
+
+    return list(gate._scan_severities(io.BytesIO(data)))
+
+
+def test_scan_yields_finding_severities_only(monkeypatch):
+    assert _scan(REPORT, 1 << 20, monkeypatch) == [
+        "low", "medium", "high"]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 7, 16, 64])
+def test_scan_is_independent_of_chunk_boundaries(chunk_size, monkeypatch):
+    assert (_scan(REPORT, chunk_size, monkeypatch) ==
+            _scan(REPORT, 1 << 20, monkeypatch))
+
+
+@pytest.mark.parametrize("data", [
+    b"",
+    b"not json",
+    b'"dependencies"',
+    b'{"dependencies": [{"vulnerabilities": [{"severity": "LOW"',
+    b'{"dependencies": [{"vulnerabilities": [{"severity": "LO',
+    b'{"scanInfo": {"dataSource": [',
+])
+def test_scan_rejects_invalid_reports(data, monkeypatch):
+    with pytest.raises(ValueError):
+        _scan(data, 4, monkeypatch)
+
+
+def test_ijson_path_matches_the_tokenizer(monkeypatch):
+    pytest.importorskip("ijson")
+
+    assert list(gate._severities(io.BytesIO(REPORT))) == [
+        "low", "medium", "high"]
+
+    with pytest.raises(ValueError):
+        list(gate._severities(io.BytesIO(b'{"dependencies": [')))
+
+
+def _settings(tmp_path, data: bytes, min_severity: str) -> Settings:
+    report = tmp_path / "report.json"
+
+    if data is not None:
+        report.write_bytes(data)
+
+    return Settings.load_env({
+        "REPORT_JSON_NAME": str(report),
+        "MIN_SEVERITY": min_severity,
+        "DC_FAIL_ON_VULN": "true",
+    })
+
+
+@pytest.mark.parametrize("min_severity,code", [
+    ("LOW", gate.GATE_EXIT_CODE),
+    ("HIGH", gate.GATE_EXIT_CODE),
+    ("CRITICAL", 0),
+])
+def test_gate_threshold(tmp_path, min_severity, code):
+    assert gate.run_gate(_settings(tmp_path, REPORT, min_severity)) == code
+
+
+def test_gate_stops_at_the_first_qualifying_finding(tmp_path):
+    settings = _settings(tmp_path, REPORT, "LOW")
+
+    assert gate.first_finding(settings, settings.report_json) == "low"
+
+
+def test_gate_fails_on_missing_report(tmp_path):
+    settings = _settings(tmp_path, None, "LOW")
+
+    assert gate.run_gate(settings) == gate.GATE_EXIT_CODE
+
+
+def test_gate_fails_on_invalid_report(tmp_path):
+    settings = _settings(tmp_path, b'{"dependencies": [{', "CRITICAL")
+
+    assert gate.run_gate(settings) == gate.GATE_EXIT_CODE
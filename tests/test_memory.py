@@ -0,0 +1,66 @@
+from app import memory
+from app.DCParser import Vulnerability, severity_order
+from app.memory import SpillBuffer, SpilledFindings
+from settings import Settings
+
+SEVERITIES = ("low", "critical", "medium", "high", "info", "moderate")
+
+
+def _findings(count: int) -> list:
+    return [
+        Vulnerability(
+            dependency=f"dep-{i}",
+            version="1.0.0",
+            ids=[f"CVE-2026-{i:05d}"],
+            severity=SEVERITIES[i * 7 % len(SEVERITIES)],
+            url="",
+        )
+        for i in range(count)
+    ]
+
+
+def _buffer(tmp_path, budget_mb: int) -> SpillBuffer:
+    settings = Settings.load_env({
+        "DC_MEMORY_BUDGET_MB": str(budget_mb),
+        "DC_SPILL_DIR": str(tmp_path / "spill"),
+    })
+
+    return SpillBuffer(settings, Vulnerability, severity_order)
+
+
+def _fill(buffer: SpillBuffer, findings: list, per_dependency: int):
+    for start in range(0, len(findings), per_dependency):
+        buffer.extend(findings[start:start + per_dependency])
+
+    return buffer.finish()
+
+
+def test_without_budget_findings_stay_in_memory(tmp_path):
+    findings = _findings(20)
+    result = _fill(_buffer(tmp_path, 0), findings, 3)
+
+    assert isinstance(result, list)
+    assert result == sorted(findings, key=lambda v: severity_order(
+        v.severity))
+
+
+def test_spilled_runs_merge_back_in_memory_order(tmp_path, monkeypatch):
+    monkeypatch.setattr(memory, "MIN_RUN", 1)
+    monkeypatch.setattr(memory, "current_rss", lambda: 1 << 40)
+    findings = _findings(300)
+    expected = sorted(findings, key=lambda v: severity_order(v.severity))
+    result = _fill(_buffer(tmp_path, 1), findings, 3)
+
+    assert isinstance(result, SpilledFindings)
+    # 100 runs were written: they were compacted past MAX_RUNS
+    assert len(result._runs.paths) < memory.MAX_RUNS
+    assert list(result) == expected
+    assert len(result) == len(findings)
+    assert result[:5] == expected[:5]
+    assert result[42] == expected[42]
+    assert result[-1] == expected[-1]
+
+    critical = result.select(["critical"])
+
+    assert list(critical) == [v for v in expected if v.severity == "critical"]
+    assert len(critical) == len(list(critical))
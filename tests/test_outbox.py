@@ -0,0 +1,169 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+from disnake import HTTPException
+
+from app import outbox
+from app.notifier_type.renderers import Payload
+from settings import Settings
+
+URL_A = "https://discord.com/api/webhooks/1/a"
+URL_B = "https://discord.com/api/webhooks/2/b"
+
+
+def _http_error(status: int) -> HTTPException:
+    return HTTPException(SimpleNamespace(status=status, reason="Mock"), "")
+
+
+class FakeWebhook:
+    """
+    Records what is posted, failing the contents listed in ``failures``
+    """
+    posts: list = []
+    failures: dict = {}
+
+    def __init__(self, url: str):
+        self.url = url
+
+    @classmethod
+    def from_url(cls, url: str) -> "FakeWebhook":
+        return cls(url)
+
+    def send(self, content=None, **kwargs) -> None:
+        error = self.failures.get(content)
+
+        if error:
+            raise error
+
+        self.posts.append((self.url, content))
+
+
+@pytest.fixture
+def webhook(monkeypatch):
+    monkeypatch.setattr(FakeWebhook, "posts", [])
+    monkeypatch.setattr(FakeWebhook, "failures", {})
+    monkeypatch.setattr(outbox, "SyncWebhook", FakeWebhook)
+
+    return FakeWebhook
+
+
+def _payloads(*contents):
+    return [Payload(content=content) for content in contents]
+
+
+def _settings(tmp_path) -> Settings:
+    return Settings.load_env({
+        "DC_OUTBOX_DIR": str(tmp_path / "outbox"),
+        "DC_SEND_RETRIES": "0",
+    })
+
+
+def _pending(box):
+    return [(r.webhook, r.payload.content) for r in box.pending()]
+
+
+def _replay(box):
+    return outbox.replay(box, interval=0, retries=0, backoff=0)
+
+
+@pytest.mark.parametrize("error", [
+    _http_error(503),
+    _http_error(429),
+    RuntimeError("Unreachable code in HTTP handling."),
+    OSError("connection reset"),
+])
+def test_transient_failure_queues_the_rest_of_the_batch(
+        tmp_path, webhook, error):
+    settings = _settings(tmp_path)
+    webhook.failures["2"] = error
+
+    assert outbox.deliver_or_queue(
+        settings, FakeWebhook(URL_A), URL_A, _payloads("1", "2", "3"))
+    assert webhook.posts == [(URL_A, "1")]
+    assert _pending(outbox.Outbox(settings.outbox_dir)) == [
+        (URL_A, "2"), (URL_A, "3")]
+
+
+def test_permanent_failure_is_not_queued(tmp_path, webhook):
+    settings = _settings(tmp_path)
+    webhook.failures["1"] = _http_error(400)
+
+    assert not outbox.deliver_or_queue(
+        settings, FakeWebhook(URL_A), URL_A, _payloads("1", "2"))
+    assert _pending(outbox.Outbox(settings.outbox_dir)) == []
+
+
+def test_replay_keeps_the_order_per_webhook(tmp_path, webhook):
+    box = outbox.Outbox(tmp_path / "outbox")
+    box.append(URL_A, _payloads("a1", "a2", "a3"))
+    box.append(URL_B, _payloads("b1", "b2"))
+
+    assert _replay(box) == (5, 0)
+    assert [c for url, c in webhook.posts if url == URL_A] == [
+        "a1", "a2", "a3"]
+    assert [c for url, c in webhook.posts if url == URL_B] == ["b1", "b2"]
+    assert not box.queue_path.exists()
+
+
+def test_replay_drops_a_permanently_rejected_record(tmp_path, webhook):
+    box = outbox.Outbox(tmp_path / "outbox")
+    box.append(URL_A, _payloads("1", "2", "3"))
+    webhook.failures["2"] = _http_error(400)
+
+    assert _replay(box) == (2, 0)
+    assert webhook.posts == [(URL_A, "1"), (URL_A, "3")]
+    assert _pending(box) == []
+
+
+def test_replay_pauses_a_webhook_at_a_transient_failure(tmp_path, webhook):
+    box = outbox.Outbox(tmp_path / "outbox")
+    box.append(URL_A, _payloads("1", "2", "3"))
+    webhook.failures["2"] = _http_error(503)
+
+    assert _replay(box) == (1, 2)
+    assert _pending(box) == [(URL_A, "2"), (URL_A, "3")]
+
+    webhook.failures.clear()
+
+    assert _replay(box) == (2, 0)
+    assert webhook.posts == [(URL_A, "1"), (URL_A, "2"), (URL_A, "3")]
+
+
+def test_second_replay_does_not_repost(tmp_path, webhook):
+    box = outbox.Outbox(tmp_path / "outbox")
+    box.append(URL_A, _payloads("1", "2"))
+
+    assert _replay(box) == (2, 0)
+    assert _replay(outbox.Outbox(tmp_path / "outbox")) == (0, 0)
+    assert webhook.posts == [(URL_A, "1"), (URL_A, "2")]
+
+
+def test_requeued_batch_is_delivered_once(tmp_path, webhook):
+    box = outbox.Outbox(tmp_path / "outbox")
+    box.append(URL_A, _payloads("1", "2"))
+    box.append(URL_A, _payloads("1", "2"))
+
+    assert _replay(box) == (2, 0)
+    assert webhook.posts == [(URL_A, "1"), (URL_A, "2")]
+
+
+def test_overlapping_replays_post_each_record_once(
+        tmp_path, webhook, monkeypatch):
+    box = outbox.Outbox(tmp_path / "outbox")
+    box.append(URL_A, _payloads("1", "2", "3"))
+    send = FakeWebhook.send
+
+    def slow_send(self, content=None, **kwargs):
+        time.sleep(0.05)
+        send(self, content, **kwargs)
+
+    monkeypatch.setattr(FakeWebhook, "send", slow_send)
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        results = list(pool.map(
+            lambda _: _replay(outbox.Outbox(tmp_path / "outbox")), range(2)))
+
+    assert sorted(results) == [(0, 0), (3, 0)]
+    assert webhook.posts == [(URL_A, "1"), (URL_A, "2"), (URL_A, "3")]
@@ -0,0 +1,76 @@
+from app.DCParser import Vulnerability
+from app.notifier_type.renderers import (
+    MAX_EMBED_TOTAL, MAX_FIELD_VALUE, LinkRenderer, PlainRenderer,
+    RenderContext, add_lines_field)
+
+
+def _vuln(**kwargs) -> Vulnerability:
+    values = dict(
+        dependency="lodash",
+        version="4.17.15",
+        ids=["CVE-2020-8203"],
+        severity="high",
+        scorev3=7.4,
+        url="https://nvd.nist.gov/vuln/detail/CVE-2020-8203",
+    )
+    values.update(kwargs)
+
+    return Vulnerability(**values)
+
+
+def _context(vulns) -> RenderContext:
+    return RenderContext(
+        header={"title": "Dependency-Check: group/project"},
+        vulns=vulns,
+        counts={"high": len(vulns)},
+        links={"html": "https://example.com/report.html"},
+        show_counts=True,
+    )
+
+
+def test_link_mode_is_truncated_when_findings_are_left_out():
+    renderer = LinkRenderer()
+    payloads = renderer.render(_context([_vuln()]))
+
+    assert len(payloads) == 1
+    assert payloads[0].embeds[0]["fields"][-1]["name"] == "Links"
+    assert renderer.truncated
+
+
+def test_link_mode_is_not_truncated_without_findings():
+    renderer = LinkRenderer()
+    renderer.render(_context([]))
+
+    assert not renderer.truncated
+
+
+def test_plain_rows_include_fixed_in():
+    payloads = PlainRenderer().render(_context([
+        _vuln(fixed_in="4.17.19"),
+        _vuln(dependency="minimist", version="1.2.0"),
+    ]))
+    rows = payloads[0].content.split("```\n")[1].splitlines()
+
+    assert "→4.17.19" in rows[0]
+    assert "→" not in rows[1]
+
+
+def test_lines_field_keeps_whole_lines_within_the_value_limit():
+    embed = {"title": "Digest", "fields": []}
+
+    assert add_lines_field(embed, "Top findings", ["x" * 100] * 20)
+
+    value = embed["fields"][0]["value"]
+
+    assert len(value) <= MAX_FIELD_VALUE
+    assert value == ("x" * 100 + "\n") * 10
+
+
+def test_lines_field_is_left_out_when_the_embed_is_full():
+    embed = {"title": "Digest", "description": "d" * (MAX_EMBED_TOTAL - 50)}
+
+    assert not add_lines_field(embed, "Projects", ["a" * 60])
+    assert not add_lines_field(embed, "Issues", [])
+    assert add_lines_field(embed, "Issues", ["short"])
+    assert embed["fields"] == [
+        {"name": "Issues", "value": "short\n", "inline": False}]
@@ -0,0 +1,42 @@
+import json
+
+from app.DCParser import ParsedPack
+from app.rollup import run_rollup
+from app.summary import RunSummary
+from settings import Settings
+
+
+def test_rollup_skips_json_that_is_not_a_summary_or_report(tmp_path):
+    summary = RunSummary(
+        generated_at="2026-10-19T10:00:00+00:00",
+        project="group/project",
+        ref="main",
+        total=3,
+        counts={"high": 1, "low": 2},
+    )
+    # Pretty printed, keys reordered: still a summary
+    data = summary.model_dump(mode="json")
+    (tmp_path / "summary.json").write_text(
+        json.dumps(dict(reversed(data.items())), indent=2))
+    (tmp_path / "pack.json").write_text(ParsedPack().model_dump_json())
+    (tmp_path / "payloads.json").write_text(json.dumps(
+        {"version": 1, "project": "", "ref": "", "routes": []}))
+    (tmp_path / "job.json").write_text(json.dumps(
+        {"id": "1", "created": 0.0, "env": {}}))
+    (tmp_path / "list.json").write_text("[]")
+
+    result = run_rollup(Settings.load_env({}), [tmp_path], workers=1)
+
+    assert result.inputs == 1
+    assert result.failed == 0
+    assert result.projects == 1
+    assert result.counts == {"high": 1, "low": 2}
+
+
+def test_rollup_counts_invalid_json_as_failed(tmp_path):
+    (tmp_path / "broken.json").write_text('{"generated_at": ')
+
+    result = run_rollup(Settings.load_env({}), [tmp_path], workers=1)
+
+    assert result.inputs == 1
+    assert result.failed == 1
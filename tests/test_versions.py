@@ -0,0 +1,77 @@
+from app.models.report_models import Software, VulnerableSoftwareItem
+from app.versions import FixVersion, fix_order, version_key
+
+
+def _range(matched: bool = True, **bounds) -> VulnerableSoftwareItem:
+    return VulnerableSoftwareItem(software=Software(
+        id="cpe:2.3:a:vendor:product:*:*:*:*:*:*:*:*",
+        vulnerabilityIdMatched="true" if matched else None,
+        **bounds))
+
+
+def test_versions_order_numerically_with_pre_releases_first():
+    ordered = [
+        "1.0-SNAPSHOT", "1.0-alpha1", "1.0-beta2", "1.0-M3", "1.0-rc1",
+        "1.0-rc2", "1.0", "1.0-sp1", "1.0.1", "1.2", "1.10", "10.0",
+    ]
+
+    assert sorted(ordered, key=version_key) == ordered
+    assert sorted(reversed(ordered), key=version_key) == ordered
+
+
+def test_release_spellings_compare_equal():
+    assert version_key("1.2") == version_key("1.2.0")
+    assert version_key("1.2.0.Final") == version_key("1.2")
+    assert version_key("1.2-GA") == version_key("1.2")
+
+
+def test_fix_is_the_highest_end_bound_of_all_findings():
+    fix = FixVersion("Unknown")
+    fix.add([_range(versionEndExcluding="1.2.5"),
+             _range(versionEndExcluding="1.10.0")])
+    fix.add([_range(versionEndExcluding="1.9.2")])
+
+    assert fix.value == "1.10.0"
+
+
+def test_including_end_bound_wins_over_the_same_excluding_one():
+    fix = FixVersion("Unknown")
+    fix.add([_range(versionEndExcluding="2.0.0"),
+             _range(versionEndIncluding="2.0")])
+
+    assert fix.value == ">2.0"
+
+    fix.add([_range(versionEndExcluding="2.0.1-rc1")])
+
+    assert fix.value == "2.0.1-rc1"
+
+
+def test_ranges_not_containing_the_installed_version_are_ignored():
+    fix = FixVersion("1.5.0")
+    fix.add([
+        _range(versionStartIncluding="1.0", versionEndExcluding="1.2.1"),
+        _range(versionStartIncluding="1.4", versionEndExcluding="1.5.3"),
+        _range(versionStartIncluding="2.0", versionEndExcluding="2.3.0"),
+    ])
+
+    assert fix.value == "1.5.3"
+
+
+def test_unmatched_ranges_are_used_only_without_matched_ones():
+    fix = FixVersion("Unknown")
+    fix.add([_range(versionEndExcluding="1.1"),
+             _range(matched=False, versionEndExcluding="3.0")])
+
+    assert fix.value == "1.1"
+
+
+def test_unbounded_ranges_give_no_fix():
+    fix = FixVersion("1.0")
+    fix.add([_range(versionStartIncluding="0.9")])
+
+    assert fix.value is None
+
+
+def test_exclusive_fix_sorts_right_after_its_version():
+    assert sorted([">1.2", "1.3", "1.2"], key=fix_order) == [
+        "1.2", ">1.2", "1.3"]
@@ -0,0 +1,243 @@
+"""
+Concurrent end-to-end load test of the notifier against the mock Discord API
+
+Runs ``main.py`` N times (as separate processes, exactly as CI would) with
+a bounded concurrency, all pointed at a local ``tools.mock_discord`` server,
+then reports end-to-end latency percentiles and the success rate::
+
+    python -m tools.loadtest --report dependency-check-report.json \\
+        --runs 200 --concurrency 20 --latency-ms 20 120 --rate-429 0.05
+
+A run counts as successful when the process exits with 0 and the mock
+recorded at least one valid message for it.
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+from urllib.request import urlopen
+
+from tools.mock_discord import MockConfig, MockWebhookServer
+
+ROOT = Path(__file__).resolve().parent.parent
+WEBHOOK_ID_BASE = 100000000000000000
+WEBHOOK_TOKEN = "mock" + "x" * 64
+
+
+@dataclass
+class RunResult:
+    index: int
+    seconds: float
+    exit_code: int
+    stderr: str
+
+
+def _percentile(values: List[float], pct: int) -> float:
+    """
+    Inclusive percentile (1..99) of a list of values
+
+    :param values: samples
+    :type values: List[float]
+    :param pct: percentile to compute
+    :type pct: int
+    :return: the percentile value, 0 when there are no samples
+    :rtype: float
+    """
+    if not values:
+        return 0.0
+
+    if len(values) == 1:
+        return values[0]
+
+    return statistics.quantiles(values, n=100, method="inclusive")[pct - 1]
+
+
+def _run_once(
+        index: int,
+        report: Path,
+        api_base: str,
+        shared_webhook: bool,
+        extra_env: dict[str, str]) -> RunResult:
+    webhook_id = WEBHOOK_ID_BASE + (0 if shared_webhook else index)
+    env = {
+        **os.environ,
+        **extra_env,
+        "DISCORD_WEBHOOK_URL": (
+            f"https://discord.com/api/webhooks/{webhook_id}/{WEBHOOK_TOKEN}"),
+        "DISCORD_API_BASE": api_base,
+        "REPORT_DIR": "",
+        "REPORT_JSON_NAME": str(report),
+        "DC_PROJECT_LABEL": f"loadtest-{index}",
+        "CI_PIPELINE_ID": str(index),
+    }
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, str(ROOT / "main.py")],
+        cwd=ROOT, env=env, capture_output=True, text=True)
+
+    return RunResult(
+        index=index,
+        seconds=time.perf_counter() - started,
+        exit_code=proc.returncode,
+        stderr=proc.stderr.strip())
+
+
+def _delivered_labels(api_base: str) -> set[str]:
+    """
+    Project labels that appear in the titles of recorded messages
+    """
+    root = api_base.split("/api/", 1)[0]
+
+    with urlopen(f"{root}/_mock/messages") as resp:
+        messages = json.load(resp)
+
+    labels: set[str] = set()
+
+    for message in messages:
+        texts = [message.get("content") or ""]
+        texts += [e.get("title") or "" for e in message.get("embeds") or []]
+
+        for text in texts:
+            start = text.find("loadtest-")
+
+            while start != -1:
+                end = start + len("loadtest-")
+
+                while end < len(text) and text[end].isdigit():
+                    end += 1
+
+                labels.add(text[start:end])
+                start = text.find("loadtest-", end)
+
+    return labels
+
+
+def run_load_test(
+        report: Path,
+        runs: int,
+        concurrency: int,
+        api_base: str,
+        shared_webhook: bool = False,
+        extra_env: Optional[dict[str, str]] = None) -> dict[str, float]:
+    """
+    Execute the load test and return its summary metrics
+
+    :param report: Dependency-Check JSON report every run notifies about
+    :type report: Path
+    :param runs: total number of notifier invocations
+    :type runs: int
+    :param concurrency: invocations in flight at once
+    :type concurrency: int
+    :param api_base: base URL of the (mock) Discord API
+    :type api_base: str
+    :param shared_webhook: send every run to the same webhook bucket
+    :type shared_webhook: bool
+    :param extra_env: additional env vars passed to every run
+    :type extra_env: Optional[dict[str, str]]
+    :return: metrics keyed by name
+    :rtype: dict[str, float]
+    """
+    started = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(
+            lambda i: _run_once(
+                i, report, api_base, shared_webhook, extra_env or {}),
+            range(runs)))
+
+    wall = time.perf_counter() - started
+    delivered = _delivered_labels(api_base)
+    ok = [r for r in results
+          if r.exit_code == 0 and f"loadtest-{r.index}" in delivered]
+    latencies = sorted(r.seconds for r in results)
+
+    for failed in (r for r in results if r.exit_code != 0):
+        print(f"run {failed.index} exited {failed.exit_code}: "
+              f"{failed.stderr.splitlines()[-1:] or ''}", file=sys.stderr)
+
+    return {
+        "runs": runs,
+        "concurrency": concurrency,
+        "success_rate": len(ok) / runs if runs else 0.0,
+        "p50": _percentile(latencies, 50),
+        "p95": _percentile(latencies, 95),
+        "p99": _percentile(latencies, 99),
+        "max": latencies[-1] if latencies else 0.0,
+        "wall": wall,
+        "throughput": runs / wall if wall else 0.0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Load test the notifier against a mock Discord API")
+    parser.add_argument("--report", type=Path, required=True,
+                        help="Dependency-Check JSON report to notify about")
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--api-base", default="",
+                        help="use an already running mock instead of "
+                        "starting one in-process")
+    parser.add_argument("--shared-webhook", action="store_true",
+                        help="send every run to one webhook (shared "
+                        "rate limit bucket)")
+    parser.add_argument("--latency-ms", type=float, nargs=2, default=(0, 0),
+                        metavar=("MIN", "MAX"))
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--rate-5xx", type=float, default=0.0)
+    parser.add_argument("--json", action="store_true",
+                        help="print the metrics as JSON")
+    args = parser.parse_args()
+
+    server = None
+    api_base = args.api_base
+
+    if not api_base:
+        server = MockWebhookServer(("127.0.0.1", 0), MockConfig(
+            latency_min=args.latency_ms[0] / 1000,
+            latency_max=args.latency_ms[1] / 1000,
+            rate_429=args.rate_429,
+            rate_5xx=args.rate_5xx,
+        ))
+        server.start_background()
+        api_base = server.api_base
+
+    try:
+        metrics = run_load_test(
+            report=args.report.resolve(),
+            runs=args.runs,
+            concurrency=args.concurrency,
+            api_base=api_base,
+            shared_webhook=args.shared_webhook,
+            extra_env={"DC_QUIET": "1"})
+    finally:
+        if server:
+            server.shutdown()
+            server.server_close()
+
+    if args.json:
+        print(json.dumps(metrics))
+        return
+
+    print(f"runs: {metrics['runs']:.0f} "
+          f"(concurrency {metrics['concurrency']:.0f})")
+    print(f"success rate: {metrics['success_rate'] * 100:.1f}%")
+    print(f"latency p50: {metrics['p50'] * 1000:.0f} ms  "
+          f"p95: {metrics['p95'] * 1000:.0f} ms  "
+          f"p99: {metrics['p99'] * 1000:.0f} ms  "
+          f"max: {metrics['max'] * 1000:.0f} ms")
+    print(f"wall: {metrics['wall']:.2f} s  "
+          f"throughput: {metrics['throughput']:.1f} runs/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,421 @@
+"""
+Local stand-in for the Discord webhook API
+
+Accepts ``POST /api/v<N>/webhooks/<id>/<token>`` the way Discord does:
+validates message and embed limits, applies a per-webhook rate limit bucket,
+optionally injects latency, 429 and 5xx responses, and records every payload
+it accepts. Point the notifier at it with::
+
+    python -m tools.mock_discord --port 8099
+    DISCORD_API_BASE=http://127.0.0.1:8099/api/v10 python main.py
+
+``GET /_mock/stats`` and ``GET /_mock/messages`` expose what was received,
+``POST /_mock/reset`` clears it.
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, List, Optional
+
+WEBHOOK_PATH = re.compile(
+    r"^/api(?:/v\d+)?/webhooks/(?P<id>\d+)/(?P<token>[^/?]+)")
+
+# Documented Discord message / embed limits
+MAX_CONTENT = 2000
+MAX_EMBEDS = 10
+MAX_EMBED_TOTAL = 6000
+MAX_TITLE = 256
+MAX_DESCRIPTION = 4096
+MAX_FIELDS = 25
+MAX_FIELD_NAME = 256
+MAX_FIELD_VALUE = 1024
+MAX_FOOTER = 2048
+MAX_AUTHOR = 256
+MAX_UPLOAD = 10 * 1024 * 1024
+
+# Discord's webhook bucket: 5 requests per 2 seconds
+BUCKET_LIMIT = 5
+BUCKET_WINDOW = 2.0
+
+
+@dataclass
+class MockConfig:
+    latency_min: float = 0.0
+    latency_max: float = 0.0
+    rate_429: float = 0.0
+    rate_5xx: float = 0.0
+    enforce_bucket: bool = True
+    record_file: Optional[Path] = None
+
+
+@dataclass
+class MockState:
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    messages: List[dict[str, Any]] = field(default_factory=list)
+    buckets: dict[str, List[float]] = field(default_factory=dict)
+    statuses: dict[int, int] = field(default_factory=dict)
+    next_id: int = 1
+
+    def count(self, status: int) -> None:
+        with self.lock:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+
+
+def validate_message(payload: dict[str, Any], files: int = 0) -> List[str]:
+    """
+    Check a webhook message against Discord's documented limits
+
+    :param payload: decoded JSON payload (``payload_json`` for multipart)
+    :type payload: dict[str, Any]
+    :param files: number of attached files
+    :type files: int
+    :return: list of violations, empty when the message is valid
+    :rtype: List[str]
+    """
+    errors: List[str] = []
+    content = payload.get("content") or ""
+    embeds = payload.get("embeds") or []
+
+    if not content and not embeds and not files:
+        errors.append("Cannot send an empty message")
+
+    if len(content) > MAX_CONTENT:
+        errors.append(f"content: must be {MAX_CONTENT} or fewer in length")
+
+    if len(embeds) > MAX_EMBEDS:
+        errors.append(f"embeds: must be {MAX_EMBEDS} or fewer in length")
+
+    total = 0
+
+    for i, embed in enumerate(embeds):
+        title = embed.get("title") or ""
+        desc = embed.get("description") or ""
+        footer = (embed.get("footer") or {}).get("text") or ""
+        author = (embed.get("author") or {}).get("name") or ""
+        fields = embed.get("fields") or []
+
+        for name, value, limit in (
+            ("title", title, MAX_TITLE),
+            ("description", desc, MAX_DESCRIPTION),
+            ("footer.text", footer, MAX_FOOTER),
+            ("author.name", author, MAX_AUTHOR),
+        ):
+            if len(value) > limit:
+                errors.append(
+                    f"embeds.{i}.{name}: must be {limit} or fewer in length")
+
+        if len(fields) > MAX_FIELDS:
+            errors.append(
+                f"embeds.{i}.fields: must be {MAX_FIELDS} or fewer in length")
+
+        total += len(title) + len(desc) + len(footer) + len(author)
+
+        for j, fld in enumerate(fields):
+            name = fld.get("name") or ""
+            value = fld.get("value") or ""
+
+            if not name or not value:
+                errors.append(
+                    f"embeds.{i}.fields.{j}: name and value are required")
+
+            if len(name) > MAX_FIELD_NAME:
+                errors.append(f"embeds.{i}.fields.{j}.name: must be "
+                              f"{MAX_FIELD_NAME} or fewer in length")
+
+            if len(value) > MAX_FIELD_VALUE:
+                errors.append(f"embeds.{i}.fields.{j}.value: must be "
+                              f"{MAX_FIELD_VALUE} or fewer in length")
+
+            total += len(name) + len(value)
+
+    if total > MAX_EMBED_TOTAL:
+        errors.append(
+            f"embeds: combined size must be {MAX_EMBED_TOTAL} or fewer")
+
+    return errors
+
+
+class MockWebhookHandler(BaseHTTPRequestHandler):
+    server: "MockWebhookServer"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        # Keep load tests readable; the stats endpoint is the record
+        return
+
+    def do_GET(self) -> None:
+        state = self.server.state
+
+        if self.path.startswith("/_mock/stats"):
+            with state.lock:
+                body = {
+                    "messages": len(state.messages),
+                    "statuses": {str(k): v for k, v in state.statuses.items()},
+                }
+            self._reply(200, body)
+        elif self.path.startswith("/_mock/messages"):
+            with state.lock:
+                body = list(state.messages)
+            self._reply(200, body)
+        else:
+            self._reply(404, {"message": "Unknown Webhook", "code": 10015})
+
+    def do_POST(self) -> None:
+        if self.path.startswith("/_mock/reset"):
+            self._read_body()
+            self.server.reset()
+            self._reply(204)
+            return
+
+        match = WEBHOOK_PATH.match(self.path)
+        body = self._read_body()
+
+        if not match:
+            self._reply(404, {"message": "Unknown Webhook", "code": 10015})
+            return
+
+        config = self.server.config
+        webhook = match.group("id")
+
+        if config.latency_max > 0:
+            time.sleep(random.uniform(config.latency_min, config.latency_max))
+
+        retry_after = self._take_bucket(webhook)
+
+        if retry_after is None and random.random() < config.rate_429:
+            retry_after = round(random.uniform(0.05, 0.5), 3)
+
+        if retry_after is not None:
+            self._reply(429, {
+                "message": "You are being rate limited.",
+                "retry_after": retry_after,
+                "global": False,
+            }, headers={
+                "Retry-After": f"{retry_after:.3f}",
+                "X-RateLimit-Limit": str(BUCKET_LIMIT),
+                "X-RateLimit-Remaining": "0",
+                "X-RateLimit-Reset-After": f"{retry_after:.3f}",
+                "X-RateLimit-Scope": "user",
+            })
+            return
+
+        if random.random() < config.rate_5xx:
+            self._reply(random.choice((500, 502, 503)), {
+                "message": "Simulated upstream failure", "code": 0})
+            return
+
+        try:
+            payload, files = self._decode(body)
+        except ValueError as e:
+            self._reply(400, {"message": str(e), "code": 50109})
+            return
+
+        errors = validate_message(payload, len(files))
+
+        if sum(len(data) for _, data in files) > MAX_UPLOAD:
+            errors.append("Request entity too large")
+
+        if errors:
+            self._reply(400, {
+                "message": "Invalid Form Body",
+                "code": 50035,
+                "errors": errors,
+            })
+            return
+
+        message = self.server.record(webhook, payload, files)
+
+        if "wait=1" in self.path or "wait=true" in self.path:
+            self._reply(200, message)
+        else:
+            self._reply(204)
+
+    def _take_bucket(self, webhook: str) -> Optional[float]:
+        """
+        Sliding window of BUCKET_LIMIT requests per BUCKET_WINDOW seconds
+
+        :return: seconds to wait when the bucket is exhausted, else None
+        """
+        if not self.server.config.enforce_bucket:
+            return None
+
+        state = self.server.state
+        now = time.monotonic()
+
+        with state.lock:
+            hits = [t for t in state.buckets.get(webhook, [])
+                    if now - t < BUCKET_WINDOW]
+
+            if len(hits) >= BUCKET_LIMIT:
+                state.buckets[webhook] = hits
+                return round(BUCKET_WINDOW - (now - hits[0]), 3)
+
+            hits.append(now)
+            state.buckets[webhook] = hits
+
+        return None
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _decode(self, body: bytes) -> tuple[dict[str, Any], list]:
+        """
+        Decode a JSON or multipart/form-data webhook body
+
+        :return: payload and a list of (filename, bytes) attachments
+        """
+        ctype = self.headers.get("Content-Type", "")
+
+        if ctype.startswith("multipart/form-data"):
+            message = BytesParser(policy=HTTP).parsebytes(
+                f"Content-Type: {ctype}\r\n\r\n".encode() + body)
+            payload: dict[str, Any] = {}
+            files = []
+
+            for part in message.iter_parts():
+                name = part.get_param("name", header="content-disposition")
+                data = part.get_payload(decode=True) or b""
+
+                if name == "payload_json":
+                    payload = json.loads(data)
+                elif part.get_filename():
+                    files.append((part.get_filename(), data))
+
+            return payload, files
+
+        try:
+            return json.loads(body or b"{}"), []
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON body: {e}")
+
+    def _reply(
+            self,
+            status: int,
+            body: Any = None,
+            headers: Optional[dict[str, str]] = None) -> None:
+        self.server.state.count(status)
+        data = json.dumps(body).encode() if body is not None else b""
+        self.send_response(status)
+        # disnake only honours 429s that came through Discord's proxy
+        self.send_header("Via", "1.1 google")
+
+        if data:
+            self.send_header("Content-Type", "application/json")
+
+        self.send_header("Content-Length", str(len(data)))
+
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class MockWebhookServer(ThreadingHTTPServer):
+    daemon_threads = True
+    config: MockConfig
+    state: MockState
+
+    def __init__(self, address: tuple[str, int], config: MockConfig):
+        super().__init__(address, MockWebhookHandler)
+        self.config = config
+        self.state = MockState()
+
+    @property
+    def api_base(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/api/v10"
+
+    def reset(self) -> None:
+        with self.state.lock:
+            self.state.messages.clear()
+            self.state.buckets.clear()
+            self.state.statuses.clear()
+
+    def record(
+            self,
+            webhook: str,
+            payload: dict[str, Any],
+            files: list) -> dict[str, Any]:
+        with self.state.lock:
+            message = {
+                "id": str(self.state.next_id),
+                "webhook_id": webhook,
+                "received_at": time.time(),
+                "content": payload.get("content") or "",
+                "embeds": payload.get("embeds") or [],
+                "attachments": [
+                    {"filename": name, "size": len(data)}
+                    for name, data in files],
+            }
+            self.state.next_id += 1
+            self.state.messages.append(message)
+
+            if self.config.record_file:
+                with self.config.record_file.open("a") as f:
+                    f.write(json.dumps(message) + "\n")
+
+        return message
+
+    def start_background(self) -> threading.Thread:
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Local mock of the Discord webhook API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, nargs=2, default=(0, 0),
+                        metavar=("MIN", "MAX"),
+                        help="uniform random latency added to each request")
+    parser.add_argument("--rate-429", type=float, default=0.0,
+                        help="probability of a random 429 response")
+    parser.add_argument("--rate-5xx", type=float, default=0.0,
+                        help="probability of a random 5xx response")
+    parser.add_argument("--no-bucket", action="store_true",
+                        help="disable the 5 req / 2 s per-webhook limit")
+    parser.add_argument("--record", type=Path, default=None,
+                        help="append accepted messages to this JSONL file")
+    return parser
+
+
+def config_from_args(args: argparse.Namespace) -> MockConfig:
+    return MockConfig(
+        latency_min=args.latency_ms[0] / 1000,
+        latency_max=args.latency_ms[1] / 1000,
+        rate_429=args.rate_429,
+        rate_5xx=args.rate_5xx,
+        enforce_bucket=not args.no_bucket,
+        record_file=args.record,
+    )
+
+
+def main() -> None:
+    args = build_arg_parser().parse_args()
+    server = MockWebhookServer((args.host, args.port), config_from_args(args))
+    print(f"Mock Discord API listening on {server.api_base}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,27 @@
+import contextvars
 import sys
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Callable, Iterator, ParamSpec, TypeVar
 
 from settings import Settings
 
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None  # type: ignore[assignment]
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
+
+def _quiet() -> bool:
+    try:
+        return Settings.get_instance().quiet
+    except ValueError:
+        # Outside of any notification, e.g. while settings are loading
+        return False
+
 
 def log(*args: str):
     """
@@ -10,7 +30,7 @@ def log(*args: str):
     :param args: log string
     :type args: str
     """
-    if not Settings.get_instance().quiet:
+    if not _quiet():
         print(*args)
 
 
@@ -21,5 +41,80 @@ def err(*args: object):
     :param args: error string
     :type args: str
     """
-    if not Settings.get_instance().quiet:
+    if not _quiet():
         print(*args, file=sys.stderr)
+
+
+def in_context(fn: Callable[P, T]) -> Callable[P, T]:
+    """
+    Bind a function to the caller's context (active settings), for running
+    it on pool threads, which otherwise start with an empty context
+
+    Every call runs in its own copy, so the bound function may run on
+    several threads at once.
+
+    :param fn: function to bind
+    :type fn: Callable
+    :return: bound function
+    :rtype: Callable
+    """
+    context = contextvars.copy_context()
+
+    def run(*args: P.args, **kwargs: P.kwargs) -> T:
+        return context.copy().run(fn, *args, **kwargs)
+
+    return run
+
+
+def lock_handle(handle: IO) -> None:
+    """
+    Take an exclusive lock on an open file, released when it is closed
+    (no-op without fcntl)
+
+    :param handle: open file
+    :type handle: IO
+    """
+    if fcntl:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+
+
+def try_lock_handle(handle: IO) -> bool:
+    """
+    Take an exclusive lock on an open file without waiting, released when
+    it is closed (always granted without fcntl)
+
+    :param handle: open file
+    :type handle: IO
+    :return: False when another process holds the lock
+    :rtype: bool
+    """
+    if not fcntl:
+        return True
+
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+
+    return True
+
+
+@contextmanager
+def file_lock(path: Path) -> Iterator[None]:
+    """
+    Exclusive inter-process lock held on a lock file (no-op without fcntl)
+
+    :param path: lock file, created if missing
+    :type path: Path
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    with open(path, "a") as handle:
+        if fcntl:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(handle, fcntl.LOCK_UN)